@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.db import transaction
+
+from . import resumo
 from .models import (
     Empresa,
     UserEmpresa,
@@ -6,7 +9,9 @@ from .models import (
     Cliente,
     Servico,
     Orcamento,
-    ItemOrcamento
+    ItemOrcamento,
+    ResumoMensal,
+    SequenciaOrcamento,
 )
 
 # ------------------------
@@ -81,9 +86,10 @@ class ItemOrcamentoInline(admin.TabularInline):
 @admin.register(Orcamento)
 class OrcamentoAdmin(admin.ModelAdmin):
     list_display = ('numero', 'cliente', 'empresa', 'usuario', 'criado_em', 'total')
+    list_select_related = ('cliente', 'empresa', 'usuario')
     list_filter = ('empresa', 'usuario', 'cliente')
     search_fields = ('numero', 'cliente__razao_social', 'usuario__username')
-    readonly_fields = ('subtotal', 'total', 'criado_em')
+    readonly_fields = ('numero', 'subtotal', 'total', 'criado_em')
     inlines = [ItemOrcamentoInline]
     date_hierarchy = 'criado_em'
     ordering = ('-criado_em',)
@@ -106,6 +112,33 @@ class OrcamentoAdmin(admin.ModelAdmin):
         }),
     )
 
+    # O resumo mensal é mantido como nas views: estado capturado antes de
+    # gravar e diferença aplicada depois de recalcular os totais
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # A empresa pode ter mudado: a diferença sai de uma linha e entra em outra
+            obj._resumo_anterior = resumo.capturar_lote(Orcamento.objects.filter(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.recalcular_totais()
+        if change:
+            resumo.registrar_lote(form.instance._resumo_anterior)
+        else:
+            resumo.registrar(form.instance)
+
+    def delete_model(self, request, obj):
+        resumo.remover(obj)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        anteriores = resumo.capturar_lote(queryset)
+        super().delete_queryset(request, queryset)
+        resumo.registrar_lote(anteriores)
+
 
 # ------------------------
 # ITEM DO ORÇAMENTO (ISOLADO)
@@ -115,3 +148,59 @@ class ItemOrcamentoAdmin(admin.ModelAdmin):
     list_display = ('orcamento', 'produto', 'servico', 'quantidade', 'preco_unitario', 'total')
     search_fields = ('orcamento__numero', 'produto__nome', 'servico__nome')
     list_filter = ('orcamento__empresa',)
+
+    # Totais e resumo mensal dos orçamentos tocados, capturados antes e
+    # atualizados depois da alteração
+
+    def _capturar(self, ids):
+        return resumo.capturar_lote(Orcamento.objects.filter(id__in=set(ids)))
+
+    def _atualizar(self, anteriores):
+        Orcamento.objects.filter(id__in=anteriores).recalcular_totais()
+        resumo.registrar_lote(anteriores)
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        ids = [obj.orcamento_id]
+        if change:
+            # O item pode ter mudado de orçamento: os dois são recalculados
+            ids += ItemOrcamento.objects.filter(pk=obj.pk).values_list('orcamento_id', flat=True)
+        anteriores = self._capturar(ids)
+        super().save_model(request, obj, form, change)
+        self._atualizar(anteriores)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        anteriores = self._capturar([obj.orcamento_id])
+        super().delete_model(request, obj)
+        self._atualizar(anteriores)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        anteriores = self._capturar(queryset.values_list('orcamento_id', flat=True))
+        super().delete_queryset(request, queryset)
+        self._atualizar(anteriores)
+
+
+# ------------------------
+# RESUMO MENSAL (SOMENTE LEITURA)
+# ------------------------
+@admin.register(ResumoMensal)
+class ResumoMensalAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'ano', 'mes', 'quantidade', 'valor_bruto', 'desconto')
+    list_filter = ('empresa', 'ano')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ------------------------
+# NUMERAÇÃO DOS ORÇAMENTOS
+# ------------------------
+@admin.register(SequenciaOrcamento)
+class SequenciaOrcamentoAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'ano', 'ultimo_numero')
+    list_filter = ('empresa', 'ano')
@@ -0,0 +1,327 @@
+import re
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Cliente, Produto, Servico, TermoCliente
+from .paginacao import paginar
+from .texto import normalizar, so_digitos
+
+
+# -----------------------------
+# CONFIGURAÇÃO
+# -----------------------------
+
+def limite_autocomplete(pedido=None):
+    """Limite de resultados: o pedido pelo cliente, sem passar do máximo configurado."""
+    padrao = getattr(settings, 'AUTOCOMPLETE_LIMITE', 20)
+    maximo = getattr(settings, 'AUTOCOMPLETE_LIMITE_MAXIMO', 50)
+    try:
+        limite = int(pedido) if pedido else padrao
+    except (TypeError, ValueError):
+        limite = padrao
+    return max(1, min(limite, maximo))
+
+
+def _tokens(termo):
+    return re.findall(r'\w+', termo or '')
+
+
+# -----------------------------
+# CATÁLOGO (PRODUTOS E SERVIÇOS)
+# -----------------------------
+# No SQLite a busca usa a tabela FTS5 core_catalogo_fts (migração 0008),
+# mantida pelos triggers de TRIGGERS_FTS. O rowid codifica o item: id * 2 para
+# produto e id * 2 + 1 para serviço.
+#
+# Ordenar por bm25() obriga o FTS5 a pontuar todas as linhas que casam, o que
+# custa dezenas de ms quando um prefixo curto casa com boa parte do catálogo.
+# Por isso lemos no máximo JANELA_FTS candidatos em ordem de rowid (os mais
+# recentes primeiro, leitura que o FTS5 interrompe no LIMIT) e ordenamos essa
+# janela por relevância em Python. Antes da janela, uma consulta só pelos
+# códigos que começam com o termo (poucas linhas) traz, ordenados no SQL pelo
+# tamanho do código, o código igual ao termo e os mais próximos dele, que a
+# janela dos mais recentes pode deixar de fora.
+#
+# No PostgreSQL a busca é um LIKE '% termo%' por palavra digitada sobre
+# core_catalogo_busca(codigo, nome), coberto por um índice de trigramas
+# (migração 0016), com a mesma consulta dos códigos e a mesma janela.
+
+JANELA_FTS = 200
+
+# No SQLite, a migração que altera uma coluna ou cria uma restrição em
+# core_produto/core_servico recria a tabela e os triggers somem junto.
+# refazer_triggers_fts() roda depois de todo migrate (ver signals.py). A
+# migração 0008 tem a sua própria cópia deste SQL, a da época em que foi escrita.
+TABELAS_FTS = (("core_produto", 0), ("core_servico", 1))
+INDEXAR_FTS = [
+    f"""
+    INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+    SELECT id * 2 + {tipo}, 'e' || empresa_id, codigo, nome, preco FROM {tabela}
+    """
+    for tabela, tipo in TABELAS_FTS
+]
+
+
+def _triggers_fts(tabela, tipo):
+    rowid = f"id * 2 + {tipo}"
+    inserir = f"""
+        INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+        VALUES (new.{rowid}, 'e' || new.empresa_id, new.codigo, new.nome, new.preco);"""
+    return {
+        f"{tabela}_fts_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS {tabela}_fts_ai AFTER INSERT ON {tabela} BEGIN{inserir}
+        END
+        """,
+        f"{tabela}_fts_au": f"""
+        CREATE TRIGGER IF NOT EXISTS {tabela}_fts_au AFTER UPDATE ON {tabela} BEGIN
+            DELETE FROM core_catalogo_fts WHERE rowid = old.{rowid};{inserir}
+        END
+        """,
+        f"{tabela}_fts_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS {tabela}_fts_ad AFTER DELETE ON {tabela} BEGIN
+            DELETE FROM core_catalogo_fts WHERE rowid = old.{rowid};
+        END
+        """,
+    }
+
+
+TRIGGERS_FTS = {nome: sql for tabela, tipo in TABELAS_FTS for nome, sql in _triggers_fts(tabela, tipo).items()}
+
+
+def refazer_triggers_fts(using='default'):
+    """
+    Recria os triggers do índice do catálogo que estiverem faltando e, nesse
+    caso, reindexa o catálogo: o que mudou enquanto faltavam ficou fora do
+    índice. Com os triggers no lugar é só uma leitura do sqlite_master.
+    """
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite':
+        return
+    nomes = ['core_catalogo_fts', *TRIGGERS_FTS]
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(nomes))})", nomes,
+        )
+        existentes = {linha[0] for linha in cursor.fetchall()}
+        # Sem a tabela a migração 0008 ainda não foi aplicada (ou foi desfeita)
+        if 'core_catalogo_fts' not in existentes or existentes.issuperset(nomes):
+            return
+        with transaction.atomic(using=using):
+            for nome, sql in TRIGGERS_FTS.items():
+                if nome not in existentes:
+                    cursor.execute(sql)
+            cursor.execute("DELETE FROM core_catalogo_fts")
+            for sql in INDEXAR_FTS:
+                cursor.execute(sql)
+
+
+def _expressao_fts(empresa_id, tokens):
+    prefixos = ' '.join(f'"{t}"*' for t in tokens)
+    return f'tenant : "e{int(empresa_id)}" AND {{codigo nome}} : ({prefixos})'
+
+
+def _expressao_codigo(empresa_id, tokens):
+    # ^ prende a frase no início da coluna: código que começa com o termo
+    return f'tenant : "e{int(empresa_id)}" AND codigo : ^"{" ".join(tokens)}"*'
+
+
+def _relevancia(termo, codigo, nome):
+    codigo, nome = normalizar(codigo), normalizar(nome)
+    if codigo and codigo == termo:
+        nivel = 0
+    elif codigo and codigo.startswith(termo):
+        nivel = 1
+    elif nome.startswith(termo):
+        nivel = 2
+    else:
+        nivel = 3
+    return nivel, len(nome), nome
+
+
+def _mais_relevantes(termo, candidatos, limite):
+    """Ordena a janela de candidatos (tipo, id, codigo, nome, preco) por relevância."""
+    termo = normalizar(termo)
+    candidatos.sort(key=lambda c: _relevancia(termo, c[2], c[3]))
+    return [
+        {
+            'id': id,
+            'label': nome,
+            'codigo': codigo or '',
+            'tipo': tipo,
+            'preco': float(preco or 0),
+        }
+        for tipo, id, codigo, nome, preco in candidatos[:limite]
+    ]
+
+
+def _buscar_catalogo_fts(empresa_id, termo, tokens, limite):
+    linhas = {}
+    with connection.cursor() as cursor:
+        for sql, expressao, quantos in (
+            ("ORDER BY length(codigo), rowid DESC", _expressao_codigo(empresa_id, tokens), limite),
+            ("ORDER BY rowid DESC", _expressao_fts(empresa_id, tokens), JANELA_FTS),
+        ):
+            cursor.execute(
+                f"SELECT rowid, codigo, nome, preco FROM core_catalogo_fts "
+                f"WHERE core_catalogo_fts MATCH %s {sql} LIMIT %s",
+                [expressao, quantos],
+            )
+            for rowid, *campos in cursor.fetchall():
+                linhas[rowid] = campos
+
+    candidatos = [
+        ('servico' if rowid % 2 else 'produto', rowid // 2, codigo, nome, preco)
+        for rowid, (codigo, nome, preco) in linhas.items()
+    ]
+    return _mais_relevantes(termo, candidatos, limite)
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _padrao_like(token):
+    return '% ' + _escapar_like(token) + '%'
+
+
+def _buscar_catalogo_trgm(empresa_id, termo, limite):
+    tokens = _tokens(normalizar(termo))
+    condicoes = ' AND '.join(["core_catalogo_busca(codigo, nome) LIKE %s"] * len(tokens))
+    # core_catalogo_busca() começa por " " + código: o código que começa com
+    # o termo casa com LIKE ' termo%' no início, que o índice também atende
+    inicio_codigo = ' ' + _escapar_like(' '.join(tokens)) + '%'
+    candidatos = {}
+    with connection.cursor() as cursor:
+        for tipo, tabela in (('produto', 'core_produto'), ('servico', 'core_servico')):
+            for filtro, ordem, parametros, quantos in (
+                ("core_catalogo_busca(codigo, nome) LIKE %s", "length(codigo), id DESC", [inicio_codigo], limite),
+                (condicoes, "id DESC", [_padrao_like(t) for t in tokens], JANELA_FTS),
+            ):
+                cursor.execute(
+                    f"SELECT id, codigo, nome, preco FROM {tabela} "
+                    f"WHERE empresa_id = %s AND {filtro} ORDER BY {ordem} LIMIT %s",
+                    [empresa_id, *parametros, quantos],
+                )
+                candidatos.update({(tipo, linha[0]): (tipo, *linha) for linha in cursor.fetchall()})
+    return _mais_relevantes(termo, list(candidatos.values()), limite)
+
+
+def _buscar_catalogo_orm(empresa_id, termo, limite):
+    filtro = Q(nome__icontains=termo) | Q(codigo__istartswith=termo)
+    relevancia = Case(
+        When(codigo__iexact=termo, then=Value(0)),
+        When(nome__istartswith=termo, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    resultados = []
+    for tipo, model in (('produto', Produto), ('servico', Servico)):
+        linhas = (
+            model.objects.da_empresa(empresa_id).filter(filtro)
+            .annotate(relevancia=relevancia)
+            .order_by('relevancia', 'nome')
+            .values('id', 'codigo', 'nome', 'preco', 'relevancia')[:limite]
+        )
+        resultados += [
+            {
+                'id': l['id'],
+                'label': l['nome'],
+                'codigo': l['codigo'] or '',
+                'tipo': tipo,
+                'preco': float(l['preco'] or 0),
+                'relevancia': l['relevancia'],
+            }
+            for l in linhas
+        ]
+    resultados.sort(key=lambda r: (r.pop('relevancia'), r['label']))
+    return resultados[:limite]
+
+
+def buscar_catalogo(empresa_id, termo, limite=None):
+    """
+    Produtos e serviços da empresa cujo código ou nome casam com o termo
+    (prefixo de cada palavra, sem diferenciar acentos), do mais para o
+    menos relevante.
+    """
+    limite = limite or limite_autocomplete()
+    tokens = _tokens(termo)
+    if not empresa_id or not tokens:
+        return []
+    if connection.vendor == 'sqlite':
+        return _buscar_catalogo_fts(empresa_id, termo, tokens, limite)
+    if connection.vendor == 'postgresql':
+        return _buscar_catalogo_trgm(empresa_id, termo, limite)
+    return _buscar_catalogo_orm(empresa_id, termo.strip(), limite)
+
+
+# -----------------------------
+# CLIENTES
+# -----------------------------
+# Cada palavra digitada precisa ser prefixo de alguma palavra da razão social
+# ou do nome fantasia (tabela TermoCliente, normalizada na gravação). Termos só
+# com números e pontuação buscam pelo prefixo do CPF/CNPJ. A ordem é a da
+# razão social normalizada e a paginação é por chave (busca_nome, id): o
+# cursor devolvido retoma a leitura do índice logo depois do último resultado.
+
+ORDEM_CLIENTES = ('busca_nome', 'id')
+CAMPOS_CLIENTE = ('id', 'razao_social', 'nome_fantasia', 'cpf_cnpj', 'email', 'telefone', 'endereco')
+# Maior caractere do plano básico: "abc" <= termo < "abc\uffff" equivale a startswith
+FIM_PREFIXO = '\uffff'
+
+
+def _intervalo(campo, prefixo):
+    if connection.vendor == 'postgresql':
+        # Fora da collation "C" o intervalo até FIM_PREFIXO não equivale a
+        # startswith; o LIKE 'abc%' usa os índices varchar_pattern_ops (0016)
+        return {f'{campo}__startswith': prefixo}
+    return {f'{campo}__gte': prefixo, f'{campo}__lt': prefixo + FIM_PREFIXO}
+
+
+def filtro_clientes(empresa_id, termo):
+    """Filtro (Q) dos clientes que casam com o termo, ou None se o termo não tem o que buscar."""
+    if not re.search(r'[^\W\d_]', termo):
+        digitos = so_digitos(termo)
+        return Q(**_intervalo('cpf_cnpj_digitos', digitos)) if digitos else None
+
+    tokens = _tokens(normalizar(termo))
+    if not tokens:
+        return None
+    filtro = Q()
+    for token in tokens:
+        ids = TermoCliente.objects.filter(empresa_id=empresa_id, **_intervalo('termo', token))
+        filtro &= Q(id__in=ids.values('cliente_id'))
+    return filtro
+
+
+def buscar_clientes(empresa_id, termo, limite=None, cursor=None):
+    """
+    Clientes da empresa que casam com o termo, em ordem de razão social.
+    Retorna (resultados, próximo cursor ou None).
+    """
+    limite = limite or limite_autocomplete()
+    filtro = filtro_clientes(empresa_id, termo or '') if empresa_id else None
+    if filtro is None:
+        return [], None
+
+    clientes = Cliente.objects.da_empresa(empresa_id).filter(filtro).values('busca_nome', *CAMPOS_CLIENTE)
+    try:
+        linhas, proximo = paginar(clientes, ORDEM_CLIENTES, limite, cursor)
+    except ValueError:
+        # Cursor adulterado ou de outra versão: recomeça da primeira página
+        linhas, proximo = paginar(clientes, ORDEM_CLIENTES, limite)
+    return [serializar_cliente(l) for l in linhas], proximo
+
+
+def serializar_cliente(linha):
+    """Formato do autocomplete a partir de um dict com CAMPOS_CLIENTE."""
+    return {
+        'id': linha['id'],
+        'label': linha['razao_social'],
+        'nome_fantasia': linha['nome_fantasia'],
+        'cpf_cnpj': linha['cpf_cnpj'],
+        'email': linha['email'],
+        'telefone': linha['telefone'],
+        'endereco': linha['endereco'],
+    }
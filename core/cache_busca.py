@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Empresa
+from .texto import normalizar
+
+
+class CacheLRU:
+    """
+    Dicionário limitado em memória: descarta a entrada menos usada quando
+    passa de `tamanho` e ignora entradas mais velhas que `ttl` segundos.
+    """
+
+    def __init__(self, tamanho, ttl):
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = self.faltas = self.descartes = 0
+
+    def obter(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None or entrada[0] <= agora:
+                if entrada is not None:
+                    del self._dados[chave]
+                self.faltas += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho:
+                self._dados.popitem(last=False)
+                self.descartes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+            self.acertos = self.faltas = self.descartes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                'entradas': len(self._dados),
+                'tamanho_maximo': self.tamanho,
+                'ttl': self.ttl,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'descartes': self.descartes,
+                'taxa_acerto': round(self.acertos / consultas, 3) if consultas else None,
+            }
+
+
+cache = CacheLRU(
+    getattr(settings, 'AUTOCOMPLETE_CACHE_TAMANHO', 2000),
+    getattr(settings, 'AUTOCOMPLETE_CACHE_TTL', 120),
+)
+
+
+def _geracao(empresa_id):
+    return (
+        Empresa.objects.filter(pk=empresa_id)
+        .values_list('geracao_cadastros', flat=True)
+        .first()
+    )
+
+
+def em_cache(empresa_id, endpoint, termo, parametros, calcular):
+    """
+    Resultado de `calcular()` para (empresa, endpoint, termo normalizado,
+    parâmetros), reaproveitado enquanto a geração dos cadastros da empresa
+    não mudar. Retorna (valor, acertou).
+    """
+    geracao = _geracao(empresa_id)
+    if geracao is None:
+        return calcular(), False
+
+    chave = (empresa_id, endpoint, ' '.join(normalizar(termo).split()), parametros, geracao)
+    valor = cache.obter(chave)
+    if valor is not None:
+        return valor, True
+    valor = calcular()
+    cache.guardar(chave, valor)
+    return valor, False
@@ -0,0 +1,82 @@
+from django.db.models import Q
+
+from .busca import filtro_clientes
+from .listagem import tamanho_pagina
+from .models import Cliente, Produto, Servico
+from .paginacao import paginar
+
+
+# Tabelas de clientes, produtos e serviços da página de configurações. Cada
+# aba pede suas linhas por JSON quando é aberta, em páginas por chave (ver
+# paginacao.py), com busca e ordenação feitas no banco e só as colunas que a
+# tabela mostra.
+
+ORDENACOES_CATALOGO = {
+    'nome': ('nome', 'id'),
+    'recentes': ('-id',),
+    'menor_preco': ('preco', 'id'),
+    'maior_preco': ('-preco', '-id'),
+}
+
+CADASTROS = {
+    'clientes': {
+        'model': Cliente,
+        'campos': ('id', 'razao_social', 'nome_fantasia', 'cpf_cnpj', 'telefone'),
+        'ordenacoes': {
+            'nome': ('busca_nome', 'id'),
+            'recentes': ('-id',),
+        },
+    },
+    'produtos': {
+        'model': Produto,
+        'campos': ('id', 'codigo', 'nome', 'descricao', 'preco'),
+        'ordenacoes': ORDENACOES_CATALOGO,
+    },
+    'servicos': {
+        'model': Servico,
+        'campos': ('id', 'codigo', 'nome', 'descricao', 'preco'),
+        'ordenacoes': ORDENACOES_CATALOGO,
+    },
+}
+ORDEM_PADRAO = 'nome'
+# A tabela mostra só o começo da descrição
+TAMANHO_DESCRICAO = 120
+
+
+def _filtro_busca(empresa_id, tipo, termo):
+    if tipo == 'clientes':
+        return filtro_clientes(empresa_id, termo)
+    return Q(nome__icontains=termo) | Q(codigo__istartswith=termo)
+
+
+def listar(empresa_id, tipo, params):
+    """
+    Uma página de clientes, produtos ou serviços da empresa conforme os
+    parâmetros (q, ordem, limite, cursor). Retorna (linhas, próximo cursor).
+    Levanta ValueError se tipo, ordem ou cursor forem inválidos.
+    """
+    if tipo not in CADASTROS:
+        raise ValueError(f"Cadastro inválido: {tipo!r}")
+    config = CADASTROS[tipo]
+    ordem = config['ordenacoes'].get(params.get('ordem') or ORDEM_PADRAO)
+    if ordem is None:
+        raise ValueError(f"Ordenação inválida: {params.get('ordem')!r}")
+
+    # Os campos da ordenação entram para o cursor não recarregar a última linha
+    campos = {*config['campos'], *(campo.lstrip('-') for campo in ordem)}
+    linhas = config['model'].objects.da_empresa(empresa_id).only(*campos)
+    termo = (params.get('q') or '').strip()
+    if termo:
+        filtro = _filtro_busca(empresa_id, tipo, termo)
+        linhas = linhas.filter(filtro) if filtro is not None else linhas.none()
+    return paginar(linhas, ordem, tamanho_pagina(params.get('limite')), params.get('cursor'))
+
+
+def serializar(tipo, objeto):
+    dados = {campo: getattr(objeto, campo) for campo in CADASTROS[tipo]['campos']}
+    if tipo != 'clientes':
+        descricao = dados['descricao'] or ''
+        if len(descricao) > TAMANHO_DESCRICAO:
+            descricao = descricao[:TAMANHO_DESCRICAO - 1] + '…'
+        dados.update(codigo=dados['codigo'] or '', descricao=descricao, preco=str(dados['preco']))
+    return dados
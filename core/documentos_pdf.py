@@ -0,0 +1,222 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
+from django.utils import formats, timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import pdf
+from .models import Orcamento
+
+
+# O PDF é gerado por core/pdf.py em um pool de processos limitado
+# (PDF_PROCESSOS): o pool limita quantas renderizações pesadas de CPU rodam ao
+# mesmo tempo no servidor e isola falhas delas (ex.: falta de memória), mas a
+# requisição que pede um PDF fora do cache continua esperando o resultado, e o
+# worker fica ocupado por até PDF_TIMEOUT segundos (depois disso, 503). Para
+# não esperar na requisição, gere os PDFs antes com o comando gerar_pdfs.
+# Aqui fica o que depende do Django: montar os dados do orçamento (no processo
+# principal, que tem o banco) e o cache em disco, com um arquivo por versão do
+# orçamento.
+
+_pool = None
+_lock = threading.Lock()
+
+
+def _pool_processos():
+    """Pool compartilhado do processo, criado no primeiro uso. None se desativado."""
+    global _pool
+    processos = getattr(settings, 'PDF_PROCESSOS', 2)
+    if not processos:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=processos)
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# -----------------------------
+# DADOS DO ORÇAMENTO
+# -----------------------------
+
+def _moeda(valor):
+    return formats.number_format(valor or 0, 2, force_grouping=True)
+
+
+def _data(valor):
+    return formats.date_format(valor, 'd/m/Y') if valor else ''
+
+
+def _caminho_logo(empresa):
+    # A versão de impressão já vem reduzida; o original fica para logos antigos
+    logo = empresa.logo_impressao or empresa.logo
+    return logo.path if logo else None
+
+
+def dados_orcamento(orcamento):
+    """
+    Textos do PDF já formatados. Espera um orçamento de
+    Orcamento.objects.com_itens().select_related('empresa').
+    """
+    empresa, cliente = orcamento.empresa, orcamento.cliente
+    return {
+        'empresa': {
+            'nome': empresa.nome,
+            'cnpj': empresa.cnpj or '',
+            'telefone': empresa.telefone or '',
+            'endereco': empresa.endereco or '',
+            'logo_caminho': _caminho_logo(empresa),
+        },
+        'orcamento': {
+            'numero': f'{orcamento.numero}/{orcamento.ano}',
+            'data': _data(timezone.localtime(orcamento.criado_em)),
+            'vencimento': _data(orcamento.vencimento),
+            'previsao_entrega': _data(orcamento.previsao_entrega),
+            'forma_pagamento': orcamento.forma_pagamento,
+            'responsavel': orcamento.responsavel,
+            'solicitante': orcamento.solicitante,
+            'observacao': orcamento.observacao,
+            'subtotal': _moeda(orcamento.subtotal),
+            'desconto': _moeda(orcamento.desconto),
+            'total': _moeda(orcamento.total),
+        },
+        'cliente': {
+            'razao_social': cliente.razao_social,
+            'nome_fantasia': cliente.nome_fantasia,
+            'cpf_cnpj': cliente.cpf_cnpj,
+            'telefone': cliente.telefone,
+            'email': cliente.email,
+            'endereco': cliente.endereco,
+        },
+        'itens': [
+            {
+                'tipo': 'Produto' if item.produto_id else 'Serviço',
+                'nome': (item.produto or item.servico).nome if (item.produto_id or item.servico_id) else '',
+                'quantidade': str(item.quantidade),
+                'valor_unitario': _moeda(item.preco_unitario),
+                'total': _moeda(item.total),
+            }
+            for item in orcamento.itens.all()
+        ],
+    }
+
+
+# -----------------------------
+# CACHE EM DISCO
+# -----------------------------
+
+def versao(orcamento):
+    """Muda com o orçamento/itens, com os cadastros da empresa e com o layout do PDF."""
+    partes = (
+        orcamento.id,
+        orcamento.atualizado_em.timestamp(),
+        orcamento.empresa.geracao_cadastros,
+        pdf.VERSAO,
+    )
+    return hashlib.sha1(repr(partes).encode()).hexdigest()[:16]
+
+
+def caminho(orcamento):
+    pasta = Path(settings.PDF_CACHE_DIR) / str(orcamento.empresa_id)
+    return pasta / f'{orcamento.id}-{versao(orcamento)}.pdf'
+
+
+def _gravar(destino, conteudo):
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_suffix(f'.{os.getpid()}.tmp')
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, destino)
+    # Versões anteriores do mesmo orçamento não serão mais pedidas
+    for antigo in destino.parent.glob(f'{destino.name.split("-")[0]}-*.pdf'):
+        if antigo != destino:
+            antigo.unlink(missing_ok=True)
+
+
+# -----------------------------
+# GERAÇÃO
+# -----------------------------
+
+def gerar(orcamentos):
+    """
+    Garante o PDF da versão atual de cada orçamento e retorna
+    [(orcamento, caminho, gerado_agora)]. Os orçamentos devem vir de
+    Orcamento.objects.com_itens().select_related('empresa'); os que faltam
+    no cache são renderizados em paralelo no pool, e esta função espera por
+    eles (até PDF_TIMEOUT segundos cada).
+    """
+    timeout = getattr(settings, 'PDF_TIMEOUT', 60)
+    pool = _pool_processos()
+
+    resultado, pendentes = [], []
+    for orcamento in orcamentos:
+        destino = caminho(orcamento)
+        if destino.exists():
+            resultado.append((orcamento, destino, False))
+            continue
+        dados = dados_orcamento(orcamento)
+        if pool is None:
+            _gravar(destino, pdf.renderizar_orcamento(dados))
+            resultado.append((orcamento, destino, True))
+        else:
+            pendentes.append((orcamento, destino, pool.submit(pdf.renderizar_orcamento, dados)))
+
+    try:
+        for orcamento, destino, futuro in pendentes:
+            _gravar(destino, futuro.result(timeout=timeout))
+            resultado.append((orcamento, destino, True))
+    except BrokenProcessPool:
+        # Um processo morreu (ex.: falta de memória); o próximo pedido recria o pool
+        _descartar_pool()
+        raise
+    return resultado
+
+
+def gerar_pdf(orcamento):
+    """Caminho do PDF da versão atual do orçamento, gerando-o se preciso."""
+    [(_, destino, _)] = gerar([orcamento])
+    return destino
+
+
+def responder(request, orcamento):
+    """
+    Resposta com o PDF do orçamento (ETag = versão; 304 se o navegador já o
+    tem). Basta o orçamento com id, número, ano, atualizado_em e a empresa;
+    os itens só são lidos se o PDF desta versão ainda não existir.
+    """
+    etag = f'"{versao(orcamento)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            arquivo = open(caminho(orcamento), 'rb')
+        except FileNotFoundError:
+            # Ainda não gerado, ou uma edição simultânea acabou de gravar uma
+            # versão mais nova (e apagar esta): serve a versão atual
+            completo = Orcamento.objects.com_itens().select_related('empresa').get(pk=orcamento.pk)
+            etag = f'"{versao(completo)}"'
+            try:
+                arquivo = open(gerar_pdf(completo), 'rb')
+            except (TimeoutError, BrokenProcessPool, FileNotFoundError):
+                return JsonResponse(
+                    {'status': 'erro', 'mensagem': 'Não foi possível gerar o PDF agora. Tente novamente.'},
+                    status=503,
+                )
+        response = FileResponse(
+            arquivo, content_type='application/pdf',
+            filename=f'orcamento-{orcamento.numero}-{orcamento.ano}.pdf',
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
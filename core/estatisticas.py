@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Empresa, Cliente, Produto, Servico, ResumoMensal
+
+
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+
+# -----------------------------
+# PERÍODO
+# -----------------------------
+
+def periodo_ano(ano):
+    """Lista de (ano, mês) de janeiro a dezembro do ano informado."""
+    return [(ano, mes) for mes in range(1, 13)]
+
+
+def periodo_ultimos_12_meses(hoje=None):
+    """Lista de (ano, mês) dos últimos 12 meses, terminando no mês atual."""
+    hoje = hoje or timezone.localdate()
+    ano, mes = hoje.year, hoje.month
+    periodo = []
+    for _ in range(12):
+        periodo.append((ano, mes))
+        mes -= 1
+        if mes == 0:
+            ano, mes = ano - 1, 12
+    return list(reversed(periodo))
+
+
+def _rotulo(ano, mes, com_ano):
+    rotulo = MESES[mes - 1]
+    return f"{rotulo}/{str(ano)[-2:]}" if com_ano else rotulo
+
+
+# -----------------------------
+# CONSULTAS
+# -----------------------------
+
+def _contar(model):
+    return Subquery(
+        model.objects.filter(empresa=OuterRef("pk"))
+        .order_by()
+        .values("empresa")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+
+
+def _somar_resumo(campo):
+    return Subquery(
+        ResumoMensal.objects.filter(empresa=OuterRef("pk"))
+        .order_by()
+        .values("empresa")
+        .annotate(t=Sum(campo))
+        .values("t")
+    )
+
+
+def contadores(empresa):
+    """Totais do cartão do dashboard em uma única consulta."""
+    dados = (
+        Empresa.objects.filter(pk=empresa.pk)
+        .annotate(
+            n_clientes=Coalesce(_contar(Cliente), 0),
+            n_produtos=Coalesce(_contar(Produto), 0),
+            n_servicos=Coalesce(_contar(Servico), 0),
+            n_orcamentos=Coalesce(_somar_resumo("quantidade"), 0),
+            valor_total=Coalesce(
+                _somar_resumo("valor_bruto"), Value(Decimal("0")), output_field=DecimalField()
+            ),
+        )
+        .values("n_clientes", "n_produtos", "n_servicos", "n_orcamentos", "valor_total")
+        .get()
+    )
+    return {
+        "clientes": dados["n_clientes"],
+        "produtos": dados["n_produtos"],
+        "servicos": dados["n_servicos"],
+        "orcamentos": dados["n_orcamentos"],
+        "valor_total": float(dados["valor_total"] or 0),
+    }
+
+
+def series_mensais(empresa, periodo):
+    """Quantidade e valor dos orçamentos por mês, lidos do resumo mensal."""
+    (ano_ini, mes_ini), (ano_fim, mes_fim) = periodo[0], periodo[-1]
+    linhas = (
+        ResumoMensal.objects.filter(empresa=empresa, ano__gte=ano_ini, ano__lte=ano_fim)
+        .annotate(chave=F("ano") * 100 + F("mes"))
+        .filter(chave__gte=ano_ini * 100 + mes_ini, chave__lte=ano_fim * 100 + mes_fim)
+        .values("ano", "mes", "quantidade", "valor_bruto")
+    )
+    por_mes = {(l["ano"], l["mes"]): l for l in linhas}
+
+    quantidades, valores = [], []
+    for chave in periodo:
+        linha = por_mes.get(chave, {})
+        quantidades.append(linha.get("quantidade", 0))
+        valores.append(float(linha.get("valor_bruto") or 0))
+    return quantidades, valores
+
+
+# -----------------------------
+# ESTATÍSTICAS DO DASHBOARD
+# -----------------------------
+
+def estatisticas_dashboard(empresa, ano=None):
+    """
+    Reúne os dados do dashboard. Com `ano` usa janeiro a dezembro daquele
+    ano; sem ele, a janela móvel dos últimos 12 meses.
+    """
+    periodo = periodo_ano(ano) if ano else periodo_ultimos_12_meses()
+    quantidades, valores = series_mensais(empresa, periodo)
+
+    return {
+        "periodo": {
+            "ano": ano,
+            "inicio": "%04d-%02d" % periodo[0],
+            "fim": "%04d-%02d" % periodo[-1],
+        },
+        "contadores": contadores(empresa),
+        "meses": [_rotulo(a, m, com_ano=not ano) for a, m in periodo],
+        "orcamentos_mes": quantidades,
+        "orcamentos_valor_mes": valores,
+    }
@@ -0,0 +1,153 @@
+import csv
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils import timezone
+
+from .listagem import filtros
+from .models import ItemOrcamento, Orcamento
+
+
+# Exportação dos orçamentos e dos itens em CSV ou JSON Lines. As linhas saem
+# de values_list().iterator(), lidas do banco em blocos de TAMANHO_BLOCO sem
+# criar instâncias nem guardar o resultado na memória, e são emitidas em
+# pedaços de texto à medida que chegam: a memória não depende do tamanho do
+# histórico. Com nomes=True, cliente e produto/serviço vêm por JOIN na mesma
+# consulta.
+
+TAMANHO_BLOCO = 2000
+CENTAVO = Decimal('0.01')
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# conjunto: [(coluna no arquivo, expressão do values_list)]
+COLUNAS = {
+    'orcamentos': [
+        ('id', 'id'),
+        ('numero', 'numero'),
+        ('ano', 'ano'),
+        ('criado_em', 'criado_em'),
+        ('cliente_id', 'cliente_id'),
+        ('solicitante', 'solicitante'),
+        ('responsavel', 'responsavel'),
+        ('previsao_entrega', 'previsao_entrega'),
+        ('vencimento', 'vencimento'),
+        ('forma_pagamento', 'forma_pagamento'),
+        ('subtotal', 'subtotal'),
+        ('desconto', 'desconto'),
+        ('total', 'total'),
+    ],
+    'itens': [
+        ('orcamento_id', 'orcamento_id'),
+        ('numero', 'orcamento__numero'),
+        ('ano', 'orcamento__ano'),
+        ('item_id', 'id'),
+        ('produto_id', 'produto_id'),
+        ('servico_id', 'servico_id'),
+        ('quantidade', 'quantidade'),
+        ('preco_unitario', 'preco_unitario'),
+        ('total', 'valor_total'),
+    ],
+}
+COLUNAS_NOMES = {
+    'orcamentos': [
+        ('cliente', 'cliente__razao_social'),
+        ('cliente_cpf_cnpj', 'cliente__cpf_cnpj'),
+    ],
+    'itens': [
+        ('cliente', 'orcamento__cliente__razao_social'),
+        ('produto', 'produto__nome'),
+        ('servico', 'servico__nome'),
+    ],
+}
+
+
+def _consulta(empresa_id, conjunto, params):
+    orcamentos = Orcamento.objects.da_empresa(empresa_id).filter(filtros(params))
+    if conjunto == 'orcamentos':
+        return orcamentos.order_by('criado_em', 'id')
+    return (
+        ItemOrcamento.objects.filter(orcamento_id__in=orcamentos.values('id'))
+        .annotate(valor_total=ExpressionWrapper(
+            F('quantidade') * F('preco_unitario'), output_field=DecimalField(max_digits=14, decimal_places=2),
+        ))
+        .order_by('orcamento_id', 'id')
+    )
+
+
+def colunas(conjunto, nomes=False):
+    return COLUNAS[conjunto] + (COLUNAS_NOMES[conjunto] if nomes else [])
+
+
+def linhas(empresa_id, conjunto, params, nomes=False):
+    """
+    Tuplas com os valores de colunas(conjunto, nomes), na ordem de criação.
+    Os filtros são os da listagem (cliente, de, ate, ...); levanta ValueError
+    se algum for inválido, antes de qualquer leitura.
+    """
+    if conjunto not in COLUNAS:
+        raise ValueError(f'Exportação inválida: {conjunto!r}')
+    consulta = _consulta(empresa_id, conjunto, params).values_list(
+        *[expressao for _, expressao in colunas(conjunto, nomes)]
+    )
+    return consulta.iterator(chunk_size=TAMANHO_BLOCO)
+
+
+def _valor(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor)
+    if isinstance(valor, Decimal):
+        # Todos os decimais exportados são valores em reais; o total calculado
+        # dos itens chega do SQLite sem as casas decimais fixas
+        return valor.quantize(CENTAVO)
+    return valor
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    valor = _valor(valor)
+    return valor.isoformat() if isinstance(valor, date) else valor
+
+
+class _Eco:
+    """'Arquivo' cujo write devolve o texto, para o csv.writer gerar strings."""
+
+    def write(self, texto):
+        return texto
+
+
+def gerar(empresa_id, conjunto, params, formato='csv', nomes=False):
+    """
+    Gerador de pedaços de texto com a exportação completa. Valida os
+    parâmetros já na chamada (ValueError), não na primeira leitura.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato inválido: {formato!r}')
+    valores = linhas(empresa_id, conjunto, params, nomes)
+    titulos = [titulo for titulo, _ in colunas(conjunto, nomes)]
+    return _pedacos(titulos, valores, formato)
+
+
+def _pedacos(titulos, valores, formato):
+    if formato == 'csv':
+        escritor = csv.writer(_Eco())
+        # BOM para o Excel reconhecer o UTF-8 (acentos)
+        pedaco = ['\ufeff' + escritor.writerow(titulos)]
+        formatar = lambda linha: escritor.writerow([_texto(v) for v in linha])
+    else:
+        pedaco = []
+        codificador = DjangoJSONEncoder(ensure_ascii=False)
+        formatar = lambda linha: codificador.encode({t: _valor(v) for t, v in zip(titulos, linha)}) + '\n'
+
+    for linha in valores:
+        pedaco.append(formatar(linha))
+        if len(pedaco) >= TAMANHO_BLOCO:
+            yield ''.join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Orcamento, ItemOrcamento, Empresa
+from .models import Orcamento, ItemOrcamento, Empresa, Produto, Servico
 
 class OrcamentoForm(forms.ModelForm):
     class Meta:
@@ -20,6 +20,12 @@ class ItemOrcamentoForm(forms.ModelForm):
         model = ItemOrcamento
         fields = ['produto', 'servico', 'quantidade', 'preco_unitario']
 
+    def __init__(self, *args, empresa_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Só aceita produtos e serviços da empresa ativa
+        self.fields['produto'].queryset = Produto.objects.da_empresa(empresa_id)
+        self.fields['servico'].queryset = Servico.objects.da_empresa(empresa_id)
+
     def clean(self):
         cleaned_data = super().clean()
         produto = cleaned_data.get('produto')
@@ -0,0 +1,298 @@
+import codecs
+import csv
+import functools
+import itertools
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import models, transaction
+from django.db.models import F
+
+from .models import Cliente, Empresa, Produto, Servico, TermoCliente, limpar_codigo
+from .texto import normalizar
+
+
+# Importação em lote de clientes, produtos e serviços (CSV ou XLSX). O arquivo
+# é lido linha a linha, sem carregá-lo na memória; as linhas são validadas em
+# blocos de TAMANHO_BLOCO e cada bloco é gravado com INSERT ... ON CONFLICT DO
+# UPDATE (bulk_create com update_conflicts) na chave do cadastro: o código,
+# para produtos e serviços, e o CPF/CNPJ só com dígitos, para clientes. Linhas
+# sem chave são sempre inseridas. Linhas com erro não são gravadas e voltam no
+# relatório com o número da linha no arquivo.
+#
+# Só as colunas presentes no arquivo são atualizadas nos cadastros existentes.
+# A versão (controle de concorrência das telas de edição) também muda nos
+# cadastros atualizados: quem abriu o cadastro antes da importação recebe 409
+# ao salvar, em vez de gravar por cima do que veio no arquivo.
+
+TAMANHO_BLOCO = 2000
+# O relatório traz só os primeiros erros; o total vem em 'total_erros'
+MAX_ERROS = 500
+
+CADASTROS = {
+    'clientes': {
+        'model': Cliente,
+        'chave': 'cpf_cnpj_digitos',
+        'colunas': ('razao_social', 'nome_fantasia', 'cpf_cnpj', 'telefone', 'email', 'endereco', 'cidade_uf', 'cep'),
+    },
+    'produtos': {
+        'model': Produto,
+        'chave': 'codigo',
+        'colunas': ('codigo', 'nome', 'descricao', 'preco'),
+    },
+    'servicos': {
+        'model': Servico,
+        'chave': 'codigo',
+        'colunas': ('codigo', 'nome', 'descricao', 'preco'),
+    },
+}
+
+# Outros nomes aceitos no cabeçalho (já normalizados, ver _nome_coluna)
+SINONIMOS = {
+    'nome': 'razao_social',  # só vale para clientes, onde não existe a coluna "nome"
+    'razao': 'razao_social',
+    'fantasia': 'nome_fantasia',
+    'cpf': 'cpf_cnpj',
+    'cnpj': 'cpf_cnpj',
+    'documento': 'cpf_cnpj',
+    'fone': 'telefone',
+    'celular': 'telefone',
+    'e_mail': 'email',
+    'cidade': 'cidade_uf',
+    'valor': 'preco',
+    'preco_unitario': 'preco',
+    'cod': 'codigo',
+}
+
+
+# -----------------------------
+# LEITURA
+# -----------------------------
+
+def ler_csv(arquivo, encoding='utf-8-sig', delimitador=None):
+    """
+    Linhas de um CSV aberto em modo binário. Sem delimitador informado, usa
+    ';' se a primeira linha tiver mais ';' que ',' (padrão do Excel em pt-BR).
+    """
+    linhas = codecs.iterdecode(arquivo, encoding)
+    primeira = next(linhas, '')
+    if not delimitador:
+        delimitador = ';' if primeira.count(';') > primeira.count(',') else ','
+    return csv.reader(itertools.chain([primeira], linhas), delimiter=delimitador)
+
+
+def ler_xlsx(arquivo):
+    """Linhas da primeira planilha, lidas em modo read_only (exige openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Para importar planilhas XLSX instale o pacote openpyxl, ou envie o arquivo em CSV.')
+
+    try:
+        livro = load_workbook(arquivo, read_only=True, data_only=True)
+    except Exception as erro:
+        raise ValueError(f'Planilha inválida: {erro}')
+    try:
+        for linha in livro.active.iter_rows(values_only=True):
+            yield ['' if valor is None else str(valor) for valor in linha]
+    finally:
+        livro.close()
+
+
+def ler_arquivo(arquivo, nome='', encoding='utf-8-sig', delimitador=None):
+    """Escolhe o leitor pela extensão do nome do arquivo (CSV por padrão)."""
+    if nome.lower().endswith('.xlsx'):
+        return ler_xlsx(arquivo)
+    return ler_csv(arquivo, encoding, delimitador)
+
+
+# -----------------------------
+# VALIDAÇÃO
+# -----------------------------
+
+def _nome_coluna(titulo):
+    return re.sub(r'\W+', '_', normalizar(titulo)).strip('_')
+
+
+def mapear_colunas(cabecalho, cadastro):
+    """{posição no arquivo: campo do model}; ValueError se faltar coluna obrigatória."""
+    colunas = CADASTROS[cadastro]['colunas']
+    posicoes = {}
+    for posicao, titulo in enumerate(cabecalho):
+        nome = _nome_coluna(titulo)
+        campo = nome if nome in colunas else SINONIMOS.get(nome)
+        if campo in colunas and campo not in posicoes.values():
+            posicoes[posicao] = campo
+
+    ausentes = [campo for campo in _obrigatorios(cadastro) if campo not in posicoes.values()]
+    if ausentes:
+        raise ValueError(f'Coluna obrigatória ausente no cabeçalho: {", ".join(ausentes)}.')
+    return posicoes
+
+
+@functools.cache
+def _obrigatorios(cadastro):
+    model = CADASTROS[cadastro]['model']
+    return [
+        campo for campo in CADASTROS[cadastro]['colunas']
+        if not model._meta.get_field(campo).blank and not model._meta.get_field(campo).has_default()
+    ]
+
+
+def _decimal(valor, campo):
+    valor = valor.replace('R$', '').replace(' ', '')
+    if ',' in valor:
+        # 1.234,56
+        valor = valor.replace('.', '').replace(',', '.')
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise ValueError('valor inválido')
+    if not numero.is_finite():
+        raise ValueError('valor inválido')
+    if numero < 0:
+        raise ValueError('não pode ser negativo')
+    limite = Decimal(10) ** (campo.max_digits - campo.decimal_places)
+    if numero >= limite:
+        raise ValueError('valor alto demais')
+    return numero.quantize(Decimal(1).scaleb(-campo.decimal_places))
+
+
+def _converter(campo, valor):
+    valor = valor.strip()
+    if isinstance(campo, models.DecimalField):
+        return _decimal(valor, campo) if valor else campo.get_default()
+    if campo.max_length and len(valor) > campo.max_length:
+        raise ValueError(f'máximo de {campo.max_length} caracteres')
+    if valor and isinstance(campo, models.EmailField):
+        try:
+            validate_email(valor)
+        except ValidationError:
+            raise ValueError('e-mail inválido')
+    return valor
+
+
+def validar_linha(valores, posicoes, cadastro):
+    """(dict campo: valor, lista de erros) de uma linha do arquivo."""
+    model = CADASTROS[cadastro]['model']
+    dados, erros = {}, []
+    for posicao, campo in posicoes.items():
+        valor = valores[posicao] if posicao < len(valores) else ''
+        try:
+            dados[campo] = _converter(model._meta.get_field(campo), valor)
+        except ValueError as erro:
+            erros.append(f'{campo}: {erro}')
+    for campo in _obrigatorios(cadastro):
+        if campo in dados and dados[campo] in ('', None):
+            erros.append(f'{campo}: obrigatório')
+    return dados, erros
+
+
+# -----------------------------
+# GRAVAÇÃO
+# -----------------------------
+
+def _objeto(cadastro, empresa_id, dados):
+    model = CADASTROS[cadastro]['model']
+    objeto = model(empresa_id=empresa_id, **dados)
+    if model is Cliente:
+        objeto.preencher_busca()
+    else:
+        objeto.codigo = limpar_codigo(objeto.codigo)
+    return objeto
+
+
+def _campos_atualizados(cadastro, posicoes):
+    chave = CADASTROS[cadastro]['chave']
+    campos = [campo for campo in posicoes.values() if campo != chave]
+    if cadastro == 'clientes' and 'razao_social' in campos:
+        campos.append('busca_nome')
+    return campos
+
+
+def gravar_bloco(cadastro, empresa_id, objetos, campos):
+    """Upsert de um bloco de objetos válidos. Retorna quantos foram gravados."""
+    config = CADASTROS[cadastro]
+    chave = config['chave']
+
+    # A mesma chave duas vezes no bloco: vale a última linha, como se as
+    # linhas fossem gravadas uma a uma
+    por_chave, sem_chave = {}, []
+    for objeto in objetos:
+        valor = getattr(objeto, chave)
+        if valor is None:
+            sem_chave.append(objeto)
+        else:
+            # Inserido com versão 0 e acertado no UPDATE abaixo junto com os
+            # existentes, que mantêm a versão no upsert (fora de update_fields)
+            objeto.versao = 0
+            por_chave[valor] = objeto
+    objetos = list(por_chave.values()) + sem_chave
+
+    with transaction.atomic():
+        model = config['model']
+        model.objects.bulk_create(
+            objetos,
+            update_conflicts=True,
+            unique_fields=['empresa', chave],
+            update_fields=campos,
+        )
+        if por_chave:
+            model.objects.da_empresa(empresa_id).filter(**{f'{chave}__in': list(por_chave)}).update(
+                versao=F('versao') + 1,
+            )
+        if cadastro == 'clientes':
+            # Relê razão social e nome fantasia: numa atualização, o arquivo
+            # pode não trazer as duas colunas
+            TermoCliente.indexar(
+                Cliente.objects.filter(pk__in=[c.pk for c in objetos])
+                .only('id', 'empresa_id', 'razao_social', 'nome_fantasia')
+            )
+    return len(objetos)
+
+
+def importar(empresa_id, cadastro, linhas, tamanho_bloco=None):
+    """
+    Importa para a empresa as `linhas` (iterável de listas de texto, a
+    primeira é o cabeçalho) no cadastro 'clientes', 'produtos' ou 'servicos'.
+    Retorna o relatório: {'linhas', 'gravadas', 'erros', 'total_erros'}, com
+    erros no formato {'linha': n, 'mensagem': texto}. Levanta ValueError se o
+    cadastro ou o cabeçalho forem inválidos.
+    """
+    if cadastro not in CADASTROS:
+        raise ValueError(f'Cadastro inválido: {cadastro}.')
+
+    tamanho_bloco = tamanho_bloco or TAMANHO_BLOCO
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if not cabecalho:
+        raise ValueError('Arquivo vazio.')
+    posicoes = mapear_colunas(cabecalho, cadastro)
+    campos = _campos_atualizados(cadastro, posicoes)
+
+    relatorio = {'linhas': 0, 'gravadas': 0, 'erros': [], 'total_erros': 0}
+    bloco = []
+    # A linha 1 é o cabeçalho
+    for numero, valores in enumerate(linhas, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        relatorio['linhas'] += 1
+        dados, erros = validar_linha(valores, posicoes, cadastro)
+        if erros:
+            relatorio['total_erros'] += 1
+            if len(relatorio['erros']) < MAX_ERROS:
+                relatorio['erros'].append({'linha': numero, 'mensagem': '; '.join(erros)})
+            continue
+        bloco.append(_objeto(cadastro, empresa_id, dados))
+        if len(bloco) >= tamanho_bloco:
+            relatorio['gravadas'] += gravar_bloco(cadastro, empresa_id, bloco, campos)
+            bloco = []
+    if bloco:
+        relatorio['gravadas'] += gravar_bloco(cadastro, empresa_id, bloco, campos)
+
+    if relatorio['gravadas']:
+        # bulk_create não dispara os sinais de save: invalida os caches uma vez só
+        Empresa.nova_geracao_cadastros(empresa_id)
+    return relatorio
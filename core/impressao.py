@@ -0,0 +1,103 @@
+import hashlib
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import get_template, render_to_string
+from django.template.loader_tags import ExtendsNode, IncludeNode
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Orcamento
+from .serializadores import serializar_item
+
+
+# O HTML de impressão de um orçamento só muda quando muda o orçamento ou seus
+# itens (atualizado_em), os dados da empresa, cliente ou catálogo
+# (Empresa.geracao_cadastros) ou o próprio template. A chave do cache combina
+# os três, então nada precisa ser apagado: versões antigas só expiram.
+
+TEMPLATE = 'imprimir.html'
+
+
+@lru_cache(maxsize=8)
+def _hash_arquivo(caminho, modificado_em):
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.sha1(arquivo.read()).hexdigest()[:12]
+
+
+@lru_cache(maxsize=64)
+def _dependencias(nome, modificado_em):
+    """Templates que `nome` estende ou inclui com nome fixo ({% extends %}/{% include %})."""
+    nodelist = get_template(nome).template.nodelist
+    expressoes = [no.parent_name for no in nodelist.get_nodes_by_type(ExtendsNode)]
+    expressoes += [no.template for no in nodelist.get_nodes_by_type(IncludeNode)]
+    return tuple(e.var for e in expressoes if isinstance(e.var, str) and not e.filters)
+
+
+def hash_template(nome=TEMPLATE):
+    """
+    Hash do conteúdo do template e dos que ele estende ou inclui, para a chave
+    do cache mudar junto com qualquer um deles. Templates escolhidos por uma
+    variável ficam de fora: mudanças neles só valem depois de limpar o cache.
+    """
+    partes, pendentes, vistos = [], [nome], set()
+    while pendentes:
+        atual = pendentes.pop(0)
+        if atual in vistos:
+            continue
+        vistos.add(atual)
+        caminho = get_template(atual).origin.name
+        modificado_em = os.path.getmtime(caminho)
+        partes.append(_hash_arquivo(caminho, modificado_em))
+        pendentes += _dependencias(atual, modificado_em)
+    return hashlib.sha1(''.join(partes).encode()).hexdigest()[:12]
+
+
+def versao(orcamento):
+    """Identificador desta versão do documento (também usado como ETag)."""
+    partes = (
+        orcamento.id,
+        orcamento.atualizado_em.timestamp(),
+        orcamento.empresa.geracao_cadastros,
+        hash_template(),
+    )
+    return hashlib.sha1(repr(partes).encode()).hexdigest()
+
+
+def renderizar(orcamento_id):
+    orcamento = Orcamento.objects.com_itens().select_related('empresa').get(id=orcamento_id)
+    itens = [
+        {**serializar_item(item), 'quantidade': item.quantidade, 'total': item.total}
+        for item in orcamento.itens.all()
+    ]
+    return render_to_string(TEMPLATE, {'orcamento': orcamento, 'itens': itens})
+
+
+def documento(orcamento):
+    """HTML do orçamento, do cache quando esta versão já foi renderizada."""
+    chave = f'impressao:{orcamento.id}:{versao(orcamento)}'
+    html = cache.get(chave)
+    if html is None:
+        html = renderizar(orcamento.id)
+        cache.set(chave, html, getattr(settings, 'IMPRESSAO_CACHE_TIMEOUT', 7 * 24 * 3600))
+    return html
+
+
+def responder(request, orcamento):
+    """
+    Resposta da impressão com ETag: se o navegador já tem esta versão devolve
+    304 sem renderizar nem ler os itens. Sem Last-Modified: a data tem só
+    segundos e não acompanha empresa nem template, então um If-Modified-Since
+    poderia confirmar uma cópia antiga.
+    """
+    etag = f'"{versao(orcamento)}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(documento(orcamento))
+    response['ETag'] = etag
+    # Sempre revalidar: o orçamento pode mudar, mas a revalidação é barata
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,124 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Orcamento
+from .paginacao import paginar
+
+
+# Ordenações aceitas em ?ordem=; todas terminam no id para a chave ser única
+# e cada uma é coberta por um índice que começa na empresa
+ORDENACOES = {
+    'recentes': ('-criado_em', '-id'),
+    'antigos': ('criado_em', 'id'),
+    'maior_valor': ('-total', '-id'),
+    'menor_valor': ('total', 'id'),
+}
+ORDEM_PADRAO = 'recentes'
+TAMANHO_PAGINA = 25
+TAMANHO_PAGINA_MAXIMO = 100
+
+
+# -----------------------------
+# LEITURA DOS PARÂMETROS
+# -----------------------------
+
+def _data(params, campo):
+    valor = params.get(campo)
+    if not valor:
+        return None
+    data = parse_date(valor)
+    if data is None:
+        raise ValueError(f"Data inválida em {campo}: {valor!r}")
+    return data
+
+
+def _valor(params, campo):
+    valor = params.get(campo)
+    if not valor:
+        return None
+    try:
+        return Decimal(valor.replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido em {campo}: {valor!r}")
+
+
+def _inicio_do_dia(data):
+    return timezone.make_aware(datetime.combine(data, time.min))
+
+
+def filtros(params):
+    """Filtro (Q) a partir dos parâmetros da URL. Levanta ValueError se algum for inválido."""
+    filtro = Q()
+    cliente = params.get('cliente')
+    if cliente:
+        if not cliente.isdigit():
+            raise ValueError(f"Cliente inválido: {cliente!r}")
+        filtro &= Q(cliente_id=int(cliente))
+
+    # Intervalo de criação em dias locais, como limites do datetime para usar o índice
+    de, ate = _data(params, 'de'), _data(params, 'ate')
+    if de:
+        filtro &= Q(criado_em__gte=_inicio_do_dia(de))
+    if ate:
+        filtro &= Q(criado_em__lt=_inicio_do_dia(ate + timedelta(days=1)))
+
+    valor_min, valor_max = _valor(params, 'valor_min'), _valor(params, 'valor_max')
+    if valor_min is not None:
+        filtro &= Q(total__gte=valor_min)
+    if valor_max is not None:
+        filtro &= Q(total__lte=valor_max)
+
+    entrega_de, entrega_ate = _data(params, 'entrega_de'), _data(params, 'entrega_ate')
+    if entrega_de:
+        filtro &= Q(previsao_entrega__gte=entrega_de)
+    if entrega_ate:
+        filtro &= Q(previsao_entrega__lte=entrega_ate)
+    return filtro
+
+
+def tamanho_pagina(pedido=None):
+    try:
+        tamanho = int(pedido) if pedido else TAMANHO_PAGINA
+    except (TypeError, ValueError):
+        tamanho = TAMANHO_PAGINA
+    return max(1, min(tamanho, TAMANHO_PAGINA_MAXIMO))
+
+
+# -----------------------------
+# PÁGINA
+# -----------------------------
+
+def listar_orcamentos(empresa_id, params):
+    """
+    Uma página dos orçamentos da empresa, filtrada e ordenada conforme os
+    parâmetros (cliente, de, ate, valor_min, valor_max, entrega_de,
+    entrega_ate, ordem, limite, cursor). Retorna (orçamentos, próximo cursor).
+    """
+    ordem = ORDENACOES.get(params.get('ordem') or ORDEM_PADRAO)
+    if ordem is None:
+        raise ValueError(f"Ordenação inválida: {params.get('ordem')!r}")
+
+    orcamentos = (
+        Orcamento.objects.da_empresa(empresa_id).filter(filtros(params))
+        .select_related('cliente')
+        .defer('servicos_descricao', 'escopo', 'observacao')
+    )
+    return paginar(orcamentos, ordem, tamanho_pagina(params.get('limite')), params.get('cursor'))
+
+
+def serializar(orcamento):
+    return {
+        'id': orcamento.id,
+        'numero': orcamento.numero,
+        'ano': orcamento.ano,
+        'cliente_id': orcamento.cliente_id,
+        'cliente': orcamento.cliente.razao_social,
+        'solicitante': orcamento.solicitante,
+        'criado_em': timezone.localtime(orcamento.criado_em).isoformat(),
+        'previsao_entrega': orcamento.previsao_entrega.isoformat() if orcamento.previsao_entrega else None,
+        'total': float(orcamento.total),
+    }
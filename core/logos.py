@@ -0,0 +1,68 @@
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+# Versões do logo geradas no upload (ver Empresa.save). Cada uma é gravada ao
+# lado do original com o hash do conteúdo no nome, então a URL muda sempre que
+# a imagem muda e pode ser servida com cache de longo prazo.
+#
+# campo: (largura máxima, altura máxima, formato); formato None = PNG se o
+# logo tem transparência, senão JPEG
+DERIVADOS = {
+    'logo_impressao': (600, 240, None),  # 80px de altura no papel a ~300 dpi
+    'logo_cabecalho': (240, 80, None),  # 40px no cabeçalho, em telas de alta densidade
+    'logo_webp': (240, 80, 'WEBP'),
+}
+EXTENSOES = {'PNG': 'png', 'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def _tem_transparencia(imagem):
+    return imagem.mode in ('RGBA', 'LA', 'PA') or (imagem.mode == 'P' and 'transparency' in imagem.info)
+
+
+def _reduzir(imagem, largura, altura, formato):
+    transparente = _tem_transparencia(imagem)
+    imagem = imagem.convert('RGBA' if transparente else 'RGB')
+    imagem.thumbnail((largura, altura), Image.LANCZOS)
+
+    formato = formato or ('PNG' if transparente else 'JPEG')
+    saida = io.BytesIO()
+    if formato == 'JPEG':
+        imagem.save(saida, 'JPEG', quality=85, optimize=True, progressive=True)
+    elif formato == 'WEBP':
+        imagem.save(saida, 'WEBP', quality=82, method=6)
+    else:
+        imagem.save(saida, 'PNG', optimize=True)
+    return saida.getvalue(), EXTENSOES[formato]
+
+
+def gerar_derivados(arquivo, storage, pasta='logos'):
+    """
+    Gera as versões do logo a partir de `arquivo` (qualquer objeto de arquivo
+    legível) e as grava no storage. Retorna {campo: nome no storage}, ou {}
+    se o arquivo não for uma imagem válida.
+    """
+    try:
+        arquivo.seek(0)
+        with Image.open(arquivo) as original:
+            original.load()
+            imagem = ImageOps.exif_transpose(original)
+    except (OSError, ValueError):
+        return {}
+    finally:
+        arquivo.seek(0)
+
+    nomes = {}
+    for campo, (largura, altura, formato) in DERIVADOS.items():
+        conteudo, extensao = _reduzir(imagem, largura, altura, formato)
+        resumo = hashlib.sha256(conteudo).hexdigest()[:16]
+        nome = posixpath.join(pasta, f'{resumo}-{campo.removeprefix("logo_")}.{extensao}')
+        # Mesmo conteúdo, mesmo nome: reenviar o mesmo logo não duplica arquivos
+        if not storage.exists(nome):
+            nome = storage.save(nome, ContentFile(conteudo))
+        nomes[campo] = nome
+    return nomes
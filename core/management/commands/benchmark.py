@@ -0,0 +1,210 @@
+import json
+import platform
+import random
+import time
+from statistics import mean
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metricas import MedidorConsultas, percentil
+from core.models import Cliente, ItemOrcamento, Orcamento, Produto, Servico, UserEmpresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede as rotas mais usadas pelo cliente de testes do Django (latência "
+        "p50/p90/p99 e consultas por requisição) com os dados de uma empresa, "
+        "de preferência gerados por gerar_dados_sinteticos. Tudo roda em uma "
+        "transação desfeita no final, então o banco não muda e execuções "
+        "seguidas são comparáveis. O resultado pode ser gravado em JSON (--saida)."
+    )
+
+    ROTAS = (
+        "dashboard", "listar_orcamentos", "criar_orcamento", "editar_orcamento",
+        "autocomplete_cliente", "autocomplete_produto_servico", "imprimir_orcamento", "configuracoes",
+    )
+    # Respondem 200 com {"status": "erro"} quando a gravação falha
+    ROTAS_JSON = ("criar_orcamento", "editar_orcamento")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", default="benchmark")
+        parser.add_argument("--empresa", type=int, help="padrão: a primeira empresa do usuário")
+        parser.add_argument("--repeticoes", type=int, default=50, help="requisições medidas por rota")
+        parser.add_argument("--aquecimento", type=int, default=3, help="requisições descartadas por rota")
+        parser.add_argument("--rotas", nargs="+", choices=self.ROTAS, help="padrão: todas")
+        parser.add_argument("--semente", type=int, default=42)
+        parser.add_argument("--saida", help="arquivo JSON com o resultado")
+
+    def handle(self, *args, **options):
+        if options["repeticoes"] < 1 or options["aquecimento"] < 0:
+            raise CommandError("--repeticoes precisa ser pelo menos 1 e --aquecimento não pode ser negativo.")
+        try:
+            usuario = User.objects.get(username=options["usuario"])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário {options['usuario']} não existe (ver gerar_dados_sinteticos).")
+        empresas = UserEmpresa.objects.filter(user=usuario).order_by("id").values_list("empresa_id", flat=True)
+        empresa_id = options["empresa"] or empresas.first()
+        if empresa_id not in empresas:
+            raise CommandError("O usuário não tem vínculo com a empresa informada.")
+
+        self.rng = random.Random(options["semente"])
+        self.dados = self._amostras(empresa_id)
+        if not self.dados["clientes"] or not self.dados["orcamentos"] or not self.dados["catalogo"]:
+            raise CommandError("A empresa precisa ter clientes, produtos/serviços e orçamentos.")
+
+        cliente = Client()
+        cliente.force_login(usuario)
+        sessao = cliente.session
+        sessao["empresa_id"] = empresa_id
+        sessao.save()
+
+        resultado = {
+            "data": timezone.now().isoformat(),
+            "ambiente": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "banco": connection.vendor,
+            },
+            "empresa": empresa_id,
+            "volumes": self._volumes(empresa_id),
+            "repeticoes": options["repeticoes"],
+            "rotas": {},
+        }
+        with override_settings(ALLOWED_HOSTS=["testserver", *settings.ALLOWED_HOSTS]), transaction.atomic():
+            for rota in options["rotas"] or self.ROTAS:
+                resultado["rotas"][rota] = self._medir(cliente, rota, options["repeticoes"], options["aquecimento"])
+                self._imprimir(rota, resultado["rotas"][rota])
+            transaction.set_rollback(True)
+
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['saida']}"))
+
+    # -----------------------------
+    # DADOS DE ENTRADA
+    # -----------------------------
+
+    def _amostras(self, empresa_id):
+        """Ids e termos de busca sorteados entre os dados da empresa."""
+        clientes = list(
+            Cliente.objects.da_empresa(empresa_id).order_by("?").values_list("id", "razao_social")[:200]
+        )
+        produtos = list(Produto.objects.da_empresa(empresa_id).order_by("?").values_list("id", "nome", "preco")[:200])
+        servicos = list(Servico.objects.da_empresa(empresa_id).order_by("?").values_list("id", "nome", "preco")[:200])
+        orcamentos = list(Orcamento.objects.da_empresa(empresa_id).order_by("?").values_list("id", flat=True)[:500])
+        return {
+            "clientes": [id for id, _ in clientes],
+            "termos_cliente": [nome[:3] for _, nome in clientes] or ["a"],
+            "catalogo": [("produto", id, preco) for id, _, preco in produtos]
+            + [("servico", id, preco) for id, _, preco in servicos],
+            "termos_catalogo": [nome[:3] for _, nome, _ in produtos + servicos] or ["a"],
+            "orcamentos": orcamentos,
+        }
+
+    def _volumes(self, empresa_id):
+        return {
+            "clientes": Cliente.objects.da_empresa(empresa_id).count(),
+            "produtos": Produto.objects.da_empresa(empresa_id).count(),
+            "servicos": Servico.objects.da_empresa(empresa_id).count(),
+            "orcamentos": Orcamento.objects.da_empresa(empresa_id).count(),
+            "itens": ItemOrcamento.objects.da_empresa(empresa_id).count(),
+        }
+
+    def _post_orcamento(self):
+        itens = [self.rng.choice(self.dados["catalogo"]) for _ in range(self.rng.randint(1, 8))]
+        return {
+            "cliente": self.rng.choice(self.dados["clientes"]),
+            "solicitante": "Benchmark", "previsao_entrega": "", "vencimento": "",
+            "forma_pagamento": "PIX", "responsavel": "", "observacao": "",
+            "desconto": "0",
+            "itens": json.dumps([
+                {"id_item": id, "tipo": tipo, "quantidade": self.rng.randint(1, 5), "valor_unitario": str(preco)}
+                for tipo, id, preco in itens
+            ]),
+        }
+
+    def _requisicao(self, cliente, rota):
+        rng, dados = self.rng, self.dados
+        if rota == "criar_orcamento":
+            return cliente.post(reverse("core:criar_orcamento"), self._post_orcamento())
+        if rota == "editar_orcamento":
+            url = reverse("core:editar_orcamento", args=[rng.choice(dados["orcamentos"])])
+            return cliente.post(url, self._post_orcamento())
+        if rota == "imprimir_orcamento":
+            return cliente.get(reverse("core:imprimir_orcamento", args=[rng.choice(dados["orcamentos"])]))
+        if rota == "autocomplete_cliente":
+            return cliente.get(reverse("core:autocomplete_cliente"), {"term": rng.choice(dados["termos_cliente"])})
+        if rota == "autocomplete_produto_servico":
+            return cliente.get(
+                reverse("core:autocomplete_produto_servico"), {"term": rng.choice(dados["termos_catalogo"])},
+            )
+        return cliente.get(reverse(f"core:{rota}"))
+
+    # -----------------------------
+    # MEDIÇÃO
+    # -----------------------------
+
+    def _falhou(self, rota, resposta):
+        if resposta.status_code >= 400:
+            return True
+        return rota in self.ROTAS_JSON and resposta.json().get("status") != "ok"
+
+    def _medir(self, cliente, rota, repeticoes, aquecimento):
+        """Latência e consultas só das requisições que deram certo; as que falharam contam em "erros"."""
+        tempos, consultas, status, erros = [], [], {}, 0
+        for i in range(aquecimento + repeticoes):
+            medidor = MedidorConsultas()
+            inicio = time.perf_counter()
+            with connection.execute_wrapper(medidor):
+                resposta = self._requisicao(cliente, rota)
+            tempo = time.perf_counter() - inicio
+            if i < aquecimento:
+                continue
+            status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+            if self._falhou(rota, resposta):
+                erros += 1
+                continue
+            tempos.append(tempo * 1000)
+            consultas.append(medidor.consultas)
+
+        medida = {"status": status, "erros": erros, "latencia_ms": None, "consultas": None}
+        if not tempos:
+            return medida
+        tempos.sort()
+        consultas.sort()
+        medida["latencia_ms"] = {
+            "p50": round(percentil(tempos, 0.5), 2),
+            "p90": round(percentil(tempos, 0.9), 2),
+            "p99": round(percentil(tempos, 0.99), 2),
+            "media": round(mean(tempos), 2),
+            "max": round(tempos[-1], 2),
+        }
+        medida["consultas"] = {
+            "p50": percentil(consultas, 0.5),
+            "max": consultas[-1],
+            "media": round(mean(consultas), 1),
+        }
+        return medida
+
+    def _imprimir(self, rota, medida):
+        latencia, consultas, erros = medida["latencia_ms"], medida["consultas"], medida["erros"]
+        if latencia is None:
+            linha = f"{rota:<30} nenhuma requisição sem erro"
+        else:
+            linha = (
+                f"{rota:<30} p50 {latencia['p50']:8.2f}ms  p90 {latencia['p90']:8.2f}ms  "
+                f"p99 {latencia['p99']:8.2f}ms  consultas p50 {consultas['p50']:3d} máx {consultas['max']:3d}"
+            )
+        if erros:
+            linha += f"  ({erros} com erro: {medida['status']})"
+            self.stdout.write(self.style.WARNING(linha))
+        else:
+            self.stdout.write(linha)
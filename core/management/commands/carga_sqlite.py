@@ -0,0 +1,259 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.metricas import percentil
+
+
+# Esquema reduzido das tabelas que a criação de orçamentos toca. O teste mede
+# o SQLite em si (travas, journal, reuso de conexão), então um banco
+# temporário próprio basta e o banco da aplicação não é usado.
+ESQUEMA = """
+CREATE TABLE produto (id INTEGER PRIMARY KEY, empresa_id INTEGER NOT NULL, nome TEXT NOT NULL,
+                      preco DECIMAL NOT NULL);
+CREATE TABLE sequencia (empresa_id INTEGER NOT NULL, ano INTEGER NOT NULL, ultimo_numero INTEGER NOT NULL,
+                        PRIMARY KEY (empresa_id, ano));
+CREATE TABLE orcamento (id INTEGER PRIMARY KEY, empresa_id INTEGER NOT NULL, numero INTEGER NOT NULL,
+                        ano INTEGER NOT NULL, cliente_id INTEGER NOT NULL, criado_em TEXT NOT NULL,
+                        subtotal DECIMAL NOT NULL, desconto DECIMAL NOT NULL, total DECIMAL NOT NULL);
+CREATE INDEX orcamento_empresa_criado_idx ON orcamento (empresa_id, criado_em);
+CREATE TABLE item (id INTEGER PRIMARY KEY, orcamento_id INTEGER NOT NULL REFERENCES orcamento (id),
+                   produto_id INTEGER NOT NULL REFERENCES produto (id), quantidade INTEGER NOT NULL,
+                   preco_unitario DECIMAL NOT NULL);
+CREATE INDEX item_orcamento_idx ON item (orcamento_id);
+"""
+
+EMPRESAS = 5
+PRODUTOS = 500
+ANO = 2026
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga com leituras e gravações concorrentes em um SQLite "
+        "temporário, comparando o modo padrão (journal de rollback, conexão "
+        "nova por operação, BEGIN adiado) com o perfil de settings.SQLITE_PRAGMAS "
+        "(WAL, synchronous=NORMAL, busy_timeout..., conexão reaproveitada e "
+        "BEGIN IMMEDIATE). Cada gravação faz o que salvar_orcamento faz: confere "
+        "os produtos, reserva o número e insere orçamento e itens; cada leitura "
+        "é a primeira página da listagem com a contagem."
+    )
+
+    MODOS = ("padrao", "perfil")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--leitores", type=int, default=8, help="threads de leitura")
+        parser.add_argument("--escritores", type=int, default=4, help="threads de gravação")
+        parser.add_argument("--segundos", type=float, default=5, help="duração de cada modo")
+        parser.add_argument("--orcamentos", type=int, default=20000, help="orçamentos já gravados antes da carga")
+        parser.add_argument("--itens", type=int, default=5, help="itens por orçamento gravado")
+        parser.add_argument("--modos", nargs="+", choices=self.MODOS, help="padrão: os dois")
+        parser.add_argument("--semente", type=int, default=42)
+        parser.add_argument("--saida", help="arquivo JSON com o resultado")
+
+    def handle(self, *args, **options):
+        if options["leitores"] < 0 or options["escritores"] < 0 or options["leitores"] + options["escritores"] < 1:
+            raise CommandError("Informe pelo menos um leitor ou um escritor.")
+
+        self.options = options
+        resultado = {
+            "sqlite": sqlite3.sqlite_version,
+            "leitores": options["leitores"],
+            "escritores": options["escritores"],
+            "segundos": options["segundos"],
+            "pragmas": settings.SQLITE_PRAGMAS,
+            "modos": {},
+        }
+        for modo in options["modos"] or self.MODOS:
+            with tempfile.TemporaryDirectory() as pasta:
+                caminho = os.path.join(pasta, "carga.sqlite3")
+                self._preparar(caminho)
+                resultado["modos"][modo] = self._carga(caminho, modo)
+            self._imprimir(modo, resultado["modos"][modo])
+
+        modos = resultado["modos"]
+        if len(modos) == 2 and modos["padrao"]["gravacoes_s"]:
+            ganho = {
+                tipo: round(modos["perfil"][tipo] / modos["padrao"][tipo], 2)
+                for tipo in ("leituras_s", "gravacoes_s") if modos["padrao"][tipo]
+            }
+            resultado["ganho"] = ganho
+            self.stdout.write(self.style.SUCCESS(
+                "Ganho do perfil: " + ", ".join(f"{tipo} x{fator}" for tipo, fator in ganho.items())
+            ))
+
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {options['saida']}"))
+
+    # -----------------------------
+    # BANCO TEMPORÁRIO
+    # -----------------------------
+
+    def _preparar(self, caminho):
+        rng = random.Random(self.options["semente"])
+        conexao = sqlite3.connect(caminho, isolation_level=None)
+        conexao.executescript(ESQUEMA)
+        conexao.execute("BEGIN")
+        conexao.executemany(
+            "INSERT INTO produto (id, empresa_id, nome, preco) VALUES (?, ?, ?, ?)",
+            [(i, i % EMPRESAS + 1, f"Produto {i}", rng.randrange(100, 10000) / 100) for i in range(1, PRODUTOS + 1)],
+        )
+        numeros = [0] * (EMPRESAS + 1)
+        inicio = datetime(ANO, 1, 1)
+        orcamentos, itens = [], []
+        for id in range(1, self.options["orcamentos"] + 1):
+            empresa = id % EMPRESAS + 1
+            numeros[empresa] += 1
+            criado_em = (inicio + timedelta(minutes=id)).isoformat()
+            orcamentos.append((id, empresa, numeros[empresa], ANO, rng.randrange(1, 500), criado_em, 0, 0, 0))
+            for _ in range(self.options["itens"]):
+                itens.append((id, rng.randrange(1, PRODUTOS + 1), rng.randint(1, 10), 1))
+        conexao.executemany("INSERT INTO orcamento VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", orcamentos)
+        conexao.executemany(
+            "INSERT INTO item (orcamento_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, ?, ?)", itens,
+        )
+        conexao.executemany(
+            "INSERT INTO sequencia VALUES (?, ?, ?)",
+            [(empresa, ANO, numeros[empresa]) for empresa in range(1, EMPRESAS + 1)],
+        )
+        conexao.execute("COMMIT")
+        conexao.close()
+
+    def _conectar(self, caminho, modo):
+        # isolation_level=None: as transações são abertas explicitamente,
+        # como o Django faz em transaction.atomic()
+        conexao = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False)
+        if modo == "perfil":
+            for nome, valor in settings.SQLITE_PRAGMAS.items():
+                conexao.execute(f"PRAGMA {nome}={valor}")
+        return conexao
+
+    # -----------------------------
+    # OPERAÇÕES
+    # -----------------------------
+
+    def _ler(self, conexao, rng):
+        empresa = rng.randrange(1, EMPRESAS + 1)
+        conexao.execute(
+            "SELECT id, numero, ano, cliente_id, criado_em, total FROM orcamento "
+            "WHERE empresa_id = ? ORDER BY criado_em DESC, id DESC LIMIT 50",
+            (empresa,),
+        ).fetchall()
+        conexao.execute("SELECT COUNT(*) FROM orcamento WHERE empresa_id = ?", (empresa,)).fetchone()
+
+    def _gravar(self, conexao, rng, modo):
+        empresa = rng.randrange(1, EMPRESAS + 1)
+        produtos = [rng.randrange(1, PRODUTOS + 1) for _ in range(self.options["itens"])]
+        conexao.execute("BEGIN IMMEDIATE" if modo == "perfil" else "BEGIN")
+        try:
+            marcadores = ", ".join("?" * len(produtos))
+            precos = dict(conexao.execute(
+                f"SELECT id, preco FROM produto WHERE id IN ({marcadores})", produtos,
+            ).fetchall())
+            conexao.execute(
+                "UPDATE sequencia SET ultimo_numero = ultimo_numero + 1 WHERE empresa_id = ? AND ano = ?",
+                (empresa, ANO),
+            )
+            numero = conexao.execute(
+                "SELECT ultimo_numero FROM sequencia WHERE empresa_id = ? AND ano = ?", (empresa, ANO),
+            ).fetchone()[0]
+            subtotal = sum(precos[p] for p in produtos)
+            id = conexao.execute(
+                "INSERT INTO orcamento (empresa_id, numero, ano, cliente_id, criado_em, subtotal, desconto, total) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                (empresa, numero, ANO, rng.randrange(1, 500), datetime.now().isoformat(), subtotal, subtotal),
+            ).lastrowid
+            conexao.executemany(
+                "INSERT INTO item (orcamento_id, produto_id, quantidade, preco_unitario) VALUES (?, ?, 1, ?)",
+                [(id, p, precos[p]) for p in produtos],
+            )
+            conexao.execute("COMMIT")
+        except BaseException:
+            if conexao.in_transaction:
+                conexao.execute("ROLLBACK")
+            raise
+
+    # -----------------------------
+    # MEDIÇÃO
+    # -----------------------------
+
+    def _carga(self, caminho, modo):
+        fim = time.perf_counter() + self.options["segundos"]
+        medidas = {"leitura": [], "gravacao": []}
+        erros = {"leitura": 0, "gravacao": 0}
+        trava = threading.Lock()
+
+        def trabalhar(tipo, semente):
+            rng = random.Random(semente)
+            tempos, falhas = [], 0
+            # No perfil a conexão fica aberta, como com CONN_MAX_AGE; no modo
+            # padrão cada operação (requisição) abre e fecha a sua
+            conexao = self._conectar(caminho, modo) if modo == "perfil" else None
+            while time.perf_counter() < fim:
+                inicio = time.perf_counter()
+                atual = conexao or self._conectar(caminho, modo)
+                try:
+                    if tipo == "leitura":
+                        self._ler(atual, rng)
+                    else:
+                        self._gravar(atual, rng, modo)
+                except sqlite3.OperationalError as erro:
+                    if "locked" not in str(erro) and "busy" not in str(erro):
+                        raise
+                    falhas += 1
+                    continue
+                finally:
+                    if conexao is None:
+                        atual.close()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            if conexao is not None:
+                conexao.close()
+            with trava:
+                medidas[tipo].extend(tempos)
+                erros[tipo] += falhas
+
+        threads = [
+            threading.Thread(target=trabalhar, args=("leitura", self.options["semente"] + i))
+            for i in range(self.options["leitores"])
+        ] + [
+            threading.Thread(target=trabalhar, args=("gravacao", self.options["semente"] + 1000 + i))
+            for i in range(self.options["escritores"])
+        ]
+        inicio = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+
+        resultado = {"duracao_s": round(duracao, 2)}
+        for tipo, plural in (("leitura", "leituras"), ("gravacao", "gravacoes")):
+            tempos = sorted(medidas[tipo])
+            resultado[f"{plural}_s"] = round(len(tempos) / duracao, 1)
+            resultado[plural] = {
+                "total": len(tempos),
+                "erros_travado": erros[tipo],
+                "p50_ms": round(percentil(tempos, 0.5), 2),
+                "p99_ms": round(percentil(tempos, 0.99), 2),
+            }
+        return resultado
+
+    def _imprimir(self, modo, medida):
+        linha = f"{modo:<8}"
+        for tipo, plural in (("leituras", "leituras_s"), ("gravacoes", "gravacoes_s")):
+            dados = medida[tipo]
+            linha += (
+                f"  {tipo} {medida[plural]:8.1f}/s (p50 {dados['p50_ms']:6.2f}ms, p99 {dados['p99_ms']:7.2f}ms, "
+                f"{dados['erros_travado']} travadas)"
+            )
+        self.stdout.write(linha)
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import Count, F
+
+
+# cadastro: (campo da chave, [(model que o referencia, campo da FK)])
+CHAVES = {
+    "Produto": ("codigo", [("ItemOrcamento", "produto")]),
+    "Servico": ("codigo", [("ItemOrcamento", "servico")]),
+    "Cliente": ("cpf_cnpj_digitos", [("Orcamento", "cliente")]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Lista os produtos e serviços com o mesmo código e os clientes com o "
+        "mesmo CPF/CNPJ na mesma empresa, que impedem a migração 0014. Com "
+        "--mesclar, mantém o cadastro mais antigo de cada chave, passa para ele "
+        "os orçamentos e itens dos repetidos e apaga os repetidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument("--mesclar", action="store_true", help="Mescla os repetidos (padrão: só lista).")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        conexao = connections[options["database"]]
+        apps = self._apps(conexao)
+
+        repetidos = []
+        for nome, (campo, _) in CHAVES.items():
+            model = apps.get_model("core", nome)
+            for empresa_id, chave, ids in self._repetidos(model, campo, options["empresa"], conexao.alias):
+                repetidos.append((nome, empresa_id, chave, ids))
+                self.stdout.write(
+                    f"{nome} da empresa {empresa_id} com {campo} {chave!r}: "
+                    f"mantém {ids[0]}, repetidos {', '.join(map(str, ids[1:]))}"
+                )
+
+        if not repetidos:
+            self.stdout.write(self.style.SUCCESS("Nenhuma chave repetida."))
+            return
+        if not options["mesclar"]:
+            raise CommandError(
+                f"{len(repetidos)} chave(s) repetida(s). Corrija os cadastros ou rode de novo com --mesclar."
+            )
+
+        with transaction.atomic(using=conexao.alias):
+            for nome, empresa_id, _, ids in repetidos:
+                self._mesclar(apps, nome, ids[0], ids[1:], conexao.alias)
+            Empresa = apps.get_model("core", "Empresa")
+            empresas = {empresa_id for _, empresa_id, _, _ in repetidos}
+            # Impressões e autocompletes guardados mostram os cadastros apagados
+            Empresa.objects.using(conexao.alias).filter(pk__in=empresas).update(
+                geracao_cadastros=F("geracao_cadastros") + 1
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(repetidos)} chave(s) mesclada(s)."))
+
+    @staticmethod
+    def _apps(conexao):
+        """Models como estão no banco: antes da 0014 as tabelas ainda não têm as colunas novas."""
+        loader = MigrationLoader(conexao)
+        aplicadas = [chave for chave in loader.applied_migrations if chave[0] == "core"]
+        if not aplicadas:
+            raise CommandError("As migrações do core ainda não foram aplicadas.")
+        return loader.project_state(max(aplicadas)).apps
+
+    @staticmethod
+    def _repetidos(model, campo, empresa_id, using):
+        cadastros = model.objects.using(using).exclude(**{f"{campo}__isnull": True}).exclude(**{campo: ""})
+        if empresa_id:
+            cadastros = cadastros.filter(empresa_id=empresa_id)
+        chaves = (
+            cadastros.values("empresa_id", campo)
+            .annotate(n=Count("id"))
+            .filter(n__gt=1)
+            .order_by("empresa_id", campo)
+        )
+        for chave in chaves:
+            ids = list(
+                model.objects.using(using).filter(empresa_id=chave["empresa_id"], **{campo: chave[campo]})
+                .order_by("id").values_list("id", flat=True)
+            )
+            yield chave["empresa_id"], chave[campo], ids
+
+    @staticmethod
+    def _mesclar(apps, nome, mantido, repetidos, using):
+        for referencia, fk in CHAVES[nome][1]:
+            apps.get_model("core", referencia).objects.using(using).filter(
+                **{f"{fk}_id__in": repetidos}
+            ).update(**{f"{fk}_id": mantido})
+        apps.get_model("core", nome).objects.using(using).filter(pk__in=repetidos).delete()
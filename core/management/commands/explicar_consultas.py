@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+
+from core.models import UserEmpresa, Orcamento
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa as principais views como um usuário da empresa e imprime o "
+        "plano de execução (EXPLAIN) de cada SELECT que elas fazem. Tudo roda "
+        "dentro de uma transação desfeita no final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuario", help="username (padrão: primeiro vínculo usuário x empresa)")
+        parser.add_argument("--empresa", type=int, help="ID da empresa ativa na sessão")
+        parser.add_argument("--termo", default="a", help="termo usado nos autocompletes")
+
+    def handle(self, *args, **options):
+        vinculos = UserEmpresa.objects.select_related("user", "empresa").order_by("id")
+        if options["usuario"]:
+            vinculos = vinculos.filter(user__username=options["usuario"])
+        if options["empresa"]:
+            vinculos = vinculos.filter(empresa_id=options["empresa"])
+        vinculo = vinculos.first()
+        if not vinculo:
+            raise CommandError("Nenhum vínculo usuário x empresa encontrado.")
+
+        try:
+            # Libera o host "testserver" do Client
+            setup_test_environment()
+        except RuntimeError:
+            pass  # já configurado (ex.: rodando dentro da suíte de testes)
+        with transaction.atomic():
+            self._explicar_views(vinculo.user, vinculo.empresa, options["termo"])
+            transaction.set_rollback(True)
+
+    def _views(self, empresa, termo):
+        views = [
+            ("dashboard", reverse("core:dashboard"), {}),
+            ("listar_orcamentos", reverse("core:listar_orcamentos"), {}),
+            ("listar_orcamentos_json", reverse("core:listar_orcamentos_json"), {"ordem": "maior_valor"}),
+            ("autocomplete_cliente", reverse("core:autocomplete_cliente"), {"term": termo}),
+            ("autocomplete_produto_servico", reverse("core:autocomplete_produto_servico"), {"term": termo}),
+        ]
+        orcamento = Orcamento.objects.filter(empresa=empresa).order_by("-id").first()
+        if orcamento:
+            views += [
+                ("obter_orcamento", reverse("core:obter_orcamento", args=[orcamento.id]), {}),
+                ("imprimir_orcamento", reverse("core:imprimir_orcamento", args=[orcamento.id]), {}),
+            ]
+        return views
+
+    def _explicar_views(self, user, empresa, termo):
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session["empresa_id"] = empresa.id
+        session.save()
+
+        prefixo = connection.ops.explain_query_prefix()
+        for nome, url, params in self._views(empresa, termo):
+            with CaptureQueriesContext(connection) as capturadas:
+                resposta = client.get(url, params)
+            selects = [
+                q["sql"] for q in capturadas.captured_queries
+                if q["sql"].lstrip().upper().startswith("SELECT")
+                and "django_session" not in q["sql"]
+                and "auth_user" not in q["sql"]
+            ]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\n== {nome} ({resposta.status_code}) - {len(capturadas)} consulta(s)"
+            ))
+            for sql in selects:
+                self.stdout.write(f"\n{sql}")
+                with connection.cursor() as cursor:
+                    cursor.execute(f"{prefixo} {sql}")
+                    for linha in cursor.fetchall():
+                        self.stdout.write("   -> " + " | ".join(str(c) for c in linha))
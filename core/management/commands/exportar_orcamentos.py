@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exportacao
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta os orçamentos ou os itens de orçamento de uma empresa em CSV "
+        "ou JSON Lines, lendo o banco em blocos (memória constante)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("conjunto", choices=sorted(exportacao.COLUNAS))
+        parser.add_argument("--empresa", type=int, required=True, help="ID da empresa")
+        parser.add_argument("--formato", choices=sorted(exportacao.FORMATOS), default="csv")
+        parser.add_argument("--de", help="criados a partir de (AAAA-MM-DD)")
+        parser.add_argument("--ate", help="criados até (AAAA-MM-DD), inclusive")
+        parser.add_argument("--cliente", help="ID do cliente")
+        parser.add_argument("--nomes", action="store_true", help="inclui nomes de cliente e produto/serviço")
+        parser.add_argument("--saida", help="arquivo de destino (padrão: saída padrão)")
+
+    def handle(self, *args, **options):
+        if not Empresa.objects.filter(pk=options["empresa"]).exists():
+            raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+
+        params = {campo: options[campo] for campo in ("de", "ate", "cliente") if options[campo]}
+        try:
+            conteudo = exportacao.gerar(
+                options["empresa"], options["conjunto"], params, options["formato"], nomes=options["nomes"],
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8", newline="") as destino:
+                destino.writelines(conteudo)
+        else:
+            for pedaco in conteudo:
+                self.stdout.write(pedaco, ending="")
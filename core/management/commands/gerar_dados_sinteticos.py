@@ -0,0 +1,188 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core import resumo
+from core.models import (
+    Cliente, Empresa, ItemOrcamento, Orcamento, Produto, SequenciaOrcamento, Servico, TermoCliente,
+    UserEmpresa,
+)
+
+
+NOMES = (
+    'Silva', 'Souza', 'Oliveira', 'Santos', 'Pereira', 'Costa', 'Almeida', 'Ribeiro', 'Carvalho',
+    'Gomes', 'Martins', 'Araújo', 'Barbosa', 'Rocha', 'Lima', 'Fernandes', 'Moreira', 'Cardoso',
+)
+RAMOS = (
+    'Comércio', 'Indústria', 'Construções', 'Transportes', 'Alimentos', 'Metalúrgica', 'Engenharia',
+    'Distribuidora', 'Materiais Elétricos', 'Climatização', 'Informática', 'Agropecuária',
+)
+SUFIXOS = ('Ltda', 'ME', 'EIRELI', 'S/A', 'EPP')
+PRODUTOS = (
+    'Parafuso', 'Porca', 'Arruela', 'Cabo', 'Disjuntor', 'Tomada', 'Interruptor', 'Tubo', 'Conexão',
+    'Registro', 'Válvula', 'Chapa', 'Perfil', 'Cantoneira', 'Tinta', 'Selante', 'Luva', 'Abraçadeira',
+)
+DETALHES = ('aço inox', 'galvanizado', 'PVC', 'cobre', '10mm', '20mm', '1/2"', '3/4"', 'branco', 'preto', '2,5mm²')
+SERVICOS = (
+    'Instalação', 'Manutenção preventiva', 'Manutenção corretiva', 'Visita técnica', 'Montagem',
+    'Pintura', 'Solda', 'Projeto', 'Laudo técnico', 'Limpeza', 'Calibração',
+)
+CIDADES = ('São Paulo/SP', 'Campinas/SP', 'Curitiba/PR', 'Belo Horizonte/MG', 'Porto Alegre/RS', 'Recife/PE')
+PAGAMENTOS = ('À vista', 'Boleto 30 dias', 'Boleto 30/60/90', 'Cartão', 'PIX')
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera empresas com clientes, produtos, serviços e orçamentos sintéticos "
+        "para testes de carga e benchmarks. Com a mesma --semente os dados "
+        "gerados são os mesmos. Cria (ou reaproveita) o usuário --usuario, "
+        "vinculado a todas as empresas geradas."
+    )
+
+    LOTE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresas", type=int, default=2)
+        parser.add_argument("--clientes", type=int, default=500, help="por empresa")
+        parser.add_argument("--produtos", type=int, default=300, help="por empresa")
+        parser.add_argument("--servicos", type=int, default=100, help="por empresa")
+        parser.add_argument("--orcamentos", type=int, default=2000, help="por empresa")
+        parser.add_argument("--itens", type=int, default=5, help="média de itens por orçamento")
+        parser.add_argument("--meses", type=int, default=24, help="período coberto pelos orçamentos")
+        parser.add_argument("--semente", type=int, default=42)
+        parser.add_argument("--usuario", default="benchmark")
+        parser.add_argument("--senha", default="benchmark")
+
+    def handle(self, *args, **options):
+        if options["clientes"] < 1 or (options["orcamentos"] and options["produtos"] + options["servicos"] < 1):
+            raise CommandError("Orçamentos precisam de pelo menos um cliente e um produto ou serviço.")
+
+        self.rng = random.Random(options["semente"])
+        usuario, criado = User.objects.get_or_create(username=options["usuario"])
+        if criado:
+            usuario.set_password(options["senha"])
+            usuario.save()
+
+        inicio = time.monotonic()
+        total = Empresa.objects.count()
+        for n in range(1, options["empresas"] + 1):
+            with transaction.atomic():
+                empresa = Empresa.objects.create(
+                    nome=f"Empresa Sintética {total + n}", cnpj=self._cnpj(total + n, 0),
+                    telefone="(11) 4000-0000", endereco="Rua Exemplo, 100",
+                )
+                UserEmpresa.objects.create(user=usuario, empresa=empresa)
+                volumes = self._gerar_empresa(empresa, usuario, options)
+            self.stdout.write(
+                f"{empresa.nome} (id {empresa.id}): " + ", ".join(f"{v} {k}" for k, v in volumes.items())
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['empresas']} empresa(s) gerada(s) em {time.monotonic() - inicio:.1f}s; "
+            f"usuário: {usuario.username}"
+        ))
+
+    # -----------------------------
+    # GERAÇÃO
+    # -----------------------------
+
+    def _cnpj(self, empresa, numero):
+        digitos = f"{empresa:04d}{numero:08d}{self.rng.randrange(100):02d}"
+        return f"{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}"
+
+    def _gerar_empresa(self, empresa, usuario, options):
+        rng = self.rng
+        clientes = []
+        for i in range(options["clientes"]):
+            sobrenome, ramo = rng.choice(NOMES), rng.choice(RAMOS)
+            cliente = Cliente(
+                empresa=empresa,
+                razao_social=f"{sobrenome} {ramo} {rng.choice(SUFIXOS)} {i + 1}",
+                nome_fantasia=f"{ramo} {sobrenome}",
+                cpf_cnpj=self._cnpj(empresa.id, i + 1),
+                telefone=f"(11) 9{rng.randrange(10 ** 7, 10 ** 8)}",
+                email=f"contato{i + 1}@{sobrenome.lower().replace('ú', 'u')}.com.br",
+                endereco=f"Av. {rng.choice(NOMES)}, {rng.randrange(1, 3000)}",
+                cidade_uf=rng.choice(CIDADES),
+                cep=f"{rng.randrange(10 ** 7, 10 ** 8)}",
+            )
+            cliente.preencher_busca()
+            clientes.append(cliente)
+        Cliente.objects.bulk_create(clientes, batch_size=self.LOTE)
+        TermoCliente.indexar(clientes)
+
+        produtos = Produto.objects.bulk_create([
+            Produto(
+                empresa=empresa, codigo=f"P{i + 1:05d}",
+                nome=f"{rng.choice(PRODUTOS)} {rng.choice(DETALHES)}",
+                preco=Decimal(rng.randrange(50, 50000)) / 100,
+            )
+            for i in range(options["produtos"])
+        ], batch_size=self.LOTE)
+        servicos = Servico.objects.bulk_create([
+            Servico(
+                empresa=empresa, codigo=f"S{i + 1:04d}",
+                nome=f"{rng.choice(SERVICOS)} {i + 1}",
+                preco=Decimal(rng.randrange(5000, 500000)) / 100,
+            )
+            for i in range(options["servicos"])
+        ], batch_size=self.LOTE)
+
+        itens = self._gerar_orcamentos(empresa, usuario, clientes, produtos, servicos, options)
+        resumo.reconstruir(empresa.id)
+        return {
+            "clientes": len(clientes), "produtos": len(produtos), "servicos": len(servicos),
+            "orcamentos": options["orcamentos"], "itens": itens,
+        }
+
+    def _gerar_orcamentos(self, empresa, usuario, clientes, produtos, servicos, options):
+        rng = self.rng
+        agora = timezone.now()
+        periodo = int(timedelta(days=30 * options["meses"]).total_seconds())
+        datas = sorted(agora - timedelta(seconds=rng.randrange(periodo)) for _ in range(options["orcamentos"]))
+
+        # Numeração por ano, como em SequenciaOrcamento.proximo_numero
+        ultimos = {}
+        orcamentos = []
+        for criado_em in datas:
+            ano = timezone.localtime(criado_em).year
+            ultimos[ano] = ultimos.get(ano, 0) + 1
+            entrega = criado_em.date() + timedelta(days=rng.randrange(1, 60))
+            orcamentos.append(Orcamento(
+                empresa=empresa, usuario=usuario, cliente=rng.choice(clientes),
+                numero=ultimos[ano], ano=ano, criado_em=criado_em,
+                previsao_entrega=entrega, vencimento=entrega + timedelta(days=30),
+                solicitante=rng.choice(NOMES), responsavel=usuario.username,
+                forma_pagamento=rng.choice(PAGAMENTOS),
+                desconto=Decimal(rng.choice((0, 0, 0, 10, 25, 50))),
+            ))
+        Orcamento.objects.bulk_create(orcamentos, batch_size=self.LOTE)
+        # auto_now_add ignora o valor informado no INSERT
+        Orcamento.objects.bulk_update(orcamentos, ["criado_em"], batch_size=self.LOTE)
+        SequenciaOrcamento.objects.bulk_create([
+            SequenciaOrcamento(empresa=empresa, ano=ano, ultimo_numero=ultimo) for ano, ultimo in ultimos.items()
+        ])
+
+        catalogo = [("produto", p) for p in produtos] + [("servico", s) for s in servicos]
+        itens, total = [], 0
+        for orcamento in orcamentos:
+            for _ in range(rng.randint(1, max(1, 2 * options["itens"] - 1))):
+                tipo, referencia = rng.choice(catalogo)
+                itens.append(ItemOrcamento(
+                    orcamento=orcamento, quantidade=rng.randint(1, 10), preco_unitario=referencia.preco,
+                    **{tipo: referencia},
+                ))
+            if len(itens) >= self.LOTE:
+                ItemOrcamento.objects.bulk_create(itens)
+                total, itens = total + len(itens), []
+        ItemOrcamento.objects.bulk_create(itens)
+        total += len(itens)
+
+        Orcamento.objects.filter(empresa=empresa).recalcular_totais()
+        return total
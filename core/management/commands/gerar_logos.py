@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from core.logos import DERIVADOS
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as versões reduzidas do logo (impressão, cabeçalho e WebP) das "
+        "empresas que ainda não as têm, como as de logos enviados antes da "
+        "migração 0013."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument(
+            "--todas",
+            action="store_true",
+            help="Regera também as versões de quem já as tem (ex.: depois de mudar os tamanhos).",
+        )
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.exclude(logo="").exclude(logo__isnull=True).order_by("id")
+        if options["empresa"]:
+            empresas = empresas.filter(pk=options["empresa"])
+        if not options["todas"]:
+            empresas = empresas.filter(logo_impressao="")
+
+        geradas = falhas = 0
+        for empresa in empresas:
+            try:
+                empresa.atualizar_derivados_logo()
+            except FileNotFoundError:
+                empresa.logo_impressao = ""
+            if not empresa.logo_impressao:
+                falhas += 1
+                self.stdout.write(f"empresa {empresa.pk}: logo ausente ou inválido ({empresa.logo.name})")
+                continue
+            # O post_save invalida as impressões guardadas da empresa
+            empresa.save(update_fields=list(DERIVADOS))
+            geradas += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Logos: {geradas} empresa(s) atualizada(s), {falhas} sem imagem válida."
+        ))
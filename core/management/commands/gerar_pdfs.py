@@ -0,0 +1,76 @@
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import documentos_pdf
+from core.models import Orcamento
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera (ou reaproveita do cache em disco) o PDF dos orçamentos criados "
+        "em um mês, usando o pool de processos de renderização. Útil para o "
+        "envio em lote no fechamento do mês."
+    )
+
+    LOTE = 200
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument("--ano", type=int, help="padrão: ano atual")
+        parser.add_argument("--mes", type=int, help="padrão: mês atual")
+        parser.add_argument("--saida", help="pasta para onde copiar os PDFs, como orcamento-<numero>-<ano>.pdf")
+
+    def handle(self, *args, **options):
+        hoje = timezone.localdate()
+        ano, mes = options["ano"] or hoje.year, options["mes"] or hoje.month
+        if not 1 <= mes <= 12:
+            raise CommandError(f"Mês inválido: {mes}")
+
+        inicio = timezone.make_aware(datetime(ano, mes, 1))
+        fim = timezone.make_aware(datetime(ano + mes // 12, mes % 12 + 1, 1))
+        orcamentos = (
+            Orcamento.objects.com_itens().select_related("empresa")
+            .filter(criado_em__gte=inicio, criado_em__lt=fim)
+            .order_by("empresa_id", "id")
+        )
+        if options["empresa"]:
+            orcamentos = orcamentos.filter(empresa_id=options["empresa"])
+
+        saida = Path(options["saida"]) if options["saida"] else None
+        if saida:
+            saida.mkdir(parents=True, exist_ok=True)
+        # Sem --empresa os arquivos de cada empresa vão para uma subpasta
+        self.subpasta_por_empresa = not options["empresa"]
+
+        inicio_execucao = time.monotonic()
+        gerados = reaproveitados = 0
+        # Em lotes: o pool trabalha num lote enquanto os itens ficam limitados na memória
+        lote = []
+        for orcamento in orcamentos.iterator(chunk_size=self.LOTE):
+            lote.append(orcamento)
+            if len(lote) == self.LOTE:
+                g, r = self._processar(lote, saida)
+                gerados, reaproveitados, lote = gerados + g, reaproveitados + r, []
+        if lote:
+            g, r = self._processar(lote, saida)
+            gerados, reaproveitados = gerados + g, reaproveitados + r
+
+        duracao = time.monotonic() - inicio_execucao
+        self.stdout.write(self.style.SUCCESS(
+            f"{mes:02d}/{ano}: {gerados} PDF(s) gerado(s), {reaproveitados} do cache, em {duracao:.1f}s."
+        ))
+
+    def _processar(self, lote, saida):
+        resultado = documentos_pdf.gerar(lote)
+        if saida:
+            for orcamento, caminho, _ in resultado:
+                destino = saida / str(orcamento.empresa_id) if self.subpasta_por_empresa else saida
+                destino.mkdir(exist_ok=True)
+                shutil.copyfile(caminho, destino / f"orcamento-{orcamento.numero}-{orcamento.ano}.pdf")
+        gerados = sum(1 for _, _, novo in resultado if novo)
+        return gerados, len(resultado) - gerados
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importacao
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa clientes, produtos ou serviços de um arquivo CSV ou XLSX para "
+        "uma empresa. Cadastros com o mesmo código (produtos e serviços) ou "
+        "CPF/CNPJ (clientes) são atualizados; os demais são criados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("cadastro", choices=sorted(importacao.CADASTROS))
+        parser.add_argument("arquivo", help="caminho do .csv ou .xlsx; a primeira linha é o cabeçalho")
+        parser.add_argument("--empresa", type=int, required=True, help="ID da empresa")
+        parser.add_argument("--encoding", default="utf-8-sig", help="codificação do CSV (padrão: utf-8-sig)")
+        parser.add_argument("--delimitador", help="separador do CSV (padrão: detecta ';' ou ',')")
+
+    def handle(self, *args, **options):
+        if not Empresa.objects.filter(pk=options["empresa"]).exists():
+            raise CommandError(f"Empresa {options['empresa']} não encontrada.")
+
+        inicio = time.monotonic()
+        try:
+            with open(options["arquivo"], "rb") as arquivo:
+                linhas = importacao.ler_arquivo(
+                    arquivo, options["arquivo"], options["encoding"], options["delimitador"]
+                )
+                relatorio = importacao.importar(options["empresa"], options["cadastro"], linhas)
+        except OSError as erro:
+            raise CommandError(f"Não foi possível ler o arquivo: {erro}")
+        except UnicodeDecodeError:
+            raise CommandError(f"O arquivo não está em {options['encoding']}; informe --encoding (ex.: latin-1).")
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        duracao = time.monotonic() - inicio
+
+        for erro in relatorio["erros"]:
+            self.stderr.write(f"Linha {erro['linha']}: {erro['mensagem']}")
+        if relatorio["total_erros"] > len(relatorio["erros"]):
+            self.stderr.write(f"... e mais {relatorio['total_erros'] - len(relatorio['erros'])} linha(s) com erro.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{relatorio['linhas']} linha(s) lida(s), {relatorio['gravadas']} cadastro(s) gravado(s), "
+            f"{relatorio['total_erros']} com erro, em {duracao:.1f}s."
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import resumo
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o resumo mensal de orçamentos (ResumoMensal) a partir dos "
+        "orçamentos e itens, ou apenas verifica se ele está divergente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, help="ID da empresa (padrão: todas)")
+        parser.add_argument(
+            "--verificar",
+            action="store_true",
+            help="Só compara o resumo com os dados; sai com erro se houver divergência.",
+        )
+
+    def handle(self, *args, **options):
+        empresa_id = options["empresa"]
+
+        if options["verificar"]:
+            divergencias = resumo.verificar(empresa_id)
+            for (empresa, ano, mes), atual, esperado in divergencias:
+                self.stdout.write(
+                    f"empresa {empresa} {mes:02d}/{ano}: "
+                    f"armazenado {self._formatar(atual)} | calculado {self._formatar(esperado)}"
+                )
+            if divergencias:
+                raise CommandError(f"{len(divergencias)} linha(s) divergente(s) no resumo mensal.")
+            self.stdout.write(self.style.SUCCESS("Resumo mensal consistente."))
+            return
+
+        linhas = resumo.reconstruir(empresa_id)
+        self.stdout.write(self.style.SUCCESS(f"Resumo mensal reconstruído: {linhas} linha(s)."))
+
+    @staticmethod
+    def _formatar(valores):
+        quantidade, valor, desconto = valores
+        return f"qtd={quantidade} valor={valor} desconto={desconto}"
@@ -0,0 +1,123 @@
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+
+# Métricas por rota (nome da URL, ex.: "core:dashboard"), coletadas pelo
+# MetricasMiddleware quando ele está ativo (settings.METRICAS). Cada processo
+# guarda as últimas `janela` medições de cada rota para os percentis e os
+# totais acumulados desde que subiu; /metrics expõe tudo no formato texto do
+# Prometheus.
+
+logger = logging.getLogger(__name__)
+
+PERCENTIS = (0.5, 0.9, 0.99)
+
+# métrica no Prometheus: (campo da medição, descrição)
+SERIES = {
+    'fluxxo_requisicao_segundos': ('tempo', 'Tempo total da requisição'),
+    'fluxxo_banco_segundos': ('tempo_banco', 'Tempo gasto em consultas ao banco'),
+    'fluxxo_consultas': ('consultas', 'Consultas ao banco por requisição'),
+    'fluxxo_resposta_bytes': ('tamanho', 'Tamanho do corpo da resposta'),
+}
+
+
+class MedidorConsultas:
+    """execute_wrapper que conta as consultas e soma o tempo gasto nelas."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def percentil(valores_ordenados, p):
+    """Percentil pelo método do posto mais próximo."""
+    if not valores_ordenados:
+        return 0
+    posicao = max(0, min(len(valores_ordenados) - 1, math.ceil(p * len(valores_ordenados)) - 1))
+    return valores_ordenados[posicao]
+
+
+class Metricas:
+    def __init__(self, janela, limite_consultas):
+        self.janela = janela
+        self.limite_consultas = limite_consultas
+        self._lock = threading.Lock()
+        self._limpar()
+
+    def _limpar(self):
+        self._medicoes = defaultdict(lambda: deque(maxlen=self.janela))
+        campos = ('requisicoes', 'acima_do_limite') + tuple(campo for campo, _ in SERIES.values())
+        self._somas = defaultdict(lambda: dict.fromkeys(campos, 0))
+
+    def limpar(self):
+        with self._lock:
+            self._limpar()
+
+    def registrar(self, rota, tempo, consultas, tempo_banco, tamanho):
+        """Guarda uma medição; devolve True se passou do limite de consultas."""
+        medicao = {'tempo': tempo, 'consultas': consultas, 'tempo_banco': tempo_banco, 'tamanho': tamanho}
+        acima = bool(self.limite_consultas) and consultas > self.limite_consultas
+        with self._lock:
+            self._medicoes[rota].append(medicao)
+            somas = self._somas[rota]
+            somas['requisicoes'] += 1
+            somas['acima_do_limite'] += acima
+            for campo, valor in medicao.items():
+                somas[campo] += valor
+        if acima:
+            logger.warning('%s fez %d consultas (limite: %d)', rota, consultas, self.limite_consultas)
+        return acima
+
+    def resumo(self):
+        """{rota: {'requisicoes', 'acima_do_limite', campo: {soma, p50, p90, p99}}}."""
+        with self._lock:
+            copia = {rota: (list(medicoes), dict(self._somas[rota])) for rota, medicoes in self._medicoes.items()}
+
+        resumo = {}
+        for rota, (medicoes, somas) in sorted(copia.items()):
+            dados = {'requisicoes': somas['requisicoes'], 'acima_do_limite': somas['acima_do_limite']}
+            for campo, _ in SERIES.values():
+                valores = sorted(m[campo] for m in medicoes)
+                dados[campo] = {'soma': somas[campo], **{p: percentil(valores, p) for p in PERCENTIS}}
+            resumo[rota] = dados
+        return resumo
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus (summaries por rota)."""
+        resumo = self.resumo()
+        linhas = []
+        for nome, (campo, descricao) in SERIES.items():
+            linhas += [f'# HELP {nome} {descricao}', f'# TYPE {nome} summary']
+            for rota, dados in resumo.items():
+                rotulo = f'rota="{rota}"'
+                for p in PERCENTIS:
+                    linhas.append(f'{nome}{{{rotulo},quantile="{p}"}} {dados[campo][p]:g}')
+                linhas.append(f'{nome}_sum{{{rotulo}}} {dados[campo]["soma"]:g}')
+                linhas.append(f'{nome}_count{{{rotulo}}} {dados["requisicoes"]}')
+
+        nome = 'fluxxo_acima_limite_consultas_total'
+        linhas += [
+            f'# HELP {nome} Requisições que passaram de METRICAS_LIMITE_CONSULTAS',
+            f'# TYPE {nome} counter',
+        ]
+        linhas += [f'{nome}{{rota="{rota}"}} {dados["acima_do_limite"]}' for rota, dados in resumo.items()]
+        return '\n'.join(linhas) + '\n'
+
+
+metricas = Metricas(
+    getattr(settings, 'METRICAS_JANELA', 1000),
+    getattr(settings, 'METRICAS_LIMITE_CONSULTAS', 30),
+)
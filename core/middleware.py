@@ -0,0 +1,147 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+
+from .metricas import MedidorConsultas, metricas
+from .models import Empresa, UserEmpresa
+
+
+# -----------------------------
+# EMPRESAS DO USUÁRIO
+# -----------------------------
+# Os vínculos usuário x empresa mudam raramente e são lidos em toda
+# requisição, então ficam no cache settings.EMPRESAS_USUARIO_CACHE;
+# signals.py apaga a entrada do usuário sempre que um UserEmpresa é criado,
+# alterado ou removido. Esse cache precisa ser compartilhado entre os
+# processos: num cache da memória de cada processo a entrada só sairia do
+# processo que removeu o vínculo, e nos outros o usuário continuaria com
+# acesso à empresa até a entrada expirar. Nesse caso o middleware lê do banco
+# em toda requisição os vínculos junto com as empresas, numa consulta só.
+
+def _chave(user_id):
+    return f'empresas_usuario:{user_id}'
+
+
+def _cache():
+    """Cache dos vínculos, ou None se o backend não é compartilhado entre processos."""
+    backend = caches[getattr(settings, 'EMPRESAS_USUARIO_CACHE', 'default')]
+    return None if isinstance(backend, (LocMemCache, DummyCache)) else backend
+
+
+def empresas_do_usuario(user_id):
+    """IDs das empresas vinculadas ao usuário, na ordem do vínculo."""
+    cache = _cache()
+    chave = _chave(user_id)
+    ids = cache.get(chave) if cache else None
+    if ids is None:
+        ids = list(
+            UserEmpresa.objects.filter(user_id=user_id).order_by('id').values_list('empresa_id', flat=True)
+        )
+        if cache:
+            cache.set(chave, ids, getattr(settings, 'EMPRESAS_USUARIO_CACHE_TIMEOUT', 300))
+    return ids
+
+
+def invalidar_empresas_do_usuario(user_id):
+    cache = _cache()
+    if cache:
+        cache.delete(_chave(user_id))
+
+
+def _empresa_escolhida(request, vinculadas):
+    try:
+        escolhida = int(request.session.get('empresa_id') or 0)
+    except (TypeError, ValueError):
+        escolhida = 0
+    if escolhida in vinculadas:
+        return escolhida
+    return vinculadas[0] if vinculadas else None
+
+
+def resolver_empresa_id(request):
+    """
+    Empresa ativa: a escolhida em selecionar_empresa (session['empresa_id'])
+    se o usuário ainda tiver vínculo com ela, senão a primeira vinculada.
+    """
+    if not request.user.is_authenticated:
+        return None
+    return _empresa_escolhida(request, empresas_do_usuario(request.user.pk))
+
+
+def _resolver_empresa(request):
+    """(empresa_id, empresa) da requisição, com no máximo uma consulta."""
+    if not request.user.is_authenticated:
+        return None, None
+    if _cache() is None:
+        # Sem cache compartilhado: vínculos e empresas na mesma consulta
+        vinculos = UserEmpresa.objects.filter(user_id=request.user.pk).select_related('empresa').order_by('id')
+        empresas = {vinculo.empresa_id: vinculo.empresa for vinculo in vinculos}
+        empresa_id = _empresa_escolhida(request, list(empresas))
+        return empresa_id, empresas.get(empresa_id)
+    empresa_id = resolver_empresa_id(request)
+    if not empresa_id:
+        return None, None
+    return empresa_id, SimpleLazyObject(lambda: Empresa.objects.get(pk=empresa_id))
+
+
+class EmpresaAtivaMiddleware:
+    """
+    Define request.empresa_id (sem consulta, a partir do cache de vínculos) e
+    request.empresa (carregada na primeira vez que for usada, com uma
+    consulta). Sem um cache compartilhado, os dois saem de uma consulta só.
+    Ambos são None quando não há empresa ativa.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        empresa_id, request.empresa = _resolver_empresa(request)
+        request.empresa_id = empresa_id
+        if empresa_id and request.session.get('empresa_id') != empresa_id:
+            # Sessão sem escolha (ou com uma empresa sem vínculo): grava a ativa
+            request.session['empresa_id'] = empresa_id
+        return self.get_response(request)
+
+
+# -----------------------------
+# MÉTRICAS
+# -----------------------------
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição (tempo total, consultas, tempo no banco e tamanho da
+    resposta), registra por rota em metricas.metricas e devolve os tempos no
+    cabeçalho Server-Timing. Só entra em MIDDLEWARE com settings.METRICAS.
+
+    Em respostas em streaming, o que é lido do banco depois dos cabeçalhos
+    (exportações, arquivos) não entra na medição.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medidor = MedidorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(medidor):
+            response = self.get_response(request)
+        tempo = time.perf_counter() - inicio
+
+        rota = request.resolver_match.view_name if request.resolver_match else '<sem rota>'
+        if response.streaming:
+            tamanho = int(response.get('Content-Length') or 0)
+        else:
+            tamanho = len(response.content)
+        metricas.registrar(rota, tempo, medidor.consultas, medidor.tempo, tamanho)
+
+        response['Server-Timing'] = (
+            f'app;dur={tempo * 1000:.1f}, '
+            f'db;dur={medidor.tempo * 1000:.1f};desc="{medidor.consultas} consultas"'
+        )
+        return response
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncMonth
+
+
+def popular_resumo(apps, schema_editor):
+    Orcamento = apps.get_model("core", "Orcamento")
+    ItemOrcamento = apps.get_model("core", "ItemOrcamento")
+    ResumoMensal = apps.get_model("core", "ResumoMensal")
+
+    linhas = {}
+    for l in (
+        Orcamento.objects.annotate(mes=TruncMonth("criado_em"))
+        .order_by()
+        .values("empresa_id", "mes")
+        .annotate(quantidade=Count("id"), desconto=Sum("desconto"))
+    ):
+        linhas[(l["empresa_id"], l["mes"].year, l["mes"].month)] = ResumoMensal(
+            empresa_id=l["empresa_id"],
+            ano=l["mes"].year,
+            mes=l["mes"].month,
+            quantidade=l["quantidade"],
+            desconto=l["desconto"] or 0,
+        )
+    for l in (
+        ItemOrcamento.objects.annotate(mes=TruncMonth("orcamento__criado_em"))
+        .order_by()
+        .values("orcamento__empresa_id", "mes")
+        .annotate(
+            valor=Sum(
+                F("quantidade") * F("preco_unitario"), output_field=DecimalField()
+            )
+        )
+    ):
+        chave = (l["orcamento__empresa_id"], l["mes"].year, l["mes"].month)
+        linhas[chave].valor_bruto = l["valor"] or 0
+    ResumoMensal.objects.bulk_create(linhas.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_empresa_logo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumoMensal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ano", models.PositiveSmallIntegerField()),
+                ("mes", models.PositiveSmallIntegerField()),
+                ("quantidade", models.IntegerField(default=0)),
+                (
+                    "valor_bruto",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "desconto",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "empresa",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.empresa"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Resumo Mensal",
+                "verbose_name_plural": "Resumos Mensais",
+                "ordering": ["empresa", "ano", "mes"],
+                "unique_together": {("empresa", "ano", "mes")},
+            },
+        ),
+        migrations.RunPython(popular_resumo, migrations.RunPython.noop),
+    ]
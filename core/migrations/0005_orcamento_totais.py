@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:49
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_totais(apps, schema_editor):
+    Orcamento = apps.get_model("core", "Orcamento")
+    ItemOrcamento = apps.get_model("core", "ItemOrcamento")
+
+    soma_itens = Coalesce(
+        Subquery(
+            ItemOrcamento.objects.filter(orcamento=OuterRef("pk"))
+            .order_by()
+            .values("orcamento")
+            .annotate(
+                t=Sum(
+                    F("quantidade") * F("preco_unitario"), output_field=DecimalField()
+                )
+            )
+            .values("t")
+        ),
+        Value(Decimal("0")),
+        output_field=DecimalField(),
+    )
+    Orcamento.objects.update(subtotal=soma_itens, total=soma_itens - F("desconto"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_resumomensal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orcamento",
+            name="subtotal",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.AddField(
+            model_name="orcamento",
+            name="total",
+            field=models.DecimalField(
+                decimal_places=2, default=0, editable=False, max_digits=14
+            ),
+        ),
+        migrations.RunPython(preencher_totais, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_ano_e_sequencias(apps, schema_editor):
+    Orcamento = apps.get_model("core", "Orcamento")
+    SequenciaOrcamento = apps.get_model("core", "SequenciaOrcamento")
+
+    # Preenche o ano e corrige números repetidos gerados pela numeração antiga
+    ultimos = {}
+    usados = set()
+    repetidos = []
+    for orcamento in Orcamento.objects.order_by("empresa_id", "numero", "id"):
+        orcamento.ano = timezone.localtime(orcamento.criado_em).year
+        chave = (orcamento.empresa_id, orcamento.ano)
+        if (chave, orcamento.numero) in usados:
+            repetidos.append(orcamento)
+        else:
+            usados.add((chave, orcamento.numero))
+            ultimos[chave] = max(ultimos.get(chave, 0), orcamento.numero)
+        orcamento.save(update_fields=["ano"])
+
+    for orcamento in repetidos:
+        chave = (orcamento.empresa_id, orcamento.ano)
+        ultimos[chave] += 1
+        orcamento.numero = ultimos[chave]
+        orcamento.save(update_fields=["numero"])
+
+    SequenciaOrcamento.objects.bulk_create(
+        SequenciaOrcamento(empresa_id=empresa_id, ano=ano, ultimo_numero=ultimo)
+        for (empresa_id, ano), ultimo in ultimos.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_orcamento_totais"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orcamento",
+            name="ano",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name="SequenciaOrcamento",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ano", models.PositiveSmallIntegerField()),
+                ("ultimo_numero", models.PositiveIntegerField(default=0)),
+                (
+                    "empresa",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.empresa"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Sequência de Orçamentos",
+                "verbose_name_plural": "Sequências de Orçamentos",
+                "unique_together": {("empresa", "ano")},
+            },
+        ),
+        migrations.RunPython(preencher_ano_e_sequencias, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="orcamento",
+            unique_together={("empresa", "ano", "numero")},
+        ),
+    ]
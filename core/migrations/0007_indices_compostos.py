@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_numeracao_por_ano"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cliente",
+            index=models.Index(
+                fields=["empresa", "razao_social"], name="cliente_empresa_razao_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orcamento",
+            index=models.Index(
+                fields=["empresa", "criado_em"], name="orcamento_empresa_criado_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orcamento",
+            index=models.Index(
+                fields=["empresa", "previsao_entrega"],
+                name="orcamento_empresa_entrega_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orcamento",
+            index=models.Index(
+                fields=["empresa", "numero"], name="orcamento_empresa_numero_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="produto",
+            index=models.Index(
+                fields=["empresa", "nome"], name="produto_empresa_nome_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="servico",
+            index=models.Index(
+                fields=["empresa", "nome"], name="servico_empresa_nome_idx"
+            ),
+        ),
+    ]
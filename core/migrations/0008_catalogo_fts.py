@@ -0,0 +1,96 @@
+from django.db import migrations
+
+# Índice de texto (FTS5) do catálogo de produtos e serviços, só no SQLite.
+# O rowid codifica o item (produto = id * 2, serviço = id * 2 + 1) e a coluna
+# "tenant" guarda o token "e<empresa_id>", para filtrar a empresa no próprio MATCH.
+# O SQL fica copiado aqui, como estava quando a migração foi escrita; core/busca.py
+# tem o mesmo SQL e recria os triggers depois de migrações que refazem as
+# tabelas do catálogo.
+
+CRIAR = [
+    """
+    CREATE VIRTUAL TABLE core_catalogo_fts USING fts5(
+        tenant, codigo, nome, preco UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '1 2 3'
+    )
+    """,
+    """
+    INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+    SELECT id * 2 + 0, 'e' || empresa_id, codigo, nome, preco FROM core_produto
+    """,
+    """
+    INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+    SELECT id * 2 + 1, 'e' || empresa_id, codigo, nome, preco FROM core_servico
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_produto_fts_ai AFTER INSERT ON core_produto BEGIN
+        INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+        VALUES (new.id * 2 + 0, 'e' || new.empresa_id, new.codigo, new.nome, new.preco);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_produto_fts_au AFTER UPDATE ON core_produto BEGIN
+        DELETE FROM core_catalogo_fts WHERE rowid = old.id * 2 + 0;
+        INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+        VALUES (new.id * 2 + 0, 'e' || new.empresa_id, new.codigo, new.nome, new.preco);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_produto_fts_ad AFTER DELETE ON core_produto BEGIN
+        DELETE FROM core_catalogo_fts WHERE rowid = old.id * 2 + 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_servico_fts_ai AFTER INSERT ON core_servico BEGIN
+        INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+        VALUES (new.id * 2 + 1, 'e' || new.empresa_id, new.codigo, new.nome, new.preco);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_servico_fts_au AFTER UPDATE ON core_servico BEGIN
+        DELETE FROM core_catalogo_fts WHERE rowid = old.id * 2 + 1;
+        INSERT INTO core_catalogo_fts (rowid, tenant, codigo, nome, preco)
+        VALUES (new.id * 2 + 1, 'e' || new.empresa_id, new.codigo, new.nome, new.preco);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_servico_fts_ad AFTER DELETE ON core_servico BEGIN
+        DELETE FROM core_catalogo_fts WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+TRIGGERS = [
+    "core_produto_fts_ai",
+    "core_produto_fts_au",
+    "core_produto_fts_ad",
+    "core_servico_fts_ai",
+    "core_servico_fts_au",
+    "core_servico_fts_ad",
+]
+
+REMOVER = [f"DROP TRIGGER IF EXISTS {nome}" for nome in TRIGGERS] + [
+    "DROP TABLE IF EXISTS core_catalogo_fts"
+]
+
+
+def _executar(comandos):
+    def executar(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in comandos:
+            schema_editor.execute(sql)
+
+    return executar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_indices_compostos"),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(CRIAR), _executar(REMOVER)),
+    ]
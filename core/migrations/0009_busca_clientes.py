@@ -0,0 +1,119 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:58
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia das funções de core/texto.py como eram quando esta migração foi
+# escrita, para que ela produza sempre o mesmo resultado.
+
+def normalizar(texto):
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+
+def so_digitos(texto):
+    return re.sub(r"\D", "", texto or "")
+
+
+def termos(*textos):
+    vistos = []
+    for texto in textos:
+        for termo in re.findall(r"\w+", normalizar(texto)):
+            if termo not in vistos:
+                vistos.append(termo)
+    return vistos
+
+
+def indexar_clientes(apps, schema_editor):
+    Cliente = apps.get_model("core", "Cliente")
+    TermoCliente = apps.get_model("core", "TermoCliente")
+
+    clientes = list(Cliente.objects.all())
+    for c in clientes:
+        c.busca_nome = normalizar(c.razao_social)[:200]
+        c.cpf_cnpj_digitos = so_digitos(c.cpf_cnpj)
+    Cliente.objects.bulk_update(
+        clientes, ["busca_nome", "cpf_cnpj_digitos"], batch_size=500
+    )
+    TermoCliente.objects.bulk_create(
+        [
+            TermoCliente(empresa_id=c.empresa_id, cliente_id=c.pk, termo=t[:100])
+            for c in clientes
+            for t in termos(c.razao_social, c.nome_fantasia)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_catalogo_fts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TermoCliente",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("termo", models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="cliente",
+            name="busca_nome",
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name="cliente",
+            name="cpf_cnpj_digitos",
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name="cliente",
+            index=models.Index(
+                fields=["empresa", "busca_nome", "id"], name="cliente_empresa_busca_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cliente",
+            index=models.Index(
+                fields=["empresa", "cpf_cnpj_digitos"], name="cliente_empresa_doc_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="termocliente",
+            name="cliente",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="termos",
+                to="core.cliente",
+            ),
+        ),
+        migrations.AddField(
+            model_name="termocliente",
+            name="empresa",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="core.empresa"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="termocliente",
+            index=models.Index(
+                fields=["empresa", "termo"], name="termocliente_empresa_termo_idx"
+            ),
+        ),
+        migrations.RunPython(indexar_clientes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_busca_clientes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="empresa",
+            name="geracao_cadastros",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_empresa_geracao_cadastros"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="orcamento",
+            index=models.Index(
+                fields=["empresa", "total"], name="orcamento_empresa_total_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_orcamento_empresa_total_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orcamento",
+            name="atualizado_em",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+# Só cria as colunas. As versões reduzidas dos logos já enviados são geradas
+# pelo comando gerar_logos (ou no próximo save da empresa), e não aqui: a
+# migração não depende do Pillow nem do código atual de core/logos.py.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_orcamento_atualizado_em"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="empresa",
+            name="logo_cabecalho",
+            field=models.ImageField(blank=True, editable=False, upload_to="logos/"),
+        ),
+        migrations.AddField(
+            model_name="empresa",
+            name="logo_impressao",
+            field=models.ImageField(blank=True, editable=False, upload_to="logos/"),
+        ),
+        migrations.AddField(
+            model_name="empresa",
+            name="logo_webp",
+            field=models.ImageField(blank=True, editable=False, upload_to="logos/"),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+from django.db import migrations, models
+from django.db.models import Count
+
+CHAVES = (("Produto", "codigo"), ("Servico", "codigo"), ("Cliente", "cpf_cnpj_digitos"))
+
+
+def conferir_chaves(apps, schema_editor):
+    """
+    Código ou CPF/CNPJ vazio vira NULL e fica fora das restrições de
+    unicidade (a aplicação já grava assim). Chaves repetidas na mesma empresa
+    não são alteradas: a migração para e lista os cadastros, que precisam
+    ser corrigidos (outro código, documento revisto ou cadastro mesclado com
+    o comando chaves_repetidas --mesclar) antes de rodar o migrate de novo.
+    """
+    conflitos = []
+    for nome, campo in CHAVES:
+        model = apps.get_model("core", nome)
+        model.objects.filter(**{campo: ""}).update(**{campo: None})
+        repetidos = (
+            model.objects.exclude(**{campo: None})
+            .values("empresa_id", campo)
+            .annotate(n=Count("id"))
+            .filter(n__gt=1)
+            .order_by("empresa_id", campo)
+        )
+        for chave in repetidos:
+            ids = model.objects.filter(
+                empresa_id=chave["empresa_id"], **{campo: chave[campo]}
+            ).order_by("id").values_list("id", flat=True)
+            conflitos.append(
+                f"{nome} da empresa {chave['empresa_id']} com {campo} "
+                f"{chave[campo]!r}: ids {', '.join(map(str, ids))}"
+            )
+    if conflitos:
+        raise RuntimeError(
+            "Cadastros com a mesma chave na mesma empresa:\n  " + "\n  ".join(conflitos)
+            + "\nCorrija-os, ou mescle cada grupo no cadastro mais antigo com "
+            "'python manage.py chaves_repetidas --mesclar', e rode o migrate de novo."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_logo_derivados"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="cliente",
+            name="cliente_empresa_doc_idx",
+        ),
+        migrations.AlterField(
+            model_name="cliente",
+            name="cpf_cnpj_digitos",
+            field=models.CharField(
+                blank=True, editable=False, max_length=50, null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="produto",
+            name="codigo",
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name="servico",
+            name="codigo",
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.RunPython(conferir_chaves, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cliente",
+            constraint=models.UniqueConstraint(
+                fields=("empresa", "cpf_cnpj_digitos"), name="cliente_empresa_doc_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="produto",
+            constraint=models.UniqueConstraint(
+                fields=("empresa", "codigo"), name="produto_empresa_codigo_uniq"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="servico",
+            constraint=models.UniqueConstraint(
+                fields=("empresa", "codigo"), name="servico_empresa_codigo_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_chaves_importacao"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cliente",
+            name="versao",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="orcamento",
+            name="versao",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="produto",
+            name="versao",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name="servico",
+            name="versao",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# Índices das buscas do autocomplete no PostgreSQL (no SQLite o catálogo usa
+# o FTS5 da migração 0008). core_catalogo_busca() devolve código e nome sem
+# acentos, em minúsculas e com a pontuação trocada por espaços, precedidos de
+# um espaço: "prefixo de uma palavra" vira LIKE '% termo%', que o índice de
+# trigramas atende. unaccent() não é IMMUTABLE e por isso não entra direto
+# num índice; a função envolve a chamada com o dicionário fixo.
+#
+# Os prefixos de TermoCliente e do CPF/CNPJ usam LIKE 'abc%', que só usa
+# B-tree com varchar_pattern_ops quando a collation do banco não é "C".
+
+TABELAS = ("core_produto", "core_servico")
+
+CRIAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION core_catalogo_busca(codigo text, nome text) RETURNS text AS $$
+        SELECT ' ' || regexp_replace(
+            lower(public.unaccent('public.unaccent'::regdictionary, coalesce(codigo, '') || ' ' || nome)),
+            '[^[:alnum:]]+', ' ', 'g'
+        )
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    """,
+] + [
+    f"CREATE INDEX {tabela}_busca_trgm_idx ON {tabela} USING gin (core_catalogo_busca(codigo, nome) gin_trgm_ops)"
+    for tabela in TABELAS
+] + [
+    "CREATE INDEX termocliente_empresa_termo_like_idx ON core_termocliente (empresa_id, termo varchar_pattern_ops)",
+    "CREATE INDEX cliente_empresa_doc_like_idx ON core_cliente (empresa_id, cpf_cnpj_digitos varchar_pattern_ops)",
+]
+
+REMOVER = [
+    "DROP INDEX IF EXISTS cliente_empresa_doc_like_idx",
+    "DROP INDEX IF EXISTS termocliente_empresa_termo_like_idx",
+] + [
+    f"DROP INDEX IF EXISTS {tabela}_busca_trgm_idx" for tabela in TABELAS
+] + ["DROP FUNCTION IF EXISTS core_catalogo_busca(text, text)"]
+
+
+def _executar(comandos):
+    def executar(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in comandos:
+            schema_editor.execute(sql)
+
+    return executar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_versao"),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(CRIAR), _executar(REMOVER)),
+    ]
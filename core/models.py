@@ -1,6 +1,11 @@
-from django.db import models
-from datetime import date
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import DecimalField, F, OuterRef, Prefetch, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from decimal import Decimal
 from django.contrib.auth.models import User
+from .logos import DERIVADOS as DERIVADOS_LOGO, gerar_derivados
+from .texto import normalizar, so_digitos, termos
 
 # ------------------------
 # EMPRESA
@@ -11,10 +16,40 @@ class Empresa(models.Model):
     telefone = models.CharField(max_length=20, blank=True, null=True)
     endereco = models.CharField(max_length=255, blank=True, null=True)
     logo = models.ImageField(upload_to='logos/', blank=True, null=True)
+    # Versões reduzidas do logo, geradas em save() (ver logos.py)
+    logo_impressao = models.ImageField(upload_to='logos/', blank=True, editable=False)
+    logo_cabecalho = models.ImageField(upload_to='logos/', blank=True, editable=False)
+    logo_webp = models.ImageField(upload_to='logos/', blank=True, editable=False)
+    # Incrementado a cada alteração na empresa e em seus clientes, produtos e
+    # serviços (ver signals.py); faz parte da chave do cache dos autocompletes
+    # e das impressões
+    geracao_cadastros = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.nome
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._logo_gravado = instancia.__dict__.get('logo')
+        return instancia
+
+    def save(self, *args, **kwargs):
+        logo = self.logo.name if self.logo else ''
+        if logo != (getattr(self, '_logo_gravado', None) or '') or (logo and not self.logo_impressao):
+            self.atualizar_derivados_logo()
+        super().save(*args, **kwargs)
+        self._logo_gravado = self.logo.name if self.logo else None
+
+    def atualizar_derivados_logo(self):
+        nomes = gerar_derivados(self.logo, self.logo.storage) if self.logo else {}
+        for campo in DERIVADOS_LOGO:
+            setattr(self, campo, nomes.get(campo, ''))
+
+    @classmethod
+    def nova_geracao_cadastros(cls, empresa_id):
+        cls.objects.filter(pk=empresa_id).update(geracao_cadastros=F('geracao_cadastros') + 1)
+
 
 # ------------------------
 # RELAÇÃO USUÁRIO X EMPRESA
@@ -32,19 +67,85 @@ class UserEmpresa(models.Model):
         return f"{self.user.username} - {self.empresa.nome}"
 
 
+class ConflitoVersao(Exception):
+    """O registro mudou (outra gravação) desde a versão em que foi lido."""
+
+
+def limpar_codigo(codigo):
+    """Código de produto/serviço sem espaços nas pontas; vazio vira None."""
+    return (codigo or '').strip() or None
+
+
+# ------------------------
+# CONSULTAS POR EMPRESA
+# ------------------------
+class EmpresaQuerySet(models.QuerySet):
+    """
+    QuerySet dos dados de uma empresa. Views buscam sempre por
+    Model.objects.da_empresa(request.empresa_id), nunca só pela chave, para o
+    filtro da empresa ir no próprio WHERE.
+    """
+    campo_empresa = 'empresa_id'
+
+    def da_empresa(self, empresa_id):
+        """Só as linhas da empresa; sem empresa ativa não retorna nada."""
+        if not empresa_id:
+            return self.none()
+        return self.filter(**{self.campo_empresa: empresa_id})
+
+    def atualizar_versao(self, pk, versao, **campos):
+        """
+        Grava `campos` na linha `pk` em um único UPDATE ... WHERE versao = ?,
+        incrementando a versão, e devolve a versão nova. Com versao=None grava
+        sem conferir. Levanta DoesNotExist se a linha não existe (ou é de outra
+        empresa) e ConflitoVersao se outra gravação chegou antes.
+        """
+        linhas = self.filter(pk=pk)
+        if versao is not None:
+            linhas = linhas.filter(versao=versao)
+        if linhas.update(versao=F('versao') + 1, **campos):
+            if versao is not None:
+                return versao + 1
+            return self.filter(pk=pk).values_list('versao', flat=True).get()
+        if self.filter(pk=pk).exists():
+            raise ConflitoVersao
+        raise self.model.DoesNotExist
+
+
 # ------------------------
 # PRODUTOS
 # ------------------------
 class Produto(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
-    codigo = models.CharField(max_length=50, blank=True)
+    # Único na empresa (chave da importação); sem código fica NULL, que não conflita
+    codigo = models.CharField(max_length=50, blank=True, null=True)
     nome = models.CharField(max_length=150)
     descricao = models.TextField(blank=True, null=True)
     preco = models.DecimalField(max_digits=10, decimal_places=2)
+    # Controle de edição concorrente: incrementada a cada gravação; as edições
+    # pelas views só gravam se ela ainda for a que o usuário leu (ver
+    # EmpresaQuerySet.atualizar_versao)
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = EmpresaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'nome'], name='produto_empresa_nome_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'codigo'], name='produto_empresa_codigo_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.nome} ({self.empresa.nome})"
 
+    def save(self, *args, **kwargs):
+        self.codigo = limpar_codigo(self.codigo)
+        if not self._state.adding:
+            self.versao += 1
+        super().save(*args, **kwargs)
+
 
 # ------------------------
 # CLIENTES
@@ -60,32 +161,200 @@ class Cliente(models.Model):
     cidade_uf = models.CharField(max_length=100, blank=True)
     cep = models.CharField(max_length=20, blank=True)
 
+    # Colunas de busca, derivadas em save(): razão social sem acentos e em
+    # minúsculas (ordem do autocomplete) e o CPF/CNPJ só com dígitos, que é
+    # único na empresa (NULL quando não informado)
+    busca_nome = models.CharField(max_length=200, blank=True, editable=False)
+    cpf_cnpj_digitos = models.CharField(max_length=50, blank=True, null=True, editable=False)
+    # Como em Produto
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = EmpresaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'razao_social'], name='cliente_empresa_razao_idx'),
+            models.Index(fields=['empresa', 'busca_nome', 'id'], name='cliente_empresa_busca_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'cpf_cnpj_digitos'], name='cliente_empresa_doc_uniq'),
+        ]
+
     def __str__(self):
         return self.razao_social
 
+    def preencher_busca(self):
+        self.busca_nome = normalizar(self.razao_social)[:200]
+        self.cpf_cnpj_digitos = so_digitos(self.cpf_cnpj) or None
+
+    def save(self, *args, **kwargs):
+        self.preencher_busca()
+        if not self._state.adding:
+            self.versao += 1
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            TermoCliente.indexar([self])
+
+
+class TermoCliente(models.Model):
+    """
+    Palavras normalizadas da razão social e do nome fantasia de cada cliente,
+    para o autocomplete casar o prefixo de qualquer palavra com uma leitura
+    de intervalo no índice (empresa, termo).
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='termos')
+    termo = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'termo'], name='termocliente_empresa_termo_idx'),
+        ]
+
+    def __str__(self):
+        return self.termo
+
+    @classmethod
+    def indexar(cls, clientes):
+        """Refaz os termos dos clientes informados (também usado em gravações em lote)."""
+        clientes = [c for c in clientes if c.pk]
+        cls.objects.filter(cliente_id__in=[c.pk for c in clientes]).delete()
+        cls.objects.bulk_create([
+            cls(empresa_id=c.empresa_id, cliente_id=c.pk, termo=termo[:100])
+            for c in clientes
+            for termo in termos(c.razao_social, c.nome_fantasia)
+        ])
+
 
 # ------------------------
 # SERVIÇOS
 # ------------------------
 class Servico(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
-    codigo = models.CharField(max_length=50, blank=True)
+    # Único na empresa, como em Produto
+    codigo = models.CharField(max_length=50, blank=True, null=True)
     nome = models.CharField(max_length=200)
     preco = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     descricao = models.TextField(blank=True, null=True)
+    # Como em Produto
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = EmpresaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'nome'], name='servico_empresa_nome_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'codigo'], name='servico_empresa_codigo_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.nome} ({self.empresa.nome})"
 
+    def save(self, *args, **kwargs):
+        self.codigo = limpar_codigo(self.codigo)
+        if not self._state.adding:
+            self.versao += 1
+        super().save(*args, **kwargs)
+
+
+# ------------------------
+# NUMERAÇÃO DOS ORÇAMENTOS
+# ------------------------
+def aceita_update_returning():
+    """UPDATE ... RETURNING: PostgreSQL e SQLite a partir do 3.35."""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+class SequenciaOrcamento(models.Model):
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    ano = models.PositiveSmallIntegerField()
+    ultimo_numero = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('empresa', 'ano')
+        verbose_name = "Sequência de Orçamentos"
+        verbose_name_plural = "Sequências de Orçamentos"
+
+    def __str__(self):
+        return f"{self.empresa.nome} - {self.ano}: {self.ultimo_numero}"
+
+    @classmethod
+    def proximo_numero(cls, empresa_id, ano):
+        """
+        Reserva o próximo número da empresa no ano. O UPDATE trava a linha
+        até o fim da transação, então requisições simultâneas nunca recebem
+        o mesmo número.
+        """
+        with transaction.atomic():
+            numero = cls._incrementar(empresa_id, ano)
+            if numero is None:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(empresa_id=empresa_id, ano=ano, ultimo_numero=1)
+                    return 1
+                except IntegrityError:
+                    # Outra requisição criou a sequência ao mesmo tempo
+                    numero = cls._incrementar(empresa_id, ano)
+            return numero
+
+    @classmethod
+    def _incrementar(cls, empresa_id, ano):
+        """Soma 1 à sequência e devolve o novo número (None se ela não existe)."""
+        if aceita_update_returning():
+            # Uma consulta só
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {cls._meta.db_table} SET ultimo_numero = ultimo_numero + 1 "
+                    "WHERE empresa_id = %s AND ano = %s RETURNING ultimo_numero",
+                    [empresa_id, ano],
+                )
+                linha = cursor.fetchone()
+            return linha[0] if linha else None
+        sequencia = cls.objects.filter(empresa_id=empresa_id, ano=ano)
+        if not sequencia.update(ultimo_numero=F('ultimo_numero') + 1):
+            return None
+        return sequencia.values_list('ultimo_numero', flat=True).get()
+
 
 # ------------------------
 # ORÇAMENTO (CABEÇALHO)
 # ------------------------
+class OrcamentoQuerySet(EmpresaQuerySet):
+    def recalcular_totais(self):
+        """Regrava subtotal/total a partir dos itens, em um único UPDATE."""
+        soma_itens = Coalesce(
+            Subquery(
+                ItemOrcamento.objects.filter(orcamento=OuterRef('pk'))
+                .order_by()
+                .values('orcamento')
+                .annotate(t=Sum(F('quantidade') * F('preco_unitario'), output_field=DecimalField()))
+                .values('t')
+            ),
+            Value(Decimal('0')),
+            output_field=DecimalField(),
+        )
+        return self.update(
+            subtotal=soma_itens, total=soma_itens - F('desconto'), atualizado_em=timezone.now(),
+        )
+
+    def com_itens(self):
+        """Cliente junto no SELECT e itens (com produto/serviço) em uma consulta só."""
+        itens = ItemOrcamento.objects.select_related('produto', 'servico').order_by('id')
+        return self.select_related('cliente').prefetch_related(Prefetch('itens', queryset=itens))
+
+
 class Orcamento(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     usuario = models.ForeignKey(User, on_delete=models.CASCADE)
     numero = models.PositiveIntegerField(editable=False, unique=False)
+    ano = models.PositiveSmallIntegerField(editable=False)
     criado_em = models.DateTimeField(auto_now_add=True)
+    # Muda a cada gravação do orçamento e a cada recalcular_totais() (itens)
+    atualizado_em = models.DateTimeField(auto_now=True)
     previsao_entrega = models.DateField(null=True, blank=True)
     solicitante = models.CharField(max_length=200, blank=True)
     servicos_descricao = models.TextField(blank=True)
@@ -97,27 +366,38 @@ class Orcamento(models.Model):
     forma_pagamento = models.CharField(max_length=100, blank=True)
     vencimento = models.DateField(null=True, blank=True)
     desconto = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Totais gravados; mantidos por recalcular_totais() sempre que os itens mudam
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    # Como em Produto; mudanças nos itens pelas views também contam
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    objects = OrcamentoQuerySet.as_manager()
 
     class Meta:
         ordering = ['-criado_em']
+        unique_together = ('empresa', 'ano', 'numero')
+        indexes = [
+            models.Index(fields=['empresa', 'criado_em'], name='orcamento_empresa_criado_idx'),
+            models.Index(fields=['empresa', 'previsao_entrega'], name='orcamento_empresa_entrega_idx'),
+            models.Index(fields=['empresa', 'numero'], name='orcamento_empresa_numero_idx'),
+            models.Index(fields=['empresa', 'total'], name='orcamento_empresa_total_idx'),
+        ]
 
-    @property
-    def subtotal(self):
-        return sum([it.quantidade * float(it.preco_unitario) for it in self.itens.all()])
-
-    @property
-    def total(self):
-        return self.subtotal - float(self.desconto or 0)
+    def recalcular_totais(self):
+        Orcamento.objects.filter(pk=self.pk).recalcular_totais()
+        self.refresh_from_db(fields=['subtotal', 'total', 'atualizado_em'])
 
     def save(self, *args, **kwargs):
-        
+        self.total = Decimal(self.subtotal or 0) - Decimal(str(self.desconto or 0))
+
         if not self.numero:
-            ano = date.today().year
-            ultimo = Orcamento.objects.filter(
-                empresa=self.empresa,
-                criado_em__year=ano
-            ).order_by('-numero').first()
-            self.numero = (ultimo.numero + 1) if ultimo else 1
+            self.ano = timezone.localdate().year
+            with transaction.atomic():
+                self.numero = SequenciaOrcamento.proximo_numero(self.empresa_id, self.ano)
+                return super().save(*args, **kwargs)
+        if not self._state.adding:
+            self.versao += 1
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -127,6 +407,10 @@ class Orcamento(models.Model):
 # ------------------------
 # ITENS DO ORÇAMENTO
 # ------------------------
+class ItemOrcamentoQuerySet(EmpresaQuerySet):
+    campo_empresa = 'orcamento__empresa_id'
+
+
 class ItemOrcamento(models.Model):
     orcamento = models.ForeignKey(Orcamento, on_delete=models.CASCADE, related_name="itens")
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE, null=True, blank=True)
@@ -134,6 +418,8 @@ class ItemOrcamento(models.Model):
     quantidade = models.PositiveIntegerField(default=1)
     preco_unitario = models.DecimalField(max_digits=10, decimal_places=2)
 
+    objects = ItemOrcamentoQuerySet.as_manager()
+
     @property
     def total(self):
         return self.quantidade * self.preco_unitario
@@ -142,4 +428,23 @@ class ItemOrcamento(models.Model):
         nome = self.produto.nome if self.produto else (self.servico.nome if self.servico else "Item")
         return f"{nome} x{self.quantidade}"
 
-        
\ No newline at end of file
+
+# ------------------------
+# RESUMO MENSAL (DASHBOARD)
+# ------------------------
+class ResumoMensal(models.Model):
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    ano = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    quantidade = models.IntegerField(default=0)
+    valor_bruto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    desconto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('empresa', 'ano', 'mes')
+        ordering = ['empresa', 'ano', 'mes']
+        verbose_name = "Resumo Mensal"
+        verbose_name_plural = "Resumos Mensais"
+
+    def __str__(self):
+        return f"{self.empresa.nome} - {self.mes:02d}/{self.ano}"
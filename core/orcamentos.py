@@ -0,0 +1,164 @@
+import json
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import resumo
+from .models import Cliente, ItemOrcamento, Orcamento, Produto, Servico
+
+
+CENTAVOS = Decimal("0.01")
+
+
+# -----------------------------
+# LEITURA DO POST
+# -----------------------------
+
+def _decimal(valor, campo):
+    try:
+        return Decimal(str(valor or 0)).quantize(CENTAVOS)
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido para {campo}: {valor!r}")
+
+
+def _inteiro(valor, campo):
+    """Inteiro do POST; 2.0 é aceito, mas 2.5 ou "abc" não (nada é truncado)."""
+    try:
+        numero = Decimal(str(valor).strip())
+    except InvalidOperation:
+        numero = None
+    if numero is None or not numero.is_finite() or numero != numero.to_integral_value():
+        raise ValueError(f"{campo} deve ser um número inteiro: {valor!r}")
+    return int(numero)
+
+
+def _cabecalho(data):
+    return {
+        'cliente_id': _inteiro(data.get('cliente'), 'Cliente') if data.get('cliente') else None,
+        'solicitante': data.get('solicitante'),
+        'previsao_entrega': data.get('previsao_entrega') or None,
+        'forma_pagamento': data.get('forma_pagamento'),
+        'vencimento': data.get('vencimento') or None,
+        'observacao': data.get('observacao'),
+        'responsavel': data.get('responsavel'),
+        'desconto': _decimal(data.get('desconto', 0), 'desconto'),
+    }
+
+
+def _itens(data):
+    """Lista de (produto_id, servico_id, quantidade, preco_unitario) do JSON `itens`."""
+    itens = []
+    for item in json.loads(data.get('itens', '[]')):
+        tipo = item.get('tipo')
+        ref_id = _inteiro(item.get('id_item'), 'Item')
+        quantidade = _inteiro(item.get('quantidade') or 0, 'Quantidade')
+        if quantidade < 0:
+            raise ValueError(f"Quantidade inválida: {quantidade}")
+        preco = _decimal(item.get('valor_unitario'), 'valor unitário')
+        if tipo == 'produto':
+            itens.append((ref_id, None, quantidade, preco))
+        else:
+            itens.append((None, ref_id, quantidade, preco))
+    return itens
+
+
+def _validar_referencias(empresa_id, cliente_id, itens):
+    """Confere em até três consultas se cliente, produtos e serviços existem e são da empresa."""
+    if cliente_id is None:
+        raise ValueError("Selecione o cliente do orçamento.")
+    if not Cliente.objects.da_empresa(empresa_id).filter(id=cliente_id).exists():
+        raise ValueError(f"Cliente não encontrado: {cliente_id}")
+
+    produto_ids = {p for p, _, _, _ in itens if p}
+    servico_ids = {s for _, s, _, _ in itens if s}
+
+    if produto_ids:
+        encontrados = set(
+            Produto.objects.filter(empresa_id=empresa_id, id__in=produto_ids).values_list('id', flat=True)
+        )
+        if produto_ids - encontrados:
+            raise ValueError(f"Produto(s) não encontrado(s): {sorted(produto_ids - encontrados)}")
+    if servico_ids:
+        encontrados = set(
+            Servico.objects.filter(empresa_id=empresa_id, id__in=servico_ids).values_list('id', flat=True)
+        )
+        if servico_ids - encontrados:
+            raise ValueError(f"Serviço(s) não encontrado(s): {sorted(servico_ids - encontrados)}")
+
+
+# -----------------------------
+# GRAVAÇÃO DOS ITENS
+# -----------------------------
+
+def _sincronizar_itens(orcamento, itens, novo):
+    """
+    Aplica a lista de itens ao orçamento. Em edição compara com os itens
+    gravados e só insere, altera ou apaga o que mudou.
+    """
+    existentes = defaultdict(list)
+    if not novo:
+        for item in ItemOrcamento.objects.filter(orcamento=orcamento).order_by('id'):
+            existentes[(item.produto_id, item.servico_id)].append(item)
+
+    criar, alterar = [], []
+    for produto_id, servico_id, quantidade, preco in itens:
+        candidatos = existentes.get((produto_id, servico_id))
+        if candidatos:
+            item = candidatos.pop(0)
+            if item.quantidade != quantidade or item.preco_unitario != preco:
+                item.quantidade, item.preco_unitario = quantidade, preco
+                alterar.append(item)
+        else:
+            criar.append(ItemOrcamento(
+                orcamento=orcamento, produto_id=produto_id, servico_id=servico_id,
+                quantidade=quantidade, preco_unitario=preco,
+            ))
+
+    remover = [item.id for sobra in existentes.values() for item in sobra]
+    if remover:
+        ItemOrcamento.objects.filter(id__in=remover).delete()
+    if alterar:
+        ItemOrcamento.objects.bulk_update(alterar, ['quantidade', 'preco_unitario'])
+    if criar:
+        ItemOrcamento.objects.bulk_create(criar)
+
+
+@transaction.atomic
+def salvar_orcamento(orcamento, data):
+    """
+    Grava cabeçalho e itens de um orçamento a partir do POST do modal
+    (criação ou edição), com número constante de consultas. Na edição o
+    cabeçalho vai em um único UPDATE condicionado a orcamento.versao (a
+    versão lida); se outra gravação chegou antes levanta ConflitoVersao e
+    nada é gravado.
+    """
+    cabecalho = _cabecalho(data)
+    itens = _itens(data)
+    _validar_referencias(orcamento.empresa_id, cabecalho['cliente_id'], itens)
+
+    novo = orcamento.pk is None
+    anterior = None if novo else resumo.capturar(orcamento)
+
+    # Os totais saem da própria lista de itens
+    subtotal = sum((q * p for _, _, q, p in itens), Decimal("0"))
+    if novo:
+        for campo, valor in cabecalho.items():
+            setattr(orcamento, campo, valor)
+        orcamento.subtotal = subtotal
+        orcamento.save()
+    else:
+        campos = {
+            **cabecalho,
+            'subtotal': subtotal,
+            'total': subtotal - cabecalho['desconto'],
+            'atualizado_em': timezone.now(),
+        }
+        orcamento.versao = Orcamento.objects.atualizar_versao(orcamento.pk, orcamento.versao, **campos)
+        for campo, valor in campos.items():
+            setattr(orcamento, campo, valor)
+
+    _sincronizar_itens(orcamento, itens, novo)
+    resumo.registrar(orcamento, anterior)
+    return orcamento
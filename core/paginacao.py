@@ -0,0 +1,63 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Paginação por chave (keyset): em vez de OFFSET, cada página pede as linhas
+# que vêm depois da última linha da página anterior na mesma ordenação. Com um
+# índice que cubra a ordenação o custo da página não depende de quantas linhas
+# ficaram para trás. O cursor é a chave da última linha, em base64.
+
+
+def codificar_cursor(valores):
+    bruto = json.dumps(list(valores), default=str).encode()
+    return base64.urlsafe_b64encode(bruto).decode()
+
+
+def decodificar_cursor(model, ordem, cursor):
+    """Valores da chave guardados no cursor, convertidos para os tipos dos campos."""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(valores, list) or len(valores) != len(ordem):
+            raise ValueError
+        return [
+            model._meta.get_field(campo.lstrip('-')).to_python(valor)
+            for campo, valor in zip(ordem, valores)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        raise ValueError("Cursor inválido.")
+
+
+def depois_de(ordem, valores):
+    """
+    Filtro das linhas posteriores a `valores` na ordenação `ordem`, ex.:
+    ['-criado_em', '-id'] -> criado_em < v0 OR (criado_em = v0 AND id < v1).
+    """
+    filtro, iguais = Q(), Q()
+    for campo, valor in zip(ordem, valores):
+        nome = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        filtro |= iguais & Q(**{f'{nome}__{operador}': valor})
+        iguais &= Q(**{nome: valor})
+    return filtro
+
+
+def _valor(linha, campo):
+    nome = campo.lstrip('-')
+    return linha[nome] if isinstance(linha, dict) else getattr(linha, nome)
+
+
+def paginar(queryset, ordem, limite, cursor=None):
+    """
+    Uma página de `queryset` ordenado por `ordem` (a última coluna deve ser
+    única, normalmente o id). Retorna (linhas, cursor da próxima página ou None).
+    """
+    if cursor:
+        queryset = queryset.filter(depois_de(ordem, decodificar_cursor(queryset.model, ordem, cursor)))
+    linhas = list(queryset.order_by(*ordem)[:limite + 1])
+    if len(linhas) <= limite:
+        return linhas, None
+    linhas = linhas[:limite]
+    return linhas, codificar_cursor(_valor(linhas[-1], campo) for campo in ordem)
@@ -0,0 +1,58 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from .impressao import hash_template
+
+
+# Páginas quase estáticas (início, seleção de sistema, login, suporte) ficam
+# no cache do Django já renderizadas. A chave leva o template (e o hash do seu
+# conteúdo e dos templates que ele estende ou inclui), se há usuário logado e,
+# quando a página depende deles, o usuário e a empresa ativa com o nome e o
+# logo. O token CSRF não pode ser
+# compartilhado entre visitantes: a página é guardada com MARCADOR_CSRF no
+# lugar dele, trocado pelo token de cada requisição na entrega.
+#
+# Só GETs usam o cache, e só sem mensagens (messages) pendentes, que a página
+# mostraria uma única vez.
+
+MARCADOR_CSRF = '__token_csrf_da_requisicao__'
+
+
+def _chave(request, template, por_usuario, por_empresa):
+    partes = [template, hash_template(template), int(request.user.is_authenticated)]
+    if por_usuario:
+        partes.append(request.user.pk)
+    if por_empresa:
+        empresa = getattr(request, 'empresa', None)
+        partes += [empresa.pk, empresa.nome, empresa.logo_cabecalho.name] if empresa else [None]
+    # Nome da empresa pode ter espaços e acentos: a chave leva só o hash
+    return f'pagina:{template}:' + hashlib.md5(':'.join(str(p) for p in partes).encode()).hexdigest()
+
+
+def renderizar_em_cache(request, template, contexto=None, por_usuario=False, por_empresa=False):
+    """
+    Como render(), mas reaproveitando o HTML guardado para a mesma chave.
+    """
+    if request.method != 'GET' or len(messages.get_messages(request)):
+        return render(request, template, contexto)
+
+    chave = _chave(request, template, por_usuario, por_empresa)
+    html = cache.get(chave)
+    if html is None:
+        html = render_to_string(template, {**(contexto or {}), 'csrf_token': MARCADOR_CSRF}, request=request)
+        cache.set(chave, html, getattr(settings, 'PAGINAS_CACHE_TIMEOUT', 3600))
+
+    if MARCADOR_CSRF in html:
+        html = html.replace(MARCADOR_CSRF, get_token(request))
+    resposta = HttpResponse(html)
+    # O conteúdo muda com o login (cookie de sessão)
+    patch_vary_headers(resposta, ['Cookie'])
+    return resposta
@@ -0,0 +1,348 @@
+"""
+Gerador de PDF mínimo, em Python puro, para os orçamentos.
+
+Usa só as fontes padrão do PDF (Helvetica e Helvetica-Bold, codificação
+WinAnsi, que cobre os acentos do português) e o Pillow para o logo, então
+não depende de nenhuma biblioteca de sistema. Este módulo não importa o
+Django: roda dentro dos processos do pool recebendo apenas dicionários e
+devolvendo os bytes do arquivo (ver documentos_pdf.py).
+"""
+import io
+import unicodedata
+import zlib
+
+# Versão do layout; entra na chave do cache em disco
+VERSAO = 1
+
+LARGURA, ALTURA = 595.28, 841.89  # A4 em pontos
+MARGEM = 40
+COR_TITULO = (0.17, 0.24, 0.31)  # #2c3e50, a mesma do imprimir.html
+
+# Larguras (em milésimos do corpo) dos caracteres ASCII 32-126, das métricas AFM
+_LARGURAS = {
+    'F1': [
+        278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+        1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+        333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+        556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+    ],
+    'F2': [
+        278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+        556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+        975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+        667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+        333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+        611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+    ],
+}
+
+
+def largura_texto(texto, fonte, tamanho):
+    tabela = _LARGURAS[fonte]
+    total = 0
+    for c in texto:
+        # Letras acentuadas têm a largura da letra base
+        base = unicodedata.normalize('NFKD', c)[0]
+        codigo = ord(base)
+        total += tabela[codigo - 32] if 32 <= codigo <= 126 else 556
+    return total * tamanho / 1000
+
+
+def quebrar_linhas(texto, fonte, tamanho, largura):
+    """Quebra o texto em linhas que cabem na largura, respeitando as quebras existentes."""
+    linhas = []
+    for paragrafo in str(texto or '').splitlines() or ['']:
+        atual = ''
+        for palavra in paragrafo.split(' '):
+            candidata = f'{atual} {palavra}' if atual else palavra
+            if atual and largura_texto(candidata, fonte, tamanho) > largura:
+                linhas.append(atual)
+                atual = palavra
+            else:
+                atual = candidata
+        linhas.append(atual)
+    return linhas
+
+
+def _escapar(texto):
+    bruto = str(texto).encode('cp1252', errors='replace')
+    return bruto.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+# -----------------------------
+# PÁGINAS
+# -----------------------------
+
+class Pagina:
+    def __init__(self):
+        self.comandos = []
+        self.usa_logo = False
+
+    def texto(self, x, y, texto, fonte='F1', tamanho=10, cor=(0, 0, 0)):
+        self.comandos.append(
+            b'BT %.3f %.3f %.3f rg /%s %.1f Tf %.2f %.2f Td (%s) Tj ET'
+            % (*cor, fonte.encode(), tamanho, x, y, _escapar(texto))
+        )
+
+    def texto_direita(self, x, y, texto, fonte='F1', tamanho=10, cor=(0, 0, 0)):
+        self.texto(x - largura_texto(texto, fonte, tamanho), y, texto, fonte, tamanho, cor)
+
+    def retangulo(self, x, y, largura, altura, cor):
+        self.comandos.append(b'%.3f %.3f %.3f rg %.2f %.2f %.2f %.2f re f' % (*cor, x, y, largura, altura))
+
+    def linha(self, x1, y1, x2, y2, espessura=0.5, cor=(0.6, 0.6, 0.6)):
+        self.comandos.append(
+            b'%.3f %.3f %.3f RG %.2f w %.2f %.2f m %.2f %.2f l S' % (*cor, espessura, x1, y1, x2, y2)
+        )
+
+    def imagem(self, x, y, largura, altura):
+        self.usa_logo = True
+        self.comandos.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /Logo Do Q' % (largura, altura, x, y))
+
+    def conteudo(self):
+        return zlib.compress(b'\n'.join(self.comandos))
+
+
+def _carregar_logo(caminho, altura_max=60, largura_max=160):
+    """(jpeg, largura px, altura px, largura pt, altura pt) do logo, ou None."""
+    if not caminho:
+        return None
+    try:
+        from PIL import Image
+
+        with Image.open(caminho) as original:
+            imagem = original.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        # Resolução de impressão (~200 dpi) para o tamanho em que aparece
+        escala = min(altura_max / fundo.height, largura_max / fundo.width, 1)
+        pontos = (fundo.width * escala, fundo.height * escala)
+        pixels = (max(1, round(pontos[0] * 200 / 72)), max(1, round(pontos[1] * 200 / 72)))
+        if pixels[0] < fundo.width:
+            fundo = fundo.resize(pixels, Image.LANCZOS)
+        saida = io.BytesIO()
+        fundo.save(saida, 'JPEG', quality=85)
+        return saida.getvalue(), fundo.width, fundo.height, *pontos
+    except (OSError, ValueError):
+        return None  # logo ausente ou ilegível: o PDF sai sem ele
+
+
+def montar_pdf(paginas, logo=None):
+    """Bytes do arquivo PDF com as páginas informadas."""
+    objetos = []
+
+    def novo(conteudo):
+        objetos.append(conteudo)
+        return len(objetos)
+
+    catalogo = novo(None)
+    raiz_paginas = novo(None)
+    fontes = {
+        nome: novo(
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base
+        )
+        for nome, base in (('F1', b'Helvetica'), ('F2', b'Helvetica-Bold'))
+    }
+    recursos_logo = b''
+    if logo:
+        jpeg, largura, altura = logo[:3]
+        id_logo = novo(
+            b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+            b'/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n%s\nendstream'
+            % (largura, altura, len(jpeg), jpeg)
+        )
+        recursos_logo = b' /XObject << /Logo %d 0 R >>' % id_logo
+    recursos = b'<< /Font << /F1 %d 0 R /F2 %d 0 R >>%s >>' % (fontes['F1'], fontes['F2'], recursos_logo)
+
+    ids_paginas = []
+    for pagina in paginas:
+        conteudo = pagina.conteudo()
+        id_conteudo = novo(
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(conteudo), conteudo)
+        )
+        ids_paginas.append(novo(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources %s /Contents %d 0 R >>'
+            % (raiz_paginas, LARGURA, ALTURA, recursos, id_conteudo)
+        ))
+
+    objetos[catalogo - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % raiz_paginas
+    objetos[raiz_paginas - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(b'%d 0 R' % i for i in ids_paginas), len(ids_paginas),
+    )
+
+    saida = io.BytesIO()
+    saida.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    posicoes = []
+    for numero, conteudo in enumerate(objetos, start=1):
+        posicoes.append(saida.tell())
+        saida.write(b'%d 0 obj\n%s\nendobj\n' % (numero, conteudo))
+    inicio_xref = saida.tell()
+    saida.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1))
+    for posicao in posicoes:
+        saida.write(b'%010d 00000 n \n' % posicao)
+    saida.write(
+        b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+        % (len(objetos) + 1, catalogo, inicio_xref)
+    )
+    return saida.getvalue()
+
+
+# -----------------------------
+# ORÇAMENTO
+# -----------------------------
+
+class _Layout:
+    """Escreve de cima para baixo, abrindo páginas novas quando o espaço acaba."""
+
+    def __init__(self):
+        self.paginas = []
+        self.nova_pagina()
+
+    def nova_pagina(self):
+        self.pagina = Pagina()
+        self.paginas.append(self.pagina)
+        self.y = ALTURA - MARGEM
+
+    def reservar(self, altura):
+        if self.y - altura < MARGEM:
+            self.nova_pagina()
+            return True
+        return False
+
+    def titulo_secao(self, texto):
+        self.reservar(40)
+        self.y -= 22
+        self.pagina.texto(MARGEM, self.y, texto, 'F2', 12, COR_TITULO)
+        self.y -= 8
+
+
+# Colunas da tabela de itens: (título, x, alinhado à direita)
+_COLUNAS = (
+    ('Tipo', MARGEM + 6, False),
+    ('Descrição', MARGEM + 70, False),
+    ('Qtd', 390, True),
+    ('Valor Unit. (R$)', 470, True),
+    ('Total (R$)', LARGURA - MARGEM - 6, True),
+)
+
+
+def _cabecalho_itens(layout):
+    layout.pagina.retangulo(MARGEM, layout.y - 18, LARGURA - 2 * MARGEM, 18, COR_TITULO)
+    for titulo, x, direita in _COLUNAS:
+        escrever = layout.pagina.texto_direita if direita else layout.pagina.texto
+        escrever(x, layout.y - 13, titulo, 'F2', 9, (1, 1, 1))
+    layout.y -= 18
+
+
+def renderizar_orcamento(dados):
+    """
+    PDF de um orçamento. `dados` traz os textos já formatados:
+    {'empresa': {...}, 'orcamento': {...}, 'cliente': {...}, 'itens': [...]}
+    (ver documentos_pdf.dados_orcamento).
+    """
+    empresa, orcamento, cliente = dados['empresa'], dados['orcamento'], dados['cliente']
+    logo = _carregar_logo(empresa.get('logo_caminho'))
+    layout = _Layout()
+    pagina = layout.pagina
+    direita = LARGURA - MARGEM
+
+    # Cabeçalho: logo (ou nome) à esquerda, dados da empresa à direita
+    if logo:
+        pagina.imagem(MARGEM, layout.y - logo[4], logo[3], logo[4])
+    else:
+        pagina.texto(MARGEM, layout.y - 16, empresa['nome'], 'F2', 14, COR_TITULO)
+    y = layout.y - 10
+    for texto, fonte in (
+        (empresa['nome'], 'F2'),
+        (f"CNPJ: {empresa['cnpj']}" if empresa['cnpj'] else '', 'F1'),
+        (empresa['endereco'], 'F1'),
+        (f"Telefone: {empresa['telefone']}" if empresa['telefone'] else '', 'F1'),
+    ):
+        if texto:
+            pagina.texto_direita(direita, y, texto, fonte, 9)
+            y -= 12
+    layout.y = min(y, layout.y - (logo[4] if logo else 20)) - 8
+    pagina.linha(MARGEM, layout.y, direita, layout.y, 2, COR_TITULO)
+
+    layout.y -= 34
+    titulo = f"ORÇAMENTO Nº {orcamento['numero']}"
+    pagina.texto((LARGURA - largura_texto(titulo, 'F2', 20)) / 2, layout.y, titulo, 'F2', 20, COR_TITULO)
+
+    # Dados do orçamento em duas colunas
+    layout.y -= 14
+    campos = [
+        ('Data', orcamento['data']), ('Vencimento', orcamento['vencimento']),
+        ('Previsão de Entrega', orcamento['previsao_entrega']),
+        ('Forma de Pagamento', orcamento['forma_pagamento']),
+        ('Responsável', orcamento['responsavel']), ('Solicitante', orcamento['solicitante']),
+    ]
+    for indice, (rotulo, valor) in enumerate(campos):
+        if indice % 2 == 0:
+            layout.y -= 14
+        x = MARGEM if indice % 2 == 0 else LARGURA / 2
+        pagina.texto(x, layout.y, f'{rotulo}:', 'F2', 9)
+        pagina.texto(x + largura_texto(f'{rotulo}: ', 'F2', 9), layout.y, valor or '-', 'F1', 9)
+
+    layout.titulo_secao('Cliente')
+    for rotulo, chave in (
+        ('Razão Social', 'razao_social'), ('Nome Fantasia', 'nome_fantasia'),
+        ('CPF/CNPJ', 'cpf_cnpj'), ('Telefone', 'telefone'), ('E-mail', 'email'),
+        ('Endereço', 'endereco'),
+    ):
+        layout.y -= 14
+        layout.pagina.texto(MARGEM, layout.y, rotulo, 'F2', 9)
+        layout.pagina.texto(MARGEM + 90, layout.y, cliente.get(chave) or '', 'F1', 9)
+
+    layout.titulo_secao('Itens do Orçamento')
+    _cabecalho_itens(layout)
+    largura_descricao = 390 - 40 - (MARGEM + 70)
+    for indice, item in enumerate(dados['itens']):
+        linhas = quebrar_linhas(item['nome'], 'F1', 9, largura_descricao)
+        altura = 8 + 11 * len(linhas)
+        if layout.reservar(altura):
+            _cabecalho_itens(layout)
+        if indice % 2:
+            layout.pagina.retangulo(MARGEM, layout.y - altura, LARGURA - 2 * MARGEM, altura, (0.97, 0.97, 0.97))
+        base = layout.y - 13
+        valores = (item['tipo'], None, item['quantidade'], item['valor_unitario'], item['total'])
+        for (_, x, alinhado_direita), valor in zip(_COLUNAS, valores):
+            if valor is None:
+                for n, linha in enumerate(linhas):
+                    layout.pagina.texto(x, base - 11 * n, linha, 'F1', 9)
+            elif alinhado_direita:
+                layout.pagina.texto_direita(x, base, valor, 'F1', 9)
+            else:
+                layout.pagina.texto(x, base, valor, 'F1', 9)
+        layout.y -= altura
+
+    # Totais
+    layout.reservar(60)
+    for rotulo, valor, fonte in (
+        ('Subtotal:', orcamento['subtotal'], 'F1'),
+        ('Desconto:', orcamento['desconto'], 'F1'),
+        ('Total Final:', orcamento['total'], 'F2'),
+    ):
+        layout.y -= 16
+        layout.pagina.texto_direita(direita - 100, layout.y, rotulo, 'F2', 10, COR_TITULO)
+        layout.pagina.texto_direita(direita, layout.y, f'R$ {valor}', fonte, 10)
+
+    if orcamento.get('observacao'):
+        layout.titulo_secao('Observações')
+        for linha in quebrar_linhas(orcamento['observacao'], 'F1', 9, LARGURA - 2 * MARGEM):
+            layout.reservar(12)
+            layout.y -= 12
+            layout.pagina.texto(MARGEM, layout.y, linha, 'F1', 9)
+
+    # Assinatura
+    layout.reservar(70)
+    layout.y -= 50
+    centro = LARGURA / 2
+    layout.pagina.linha(centro - 120, layout.y, centro + 120, layout.y, 0.8, (0.2, 0.2, 0.2))
+    for texto, fonte in ((orcamento['responsavel'], 'F2'), ('Responsável', 'F1')):
+        layout.y -= 12
+        if texto:
+            layout.pagina.texto(centro - largura_texto(texto, fonte, 9) / 2, layout.y, texto, fonte, 9)
+
+    return montar_pdf(layout.paginas, logo)
@@ -0,0 +1,190 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Orcamento, ItemOrcamento, ResumoMensal
+
+
+ZERO = Decimal("0")
+VALOR_ITEM = F("quantidade") * F("preco_unitario")
+
+
+def _ano_mes(criado_em):
+    local = timezone.localtime(criado_em)
+    return local.year, local.month
+
+
+# -----------------------------
+# MANUTENÇÃO INCREMENTAL
+# -----------------------------
+
+def valores_orcamento(orcamento):
+    """(valor bruto, desconto) do orçamento, a partir dos totais gravados."""
+    return Decimal(orcamento.subtotal or 0), Decimal(str(orcamento.desconto or 0))
+
+
+def capturar(orcamento):
+    """Estado do orçamento antes de uma alteração, para calcular a diferença depois."""
+    return valores_orcamento(orcamento)
+
+
+def aplicar(empresa_id, ano, mes, quantidade=0, valor_bruto=ZERO, desconto=ZERO):
+    """Soma as diferenças na linha (empresa, ano, mês), criando-a se preciso."""
+    if not (quantidade or valor_bruto or desconto):
+        return
+
+    linha = ResumoMensal.objects.filter(empresa_id=empresa_id, ano=ano, mes=mes)
+    incremento = {
+        "quantidade": F("quantidade") + quantidade,
+        "valor_bruto": F("valor_bruto") + valor_bruto,
+        "desconto": F("desconto") + desconto,
+    }
+    if linha.update(**incremento):
+        return
+    try:
+        with transaction.atomic():
+            ResumoMensal.objects.create(
+                empresa_id=empresa_id, ano=ano, mes=mes,
+                quantidade=quantidade, valor_bruto=valor_bruto, desconto=desconto,
+            )
+    except IntegrityError:
+        # Outra requisição criou a linha no meio do caminho
+        linha.update(**incremento)
+
+
+def registrar(orcamento, anterior=None):
+    """
+    Aplica no resumo o estado atual do orçamento (chamar depois de
+    recalcular_totais). Sem `anterior` o orçamento é tratado como novo e
+    entra na contagem do mês.
+    """
+    valor, desconto = valores_orcamento(orcamento)
+    valor_antes, desconto_antes = anterior or (ZERO, ZERO)
+    aplicar(
+        orcamento.empresa_id, *_ano_mes(orcamento.criado_em),
+        quantidade=0 if anterior else 1,
+        valor_bruto=valor - valor_antes,
+        desconto=desconto - desconto_antes,
+    )
+
+
+def remover(orcamento):
+    """Retira o orçamento do resumo. Chamar antes de excluí-lo."""
+    valor, desconto = valores_orcamento(orcamento)
+    aplicar(
+        orcamento.empresa_id, *_ano_mes(orcamento.criado_em),
+        quantidade=-1, valor_bruto=-valor, desconto=-desconto,
+    )
+
+
+def capturar_lote(orcamentos):
+    """
+    Estado de vários orçamentos antes de uma alteração em lote (exclusão de
+    cliente, produto ou serviço): {id: (empresa_id, ano, mes, valor, desconto)}.
+    """
+    return {
+        o.pk: (o.empresa_id, *_ano_mes(o.criado_em), *valores_orcamento(o))
+        for o in orcamentos.only("empresa_id", "criado_em", "subtotal", "desconto")
+    }
+
+
+def registrar_lote(anteriores):
+    """
+    Aplica a diferença entre o estado capturado por capturar_lote() e o
+    atual; orçamentos que não existem mais saem da contagem. Uma atualização
+    por mês afetado, não por orçamento.
+    """
+    if not anteriores:
+        return
+    atuais = capturar_lote(Orcamento.objects.filter(pk__in=list(anteriores)))
+    diferencas = defaultdict(lambda: [0, ZERO, ZERO])
+    for estados, sinal in ((anteriores, -1), (atuais, 1)):
+        for empresa_id, ano, mes, valor, desconto in estados.values():
+            linha = diferencas[(empresa_id, ano, mes)]
+            linha[0] += sinal
+            linha[1] += sinal * valor
+            linha[2] += sinal * desconto
+    for (empresa_id, ano, mes), (quantidade, valor, desconto) in diferencas.items():
+        aplicar(empresa_id, ano, mes, quantidade=quantidade, valor_bruto=valor, desconto=desconto)
+
+
+# -----------------------------
+# RECONSTRUÇÃO / VERIFICAÇÃO
+# -----------------------------
+
+def calcular(empresa_id=None):
+    """Resumo calculado do zero: {(empresa_id, ano, mes): (quantidade, valor_bruto, desconto)}."""
+    orcamentos = Orcamento.objects.all()
+    itens = ItemOrcamento.objects.all()
+    if empresa_id:
+        orcamentos = orcamentos.filter(empresa_id=empresa_id)
+        itens = itens.filter(orcamento__empresa_id=empresa_id)
+
+    resultado = {}
+    por_mes = (
+        orcamentos.annotate(mes=TruncMonth("criado_em"))
+        .order_by()
+        .values("empresa_id", "mes")
+        .annotate(quantidade=Count("id"), desconto=Sum("desconto"))
+    )
+    for l in por_mes:
+        chave = (l["empresa_id"], l["mes"].year, l["mes"].month)
+        resultado[chave] = [l["quantidade"], ZERO, l["desconto"] or ZERO]
+
+    valores = (
+        itens.annotate(mes=TruncMonth("orcamento__criado_em"))
+        .order_by()
+        .values("orcamento__empresa_id", "mes")
+        .annotate(valor=Sum(VALOR_ITEM, output_field=DecimalField()))
+    )
+    for l in valores:
+        chave = (l["orcamento__empresa_id"], l["mes"].year, l["mes"].month)
+        resultado[chave][1] = l["valor"] or ZERO
+
+    return {chave: tuple(v) for chave, v in resultado.items()}
+
+
+def _armazenado(empresa_id=None):
+    linhas = ResumoMensal.objects.all()
+    if empresa_id:
+        linhas = linhas.filter(empresa_id=empresa_id)
+    return {
+        (r.empresa_id, r.ano, r.mes): (r.quantidade, r.valor_bruto, r.desconto)
+        for r in linhas
+    }
+
+
+def verificar(empresa_id=None):
+    """Lista de (chave, armazenado, calculado) para as linhas que divergem."""
+    calculado = calcular(empresa_id)
+    armazenado = _armazenado(empresa_id)
+    vazio = (0, ZERO, ZERO)
+    divergencias = []
+    for chave in sorted(set(calculado) | set(armazenado)):
+        esperado = calculado.get(chave, vazio)
+        atual = armazenado.get(chave, vazio)
+        if tuple(atual) != tuple(esperado):
+            divergencias.append((chave, atual, esperado))
+    return divergencias
+
+
+@transaction.atomic
+def reconstruir(empresa_id=None):
+    """Apaga e recria o resumo a partir dos orçamentos. Retorna o nº de linhas."""
+    calculado = calcular(empresa_id)
+    existentes = ResumoMensal.objects.all()
+    if empresa_id:
+        existentes = existentes.filter(empresa_id=empresa_id)
+    existentes.delete()
+    ResumoMensal.objects.bulk_create([
+        ResumoMensal(
+            empresa_id=empresa, ano=ano, mes=mes,
+            quantidade=quantidade, valor_bruto=valor, desconto=desconto,
+        )
+        for (empresa, ano, mes), (quantidade, valor, desconto) in calculado.items()
+    ])
+    return len(calculado)
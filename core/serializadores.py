@@ -0,0 +1,51 @@
+from django.shortcuts import get_object_or_404
+
+from .models import Orcamento
+
+
+# -----------------------------
+# ORÇAMENTO (MODAL DE EDIÇÃO)
+# -----------------------------
+
+def _data(valor):
+    return valor.strftime('%Y-%m-%d') if valor else ''
+
+
+def obter_orcamento_com_itens(empresa_id, orcamento_id):
+    """Orçamento da empresa com cliente e itens carregados (2 consultas), ou 404."""
+    return get_object_or_404(Orcamento.objects.da_empresa(empresa_id).com_itens(), id=orcamento_id)
+
+
+def serializar_item(item):
+    referencia = item.produto or item.servico
+    return {
+        'id_item': item.produto_id or item.servico_id,
+        'tipo': 'produto' if item.produto_id else 'servico',
+        'nome': referencia.nome if referencia else '',
+        'quantidade': float(item.quantidade),
+        'valor_unitario': float(item.preco_unitario),
+    }
+
+
+def serializar_orcamento(orcamento):
+    """
+    Dados do orçamento no formato do modal de edição. Espera um orçamento
+    vindo de Orcamento.objects.com_itens(), senão cada item gera consultas.
+    """
+    return {
+        'id': orcamento.id,
+        'numero': orcamento.numero,
+        'cliente_id': orcamento.cliente_id,
+        'cliente_nome': orcamento.cliente.razao_social if orcamento.cliente_id else '',
+        'solicitante': orcamento.solicitante,
+        'previsao_entrega': _data(orcamento.previsao_entrega),
+        'vencimento': _data(orcamento.vencimento),
+        'forma_pagamento': orcamento.forma_pagamento,
+        'responsavel': orcamento.responsavel,
+        'desconto': float(orcamento.desconto or 0),
+        'observacao': orcamento.observacao or '',
+        'subtotal': float(orcamento.subtotal),
+        'total': float(orcamento.total),
+        'versao': orcamento.versao,
+        'itens': [serializar_item(i) for i in orcamento.itens.all()],
+    }
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import busca, middleware
+from .models import Cliente, Empresa, Produto, Servico, UserEmpresa
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+@receiver([post_save, post_delete], sender=Produto)
+@receiver([post_save, post_delete], sender=Servico)
+def invalidar_autocomplete(sender, instance, **kwargs):
+    """Qualquer alteração no cadastro invalida o cache do autocomplete da empresa."""
+    Empresa.nova_geracao_cadastros(instance.empresa_id)
+
+
+@receiver(post_save, sender=Empresa)
+def invalidar_impressoes(sender, instance, **kwargs):
+    """Dados da empresa (nome, logo...) aparecem nas impressões já guardadas."""
+    Empresa.nova_geracao_cadastros(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserEmpresa)
+def invalidar_empresas_do_usuario(sender, instance, **kwargs):
+    middleware.invalidar_empresas_do_usuario(instance.user_id)
+
+
+@receiver(post_migrate)
+def refazer_triggers_fts(sender, using, **kwargs):
+    """Migrações que recriam as tabelas do catálogo no SQLite levam junto os triggers do índice."""
+    if sender.name == 'core':
+        busca.refazer_triggers_fts(using)
@@ -0,0 +1,23 @@
+import re
+import unicodedata
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos: "Instalação" -> "instalacao"."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower().strip()
+
+
+def so_digitos(texto):
+    """Só os dígitos: "12.345.678/0001-90" -> "12345678000190"."""
+    return re.sub(r'\D', '', texto or '')
+
+
+def termos(*textos):
+    """Palavras normalizadas e sem repetição dos textos informados."""
+    vistos = []
+    for texto in textos:
+        for termo in re.findall(r'\w+', normalizar(texto)):
+            if termo not in vistos:
+                vistos.append(termo)
+    return vistos
@@ -13,8 +13,11 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('selecionar-empresa/', views.selecionar_empresa, name='selecionar_empresa'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/dados/', views.dashboard_dados_json, name='dashboard_dados_json'),
     path('configuracoes/', views.configuracoes, name='configuracoes'),
+    path('configuracoes/<str:tipo>/dados/', views.listar_cadastros_json, name='listar_cadastros_json'),
     path('suporte/', views.suporte, name='suporte'),
+    path('metrics', views.metricas_prometheus, name='metricas'),
 
     # ---------------- CLIENTES ----------------
 
@@ -33,14 +36,21 @@ urlpatterns = [
     path('servicos/<int:id>/excluir/', views.excluir_servico_ajax, name='excluir_servico_ajax'),
     path('servicos/criar/', views.criar_servico_ajax, name='criar_servico_ajax'),
 
+    # ---------------- IMPORTAÇÃO ----------------
+
+    path('importar/<str:cadastro>/', views.importar_cadastros, name='importar_cadastros'),
+
     # ---------------- ORÇAMENTOS ----------------
 
     path('orcamentos/', views.listar_orcamentos, name='listar_orcamentos'),
+    path('orcamentos/dados/', views.listar_orcamentos_json, name='listar_orcamentos_json'),
+    path('orcamentos/exportar/<str:conjunto>/', views.exportar_orcamentos, name='exportar_orcamentos'),
     path('orcamentos/criar/', views.criar_orcamento, name='criar_orcamento'),
     path('orcamentos/<int:orcamento_id>/obter/', views.obter_orcamento, name='obter_orcamento'),  # <-- nova
     path('orcamentos/<int:orcamento_id>/editar/', views.editar_orcamento, name='editar_orcamento'),
     path('orcamentos/<int:orcamento_id>/excluir/', views.excluir_orcamento, name='excluir_orcamento'),
     path('orcamentos/<int:orcamento_id>/imprimir/', views.imprimir_orcamento, name='imprimir_orcamento'),
+    path('orcamentos/<int:orcamento_id>/pdf/', views.gerar_pdf, name='gerar_pdf'),
     
     #---------------- ITENS DO ORÇAMENTO ----------------
 
@@ -53,10 +63,11 @@ urlpatterns = [
     
     path('autocomplete/cliente/', views.autocomplete_cliente, name='autocomplete_cliente'),
     path('autocomplete_produto_servico/', views.autocomplete_produto_servico, name='autocomplete_produto_servico'),
+    path('autocomplete/cache/', views.autocomplete_cache_json, name='autocomplete_cache_json'),
 
     # ---------------- DETALHE ORÇAMENTO JSON ----------------
     
-    path('orcamentos/<int:id>/json/', views.orcamento_detalhe_json, name='orcamento_detalhe_json'),
+    path('orcamentos/<int:orcamento_id>/json/', views.orcamento_detalhe_json, name='orcamento_detalhe_json'),
 ]
 
 if settings.DEBUG:
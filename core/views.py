@@ -8,23 +8,35 @@ from django.db.models import Sum, F, FloatField
 from django.utils import timezone
 from datetime import timedelta
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 import json
 from . import views
+from . import cadastros, documentos_pdf, exportacao, importacao, impressao, listagem, resumo
 from .models import (
     Empresa, UserEmpresa, Cliente, Produto, Servico,
-    Orcamento, ItemOrcamento, Servico,
+    Orcamento, ItemOrcamento, Servico, TermoCliente, ConflitoVersao, limpar_codigo,
 )
 from .forms import OrcamentoForm, ItemOrcamentoForm
+from .estatisticas import estatisticas_dashboard
+from .middleware import empresas_do_usuario
+from .orcamentos import salvar_orcamento
+from .serializadores import obter_orcamento_com_itens, serializar_orcamento
+from .busca import CAMPOS_CLIENTE, buscar_catalogo, buscar_clientes, limite_autocomplete, serializar_cliente
+from .cache_busca import cache as cache_autocomplete, em_cache
+from .metricas import metricas
+from .paginas import renderizar_em_cache
 
 
 # -----------------------------
 # INDEX
 # -----------------------------
 def index(request):
-    return render(request, 'index.html')
+    return renderizar_em_cache(request, 'index.html')
 
 
 # -----------------------------
@@ -42,7 +54,7 @@ def selecionar_sistema(request):
         messages.info(request, "Sistema ainda não disponível.")
         return redirect('core:selecionar_sistema')
 
-    return render(request, 'selecionar_sistema.html')
+    return renderizar_em_cache(request, 'selecionar_sistema.html')
 
 
 # -----------------------------
@@ -60,7 +72,7 @@ def login_view(request):
         else:
             messages.error(request, "Usuário ou senha incorretos")
 
-    return render(request, 'login.html')
+    return renderizar_em_cache(request, 'login.html')
 
 @login_required
 def logout_view(request):
@@ -74,13 +86,16 @@ def logout_view(request):
 @login_required
 def selecionar_empresa(request):
     # Busca as empresas vinculadas ao usuário logado
-    empresas_vinculadas = UserEmpresa.objects.filter(user=request.user)
+    empresas_vinculadas = UserEmpresa.objects.filter(user=request.user).select_related('empresa')
 
     if request.method == 'POST':
         empresa_id = request.POST.get('empresa_id')
         if empresa_id:
-            request.session['empresa_id'] = empresa_id
-            return redirect('core:dashboard')  # ou para onde quiser depois da escolha
+            # Só aceita empresas às quais o usuário está vinculado
+            if empresa_id.isdigit() and int(empresa_id) in empresas_do_usuario(request.user.pk):
+                request.session['empresa_id'] = int(empresa_id)
+                return redirect('core:dashboard')  # ou para onde quiser depois da escolha
+            messages.error(request, "Empresa inválida.")
 
     return render(request, 'selecionar_empresa.html', {
         'empresas': empresas_vinculadas  # 👈 nome da variável usada no template
@@ -88,37 +103,24 @@ def selecionar_empresa(request):
 
 
 # -----------------------------
-# FUNÇÃO AUXILIAR
+# DASHBOARD
 # -----------------------------
 
-def get_empresa_do_usuario(user):
+def _ano_do_request(request):
     try:
-        return user.userempresa_set.first().empresa
-    except AttributeError:
+        return int(request.GET.get('ano')) if request.GET.get('ano') else None
+    except ValueError:
         return None
 
 
-# -----------------------------
-# DASHBOARD
-# -----------------------------
-
 @login_required
 def dashboard(request):
-    empresa = get_empresa_do_usuario(request.user)
+    empresa = request.empresa
     if not empresa:
-        return render(request, "core/erro.html", {"mensagem": "Nenhuma empresa associada."})
+        return render(request, "erro.html", {"mensagem": "Nenhuma empresa associada."})
 
-    # Contadores básicos
-    clientes = empresa.cliente_set.count()
-    produtos = empresa.produto_set.count()
-    servicos = empresa.servico_set.count()
-    orcamentos = empresa.orcamento_set.all()
-
-    # Soma total de todos os orçamentos (somando itens)
-    orcamentos_valor_total = (
-        ItemOrcamento.objects.filter(orcamento__empresa=empresa)
-        .aggregate(total=Sum(F("quantidade") * F("preco_unitario"), output_field=FloatField()))
-    )["total"] or 0
+    estatisticas = estatisticas_dashboard(empresa, ano=_ano_do_request(request))
+    contadores = estatisticas["contadores"]
 
     # --------------------------
     # 🔔 Alerta de orçamentos com previsão de entrega próxima
@@ -126,69 +128,101 @@ def dashboard(request):
     hoje = timezone.now().date()
     limite_alerta = hoje + timedelta(days=3)
 
-    alerta_orcamentos = orcamentos.filter(previsao_entrega__range=[hoje, limite_alerta])
-
-    # --------------------------
-    # 📊 Dados para os gráficos
-    # --------------------------
-    meses = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
-    orcamentos_mes = []
-    orcamentos_valor_mes = []
-
-    for i in range(1, 13):
-        # quantidade de orçamentos por mês
-        orcs_mes = orcamentos.filter(criado_em__month=i)
-        orcamentos_mes.append(orcs_mes.count())
-
-        # soma dos valores dos itens por mês
-        valor_mes = (
-            ItemOrcamento.objects.filter(
-                orcamento__empresa=empresa,
-                orcamento__criado_em__month=i
-            ).aggregate(total=Sum(F("quantidade") * F("preco_unitario"), output_field=FloatField()))
-        )["total"] or 0
-
-        orcamentos_valor_mes.append(float(valor_mes))
+    alerta_orcamentos = list(
+        empresa.orcamento_set.filter(previsao_entrega__range=[hoje, limite_alerta])
+    )
 
     context = {
         "empresa": empresa,
-        "clientes": clientes,
-        "produtos": produtos,
-        "servicos": servicos,
-        "orcamentos": orcamentos.count(),
-        "orcamentos_valor_total": round(orcamentos_valor_total, 2),
+        "clientes": contadores["clientes"],
+        "produtos": contadores["produtos"],
+        "servicos": contadores["servicos"],
+        "orcamentos": contadores["orcamentos"],
+        "orcamentos_valor_total": round(contadores["valor_total"], 2),
         "alerta_orcamentos": alerta_orcamentos,
-        "meses": json.dumps(meses),
-        "orcamentos_mes": json.dumps(orcamentos_mes),
-        "orcamentos_valor_mes": json.dumps(orcamentos_valor_mes),
+        "meses": json.dumps(estatisticas["meses"]),
+        "orcamentos_mes": json.dumps(estatisticas["orcamentos_mes"]),
+        "orcamentos_valor_mes": json.dumps(estatisticas["orcamentos_valor_mes"]),
     }
 
     return render(request, "dashboard.html", context)
 
 
+@login_required
+def dashboard_dados_json(request):
+    """Mesmos dados do dashboard em JSON (?ano=AAAA ou últimos 12 meses)."""
+    empresa = request.empresa
+    if not empresa:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Empresa não encontrada.'}, status=404)
+
+    estatisticas = estatisticas_dashboard(empresa, ano=_ano_do_request(request))
+    return JsonResponse({'status': 'ok', 'dados': estatisticas})
+
+
+
+# --------------------------------------------------------
+# VERSÕES (EDIÇÃO CONCORRENTE)
+# --------------------------------------------------------
+
+def _versao_pedida(request):
+    """
+    Versão que o usuário leu antes de editar: cabeçalho If-Match ("3" ou
+    W/"3") ou campo versao do POST. None se não veio (grava sem conferir).
+    """
+    valor = request.headers.get('If-Match') or request.POST.get('versao') or ''
+    valor = valor.strip().removeprefix('W/').strip('"')
+    return int(valor) if valor.isdigit() else None
+
+
+def _conferir_versao(request, registro):
+    """ConflitoVersao se a versão pedida não é a do registro já lido."""
+    versao = _versao_pedida(request)
+    if versao is not None and versao != registro.versao:
+        raise ConflitoVersao
+
+
+def _conflito():
+    return JsonResponse({
+        'status': 'erro',
+        'mensagem': 'Este registro foi alterado por outra pessoa. Recarregue e tente novamente.',
+    }, status=409)
+
+
+def _com_versao(dados, versao):
+    """JsonResponse com a versão no corpo e no ETag, para o If-Match da edição."""
+    resposta = JsonResponse({**dados, 'versao': versao})
+    resposta['ETag'] = f'"{versao}"'
+    return resposta
+
 
 # --------------------------------------------------------
 # CLIENTES
 # --------------------------------------------------------
 
+CAMPOS_EDICAO_CLIENTE = (
+    'razao_social', 'nome_fantasia', 'cpf_cnpj', 'telefone', 'email', 'endereco', 'cidade_uf', 'cep',
+)
+
 @login_required
 @require_POST
 def criar_cliente_ajax(request):
-    empresa = get_empresa_do_usuario(request.user)
-    if not empresa:
+    if not request.empresa_id:
         return JsonResponse({'status': 'erro', 'mensagem': 'Empresa não encontrada.'})
 
-    cliente = Cliente.objects.create(
-        empresa=empresa,
-        razao_social=request.POST.get('razao_social'),
-        nome_fantasia=request.POST.get('nome_fantasia'),
-        cpf_cnpj=request.POST.get('cpf_cnpj'),
-        telefone=request.POST.get('telefone'),
-        email=request.POST.get('email'),
-        endereco=request.POST.get('endereco'),
-        cidade_uf=request.POST.get('cidade_uf'),
-        cep=request.POST.get('cep')
-    )
+    try:
+        cliente = Cliente.objects.create(
+            empresa_id=request.empresa_id,
+            razao_social=request.POST.get('razao_social'),
+            nome_fantasia=request.POST.get('nome_fantasia'),
+            cpf_cnpj=request.POST.get('cpf_cnpj'),
+            telefone=request.POST.get('telefone'),
+            email=request.POST.get('email'),
+            endereco=request.POST.get('endereco'),
+            cidade_uf=request.POST.get('cidade_uf'),
+            cep=request.POST.get('cep')
+        )
+    except IntegrityError:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Já existe um cliente com este CPF/CNPJ.'})
 
     return JsonResponse({
         'status': 'ok',
@@ -206,64 +240,75 @@ def criar_cliente_ajax(request):
 def excluir_cliente(request, id):
     if request.method == 'POST':
         try:
-            cliente = Cliente.objects.get(id=id)
-            cliente.delete()
+            cliente = Cliente.objects.da_empresa(request.empresa_id).get(id=id)
+            with transaction.atomic():
+                anteriores = resumo.capturar_lote(Orcamento.objects.filter(cliente=cliente).select_for_update())
+                cliente.delete()
+                # Os orçamentos do cliente saem em cascata
+                resumo.registrar_lote(anteriores)
             return JsonResponse({'status': 'ok', 'mensagem': 'Cliente excluído com sucesso'})
         except Cliente.DoesNotExist:
             return JsonResponse({'status': 'erro', 'mensagem': 'Cliente não encontrado'})
     return JsonResponse({'status': 'erro', 'mensagem': 'Método inválido'})
 
 @login_required
-@require_POST
+@require_http_methods(['GET', 'POST'])
 def editar_cliente(request, id):
-    cliente = Cliente.objects.get(id=id)
     if request.method == 'GET':
         # retornar os dados em JSON
-        return JsonResponse({
-            'razao_social': cliente.razao_social,
-            'nome_fantasia': cliente.nome_fantasia,
-            'cpf_cnpj': cliente.cpf_cnpj,
-            'telefone': cliente.telefone,
-            'email': cliente.email,
-            'endereco': cliente.endereco,
-            'cidade_uf': cliente.cidade_uf,
-            'cep': cliente.cep,
-        })
-    elif request.method == 'POST':
-        # atualizar os dados
-        cliente.razao_social = request.POST.get('razao_social')
-        cliente.nome_fantasia = request.POST.get('nome_fantasia')
-        cliente.cpf_cnpj = request.POST.get('cpf_cnpj')
-        cliente.telefone = request.POST.get('telefone')
-        cliente.email = request.POST.get('email')
-        cliente.endereco = request.POST.get('endereco')
-        cliente.cidade_uf = request.POST.get('cidade_uf')
-        cliente.cep = request.POST.get('cep')
-        cliente.save()
-        return JsonResponse({'status': 'ok', 'cliente': {
-            'id': cliente.id,
-            'razao_social': cliente.razao_social,
-            'nome_fantasia': cliente.nome_fantasia,
-            'cpf_cnpj': cliente.cpf_cnpj,
-            'telefone': cliente.telefone,
-        }})
+        cliente = get_object_or_404(Cliente.objects.da_empresa(request.empresa_id), id=id)
+        return _com_versao(
+            {'id': cliente.id, **{campo: getattr(cliente, campo) for campo in CAMPOS_EDICAO_CLIENTE}}, cliente.versao,
+        )
+
+    # Um UPDATE só, sem ler o cliente antes: as colunas de busca saem do POST
+    cliente = Cliente(
+        id=id, empresa_id=request.empresa_id,
+        **{campo: request.POST.get(campo, '') for campo in CAMPOS_EDICAO_CLIENTE},
+    )
+    cliente.preencher_busca()
+    campos = {campo: getattr(cliente, campo) for campo in CAMPOS_EDICAO_CLIENTE + ('busca_nome', 'cpf_cnpj_digitos')}
+    try:
+        with transaction.atomic():
+            cliente.versao = Cliente.objects.da_empresa(request.empresa_id).atualizar_versao(
+                id, _versao_pedida(request), **campos,
+            )
+            TermoCliente.indexar([cliente])
+    except Cliente.DoesNotExist:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Cliente não encontrado'}, status=404)
+    except ConflitoVersao:
+        return _conflito()
+    except IntegrityError:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Já existe um cliente com este CPF/CNPJ.'})
+    # update() não dispara post_save (ver signals.py)
+    Empresa.nova_geracao_cadastros(request.empresa_id)
+    return JsonResponse({'status': 'ok', 'versao': cliente.versao, 'cliente': {
+        'id': cliente.id,
+        'razao_social': cliente.razao_social,
+        'nome_fantasia': cliente.nome_fantasia,
+        'cpf_cnpj': cliente.cpf_cnpj,
+        'telefone': cliente.telefone,
+    }})
 
 #--------------------------------------------------------
 
 @login_required
 @require_POST
 def criar_produto_ajax(request):
-    empresa = get_empresa_do_usuario(request.user)
-    if not empresa:
+    if not request.empresa_id:
         return JsonResponse({'status': 'erro', 'mensagem': 'Empresa não encontrada.'})
 
-    produto = Produto.objects.create(
-        empresa=empresa,
-        codigo=request.POST.get('codigo'),
-        nome=request.POST.get('nome'),
-        descricao=request.POST.get('descricao'),
-        preco=request.POST.get('preco') or 0
-    )
+    try:
+        with transaction.atomic():
+            produto = Produto.objects.create(
+                empresa_id=request.empresa_id,
+                codigo=request.POST.get('codigo'),
+                nome=request.POST.get('nome'),
+                descricao=request.POST.get('descricao'),
+                preco=request.POST.get('preco') or 0
+            )
+    except IntegrityError:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Já existe um produto com este código.'})
 
     return JsonResponse({
         'status': 'ok',
@@ -281,42 +326,84 @@ def criar_produto_ajax(request):
 def excluir_produto(request, id):
     if request.method == 'POST':
         try:
-            produto = Produto.objects.get(id=id)
-            produto.delete()
+            produto = Produto.objects.da_empresa(request.empresa_id).get(id=id)
+            with transaction.atomic():
+                # FOR UPDATE não aceita DISTINCT no PostgreSQL: os orçamentos vêm por subconsulta
+                usados = ItemOrcamento.objects.filter(produto=produto).values('orcamento_id')
+                anteriores = resumo.capturar_lote(Orcamento.objects.filter(id__in=usados).select_for_update())
+                produto.delete()
+                Orcamento.objects.filter(id__in=anteriores).recalcular_totais()
+                # Os itens de orçamento do produto saem em cascata
+                resumo.registrar_lote(anteriores)
             return JsonResponse({'status': 'ok', 'mensagem': 'Produto excluído com sucesso'})
         except Produto.DoesNotExist:
             return JsonResponse({'status': 'erro', 'mensagem': 'Produto não encontrado'})
     return JsonResponse({'status': 'erro', 'mensagem': 'Método inválido'})
+def _editar_catalogo(request, modelo, id, nome, duplicado):
+    """
+    GET devolve os dados para o modal; POST grava em um único UPDATE
+    condicionado à versão (409 se outra gravação chegou antes).
+    """
+    registros = modelo.objects.da_empresa(request.empresa_id)
+    if request.method == 'GET':
+        try:
+            registro = registros.get(id=id)
+        except modelo.DoesNotExist:
+            return JsonResponse({'erro': f'{nome} não encontrado'}, status=404)
+        return _com_versao({
+            'id': registro.id,
+            'codigo': registro.codigo,
+            'nome': registro.nome,
+            'descricao': registro.descricao,
+            'preco': str(registro.preco)
+        }, registro.versao)
+
+    campos = {
+        'codigo': limpar_codigo(request.POST.get('codigo')),
+        'nome': request.POST.get('nome', ''),
+        'descricao': request.POST.get('descricao'),
+        'preco': request.POST.get('preco') or 0,
+    }
+    try:
+        with transaction.atomic():
+            versao = registros.atualizar_versao(id, _versao_pedida(request), **campos)
+    except modelo.DoesNotExist:
+        return JsonResponse({'status': 'erro', 'mensagem': f'{nome} não encontrado'}, status=404)
+    except ConflitoVersao:
+        return _conflito()
+    except IntegrityError:
+        return JsonResponse({'status': 'erro', 'mensagem': duplicado})
+    except ValidationError:
+        return JsonResponse({'status': 'erro', 'mensagem': f'Preço inválido: {campos["preco"]}'})
+    # update() não dispara post_save (ver signals.py)
+    Empresa.nova_geracao_cadastros(request.empresa_id)
+    return JsonResponse({'status': 'ok', 'versao': versao})
+
+
 @login_required
+@require_http_methods(['GET', 'POST'])
 def editar_produto(request, id):
-    try:
-        produto = Produto.objects.get(id=id)
-        data = {
-            'codigo': produto.codigo,
-            'nome': produto.nome,
-            'descricao': produto.descricao,
-            'preco': str(produto.preco)
-        }
-        return JsonResponse(data)
-    except Produto.DoesNotExist:
-        return JsonResponse({'erro': 'Produto não encontrado'}, status=404)
+    return _editar_catalogo(request, Produto, id, 'Produto', 'Já existe um produto com este código.')
 
 #--------------------------------------------------------
 
 @login_required
 @require_POST
 def criar_servico_ajax(request):
-    empresa = get_empresa_do_usuario(request.user)
-    if not empresa:
+    if not request.empresa_id:
         return JsonResponse({'status': 'erro', 'mensagem': 'Empresa não encontrada.'})
 
-    servico = Servico.objects.create(
-        empresa=empresa,
-        codigo=request.POST.get('codigo'),
-        nome=request.POST.get('nome'),
-        descricao=request.POST.get('descricao'),
-        preco=request.POST.get('preco') or 0
-    )
+    try:
+        with transaction.atomic():
+            servico = Servico.objects.create(
+                empresa_id=request.empresa_id,
+                codigo=request.POST.get('codigo'),
+                nome=request.POST.get('nome'),
+                descricao=request.POST.get('descricao'),
+                preco=request.POST.get('preco') or 0
+            )
+    except IntegrityError:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Já existe um serviço com este código.'})
 
     return JsonResponse({
         'status': 'ok',
@@ -331,194 +418,169 @@ def criar_servico_ajax(request):
 
     
 @login_required
-@require_POST
+@require_http_methods(['GET', 'POST'])
 def editar_servico_ajax(request, id):
-    try:
-        servico = Servico.objects.get(id=id)
-        data = {
-            'codigo': servico.codigo,
-            'nome': servico.nome,
-            'descricao': servico.descricao,
-            'preco': str(servico.preco)
-        }
-        return JsonResponse(data)
-    except Servico.DoesNotExist:
-        return JsonResponse({'erro': 'Serviço não encontrado'}, status=404)
+    return _editar_catalogo(request, Servico, id, 'Serviço', 'Já existe um serviço com este código.')
+
+
 @login_required
 def excluir_servico_ajax(request, id):
     if request.method == 'POST':
         try:
-            servico = Servico.objects.get(id=id)
-            servico.delete()
+            servico = Servico.objects.da_empresa(request.empresa_id).get(id=id)
+            with transaction.atomic():
+                # FOR UPDATE não aceita DISTINCT no PostgreSQL: os orçamentos vêm por subconsulta
+                usados = ItemOrcamento.objects.filter(servico=servico).values('orcamento_id')
+                anteriores = resumo.capturar_lote(Orcamento.objects.filter(id__in=usados).select_for_update())
+                servico.delete()
+                Orcamento.objects.filter(id__in=anteriores).recalcular_totais()
+                # Os itens de orçamento do serviço saem em cascata
+                resumo.registrar_lote(anteriores)
             return JsonResponse({'status': 'ok', 'mensagem': 'Serviço excluído com sucesso'})
         except Servico.DoesNotExist:
             return JsonResponse({'status': 'erro', 'mensagem': 'Serviço não encontrado'})
     return JsonResponse({'status': 'erro', 'mensagem': 'Método inválido'})
 
 
+# --------------------------------------------------------
+# IMPORTAÇÃO
+# --------------------------------------------------------
+
+@login_required
+@require_POST
+def importar_cadastros(request, cadastro):
+    """
+    Importa o arquivo enviado (campo "arquivo", CSV ou XLSX) para clientes,
+    produtos ou serviços da empresa e responde com o relatório da importação.
+    """
+    if not request.empresa_id:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Empresa não encontrada.'})
+    arquivo = request.FILES.get('arquivo')
+    if cadastro not in importacao.CADASTROS or not arquivo:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Envie um arquivo CSV ou XLSX.'}, status=400)
+
+    try:
+        linhas = importacao.ler_arquivo(
+            arquivo, arquivo.name,
+            encoding=request.POST.get('encoding') or 'utf-8-sig',
+            delimitador=request.POST.get('delimitador') or None,
+        )
+        relatorio = importacao.importar(request.empresa_id, cadastro, linhas)
+    except UnicodeDecodeError:
+        return JsonResponse(
+            {'status': 'erro', 'mensagem': 'Codificação do arquivo não reconhecida. Salve o CSV em UTF-8.'},
+            status=400,
+        )
+    except (ValueError, LookupError) as erro:
+        return JsonResponse({'status': 'erro', 'mensagem': str(erro)}, status=400)
+    return JsonResponse({'status': 'ok', **relatorio})
+
+
 # --------------------------------------------------------
 # ORÇAMENTOS
 # --------------------------------------------------------
 
 @login_required
 def listar_orcamentos(request):
-    empresa_id = request.session.get('empresa_id')
+    empresa_id = request.empresa_id
     if not empresa_id:
         return redirect('core:selecionar_empresa')
 
-    orcamentos = Orcamento.objects.filter(empresa_id=empresa_id).order_by('-criado_em')
-    clientes = Cliente.objects.filter(empresa_id=empresa_id)
+    try:
+        orcamentos, proximo = listagem.listar_orcamentos(empresa_id, request.GET)
+    except ValueError as e:
+        messages.error(request, str(e))
+        orcamentos, proximo = listagem.listar_orcamentos(empresa_id, {})
+
+    # Filtros atuais, sem o cursor, para montar o link da próxima página
+    filtros = request.GET.copy()
+    filtros.pop('cursor', None)
 
     return render(request, 'orcamentos.html', {
         'orcamentos': orcamentos,
-        'clientes': clientes,
+        'proximo': proximo,
+        'filtros': filtros,
+        'querystring': filtros.urlencode(),
+        'ordenacoes': listagem.ORDENACOES,
     })
 
 
 @login_required
-@require_POST
-def criar_orcamento(request):
+def listar_orcamentos_json(request):
+    empresa_id = request.empresa_id
+    if not empresa_id:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Nenhuma empresa selecionada'}, status=400)
+
     try:
-        data = request.POST
-        empresa = get_empresa_do_usuario(request.user)
-        itens = json.loads(data.get('itens', '[]'))
-        desconto = float(data.get('desconto', 0) or 0)
-
-        orcamento = Orcamento.objects.create(
-            empresa=empresa,
-            usuario=request.user,
-            cliente_id=data.get('cliente'),
-            solicitante=data.get('solicitante'),
-            previsao_entrega=data.get('previsao_entrega') or None,
-            forma_pagamento=data.get('forma_pagamento'),
-            vencimento=data.get('vencimento') or None,
-            observacao=data.get('observacao'),
-            responsavel=data.get('responsavel'),
-            desconto=desconto,
-        )
+        orcamentos, proximo = listagem.listar_orcamentos(empresa_id, request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
 
-        total = 0
-        for item in itens:
-            tipo = item.get('tipo')
-            qtd = float(item.get('quantidade') or 0)
-            valor = float(item.get('valor_unitario') or 0)
-            subtotal = qtd * valor
-            total += subtotal
-
-            model = Produto if tipo == 'produto' else Servico
-            ref = model.objects.filter(id=item.get('id_item')).first()
-
-            ItemOrcamento.objects.create(
-                orcamento=orcamento,
-                produto=ref if tipo == 'produto' else None,
-                servico=ref if tipo == 'servico' else None,
-                quantidade=qtd,
-                preco_unitario=valor
-            )
+    return JsonResponse({
+        'resultados': [listagem.serializar(o) for o in orcamentos],
+        'proximo': proximo,
+    })
 
-        orcamento.save()
-        return JsonResponse({'status': 'ok'})
 
-    except Exception as e:
-        return JsonResponse({'status': 'erro', 'mensagem': str(e)})
+@login_required
+def exportar_orcamentos(request, conjunto):
+    """
+    Orçamentos ou itens da empresa em CSV ou JSON Lines (?formato=), com os
+    filtros da listagem e, com ?nomes=1, os nomes de cliente e produto/serviço.
+    O arquivo é gerado enquanto é enviado.
+    """
+    empresa_id = request.empresa_id
+    if not empresa_id:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Nenhuma empresa selecionada'}, status=400)
+
+    formato = request.GET.get('formato') or 'csv'
+    try:
+        conteudo = exportacao.gerar(
+            empresa_id, conjunto, request.GET, formato, nomes=request.GET.get('nomes') == '1',
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+    response = StreamingHttpResponse(conteudo, content_type=exportacao.FORMATOS[formato])
+    nome = f'{conjunto}-{timezone.localdate():%Y-%m-%d}.{formato}'
+    response['Content-Disposition'] = f'attachment; filename="{nome}"'
+    return response
 
 
 @login_required
 @require_POST
-def editar_orcamento(request, orcamento_id):
-    orcamento = get_object_or_404(
-        Orcamento,
-        id=orcamento_id,
-        empresa_id=request.session.get('empresa_id')
-    )
-
+def criar_orcamento(request):
     try:
-        data = request.POST
-        itens = json.loads(data.get('itens', '[]'))
-        desconto = float(data.get('desconto', 0) or 0)
-
-        orcamento.cliente_id = data.get('cliente')
-        orcamento.solicitante = data.get('solicitante')
-        orcamento.previsao_entrega = data.get('previsao_entrega') or None
-        orcamento.forma_pagamento = data.get('forma_pagamento')
-        orcamento.vencimento = data.get('vencimento') or None
-        orcamento.observacao = data.get('observacao')
-        orcamento.responsavel = data.get('responsavel')
-        orcamento.desconto = desconto
-
-        # Limpa itens antigos
-        ItemOrcamento.objects.filter(orcamento=orcamento).delete()
-
-        total = 0
-        for item in itens:
-            tipo = item.get('tipo')
-            qtd = float(item.get('quantidade') or 0)
-            valor = float(item.get('valor_unitario') or 0)
-            subtotal = qtd * valor
-            total += subtotal
-
-            model = Produto if tipo == 'produto' else Servico
-            ref = model.objects.filter(id=item.get('id_item')).first()
-
-            ItemOrcamento.objects.create(
-                orcamento=orcamento,
-                produto=ref if tipo == 'produto' else None,
-                servico=ref if tipo == 'servico' else None,
-                quantidade=qtd,
-                preco_unitario=valor
-            )
-
-        orcamento.save()
+        if not request.empresa_id:
+            return JsonResponse({'status': 'erro', 'mensagem': 'Empresa não encontrada.'})
+        orcamento = Orcamento(empresa_id=request.empresa_id, usuario=request.user)
+        salvar_orcamento(orcamento, request.POST)
         return JsonResponse({'status': 'ok'})
 
     except Exception as e:
         return JsonResponse({'status': 'erro', 'mensagem': str(e)})
 
+
 @login_required
 def obter_orcamento(request, orcamento_id):
     """Retorna os dados de um orçamento para edição (GET)."""
     if request.method != "GET":
         return JsonResponse({'status': 'erro', 'mensagem': 'Método não permitido'}, status=405)
 
-    orc = get_object_or_404(Orcamento, id=orcamento_id)
-    itens = ItemOrcamento.objects.filter(orcamento=orc)
-
-    data = {
-        'id': orc.id,
-        'cliente_id': orc.cliente_id,
-        'cliente_nome': orc.cliente.razao_social if orc.cliente else '',
-        'solicitante': orc.solicitante,
-        'previsao_entrega': orc.previsao_entrega.strftime('%Y-%m-%d') if orc.previsao_entrega else '',
-        'vencimento': orc.vencimento.strftime('%Y-%m-%d') if orc.vencimento else '',
-        'forma_pagamento': orc.forma_pagamento,
-        'responsavel': orc.responsavel,
-        'desconto': float(orc.desconto or 0),
-        'observacao': orc.observacao or '',
-        'itens': [
-            {
-                'id_item': i.produto.id if i.produto else (i.servico.id if i.servico else None),
-                'nome': i.produto.nome if i.produto else (i.servico.nome if i.servico else ''),
-                'tipo': 'produto' if i.produto else 'servico',
-                'quantidade': float(i.quantidade),
-                'valor_unitario': float(i.preco_unitario),
-            }
-            for i in itens
-        ]
-    }
-
-    return JsonResponse({'status': 'ok', 'orcamento': data})
+    orcamento = obter_orcamento_com_itens(request.empresa_id, orcamento_id)
+    resposta = JsonResponse({'status': 'ok', 'orcamento': serializar_orcamento(orcamento)})
+    resposta['ETag'] = f'"{orcamento.versao}"'
+    return resposta
 
 
 @login_required
 @require_POST
 def excluir_orcamento(request, orcamento_id):
-    orcamento = get_object_or_404(
-        Orcamento,
-        id=orcamento_id,
-        empresa_id=request.session.get('empresa_id')  # ajuste se o nome da session for diferente
-    )
+    orcamento = get_object_or_404(Orcamento.objects.da_empresa(request.empresa_id), id=orcamento_id)
     try:
-        orcamento.delete()
+        with transaction.atomic():
+            resumo.remover(orcamento)
+            orcamento.delete()
         return JsonResponse({"status": "ok"})
     except Exception as e:
         return JsonResponse({"status": "erro", "mensagem": str(e)})
@@ -526,139 +588,131 @@ def excluir_orcamento(request, orcamento_id):
 
 @login_required
 def imprimir_orcamento(request, orcamento_id):
-    empresa_id = request.session.get('empresa_id')
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id, empresa_id=empresa_id)
-    itens = ItemOrcamento.objects.filter(orcamento=orcamento)
+    orcamento = get_object_or_404(
+        Orcamento.objects.da_empresa(request.empresa_id).select_related('empresa').only(
+            'id', 'atualizado_em', 'empresa__geracao_cadastros',
+        ),
+        id=orcamento_id,
+    )
+    return impressao.responder(request, orcamento)
 
-    return render(request, 'imprimir.html', {
-        'orcamento': orcamento,
-        'itens': itens,
-    })
+
+@login_required
+def gerar_pdf(request, orcamento_id):
+    orcamento = get_object_or_404(
+        Orcamento.objects.da_empresa(request.empresa_id).select_related('empresa').only(
+            'id', 'empresa_id', 'numero', 'ano', 'atualizado_em', 'empresa__geracao_cadastros',
+        ),
+        id=orcamento_id,
+    )
+    return documentos_pdf.responder(request, orcamento)
 
 @login_required
 def orcamento_detalhe_json(request, orcamento_id):
     """Retorna os dados do orçamento em JSON para o modal de edição."""
-    empresa_id = request.session.get('empresa_id')
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id, empresa_id=empresa_id)
-    itens = ItemOrcamento.objects.filter(orcamento=orcamento)
-
-    data = {
-        'id': orcamento.id,
-        'cliente_id': orcamento.cliente.id if orcamento.cliente else None,
-        'cliente_nome': orcamento.cliente.razao_social if orcamento.cliente else '',
-        'solicitante': orcamento.solicitante,
-        'previsao_entrega': orcamento.previsao_entrega.strftime('%Y-%m-%d') if orcamento.previsao_entrega else '',
-        'vencimento': orcamento.vencimento.strftime('%Y-%m-%d') if orcamento.vencimento else '',
-        'forma_pagamento': orcamento.forma_pagamento,
-        'responsavel': orcamento.responsavel,
-        'observacao': orcamento.observacao,
-        'desconto': float(orcamento.desconto or 0),
-        'itens': [
-            {
-                'id_item': i.produto.id if i.produto else (i.servico.id if i.servico else None),
-                'tipo': 'produto' if i.produto else 'servico',
-                'nome': i.produto.nome if i.produto else (i.servico.nome if i.servico else ''),
-                'quantidade': float(i.quantidade),
-                'valor_unitario': float(i.preco_unitario),
-            }
-            for i in itens
-        ]
-    }
-    return JsonResponse({'status': 'ok', 'orcamento': data})
+    orcamento = obter_orcamento_com_itens(request.empresa_id, orcamento_id)
+    return JsonResponse({'status': 'ok', 'orcamento': serializar_orcamento(orcamento)})
 
 
 @login_required
 @require_POST
 def editar_orcamento(request, orcamento_id):
-    """Salva alterações em um orçamento existente."""
-    if request.method != "POST":
-        return JsonResponse({'status': 'erro', 'mensagem': 'Método não permitido (use POST)'}, status=405)
-
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id, empresa_id=request.session.get('empresa_id'))
+    """
+    Salva alterações em um orçamento existente. Se ele mudou desde a versão
+    que o modal leu (If-Match ou campo versao), responde 409 sem gravar.
+    """
+    # Só o que o resumo mensal e a conferência da versão usam
+    orcamento = get_object_or_404(
+        Orcamento.objects.da_empresa(request.empresa_id).only('empresa_id', 'criado_em', 'subtotal', 'desconto', 'versao'),
+        id=orcamento_id,
+    )
     try:
-        data = request.POST
-        itens = json.loads(data.get('itens', '[]'))
-        desconto = float(data.get('desconto', 0) or 0)
-
-        orcamento.cliente_id = data.get('cliente')
-        orcamento.solicitante = data.get('solicitante')
-        orcamento.previsao_entrega = data.get('previsao_entrega') or None
-        orcamento.vencimento = data.get('vencimento') or None
-        orcamento.forma_pagamento = data.get('forma_pagamento')
-        orcamento.observacao = data.get('observacao')
-        orcamento.responsavel = data.get('responsavel')
-        orcamento.desconto = desconto
-
-        # Remove os itens antigos
-        ItemOrcamento.objects.filter(orcamento=orcamento).delete()
-
-        total = 0
-        for item in itens:
-            tipo = item.get('tipo')
-            qtd = float(item.get('quantidade') or 0)
-            valor = float(item.get('valor_unitario') or 0)
-            subtotal = qtd * valor
-            total += subtotal
-
-            model = Produto if tipo == 'produto' else Servico
-            ref = model.objects.filter(id=item.get('id_item')).first()
-
-            ItemOrcamento.objects.create(
-                orcamento=orcamento,
-                produto=ref if tipo == 'produto' else None,
-                servico=ref if tipo == 'servico' else None,
-                quantidade=qtd,
-                preco_unitario=valor
-            )
-
-        orcamento.save()
-        return JsonResponse({'status': 'ok'})
+        _conferir_versao(request, orcamento)
+        salvar_orcamento(orcamento, request.POST)
+        return JsonResponse({'status': 'ok', 'versao': orcamento.versao})
 
+    except ConflitoVersao:
+        return _conflito()
     except Exception as e:
         return JsonResponse({'status': 'erro', 'mensagem': str(e)})
 
 
-
-
 # --------------------------------------------------------
 # ITENS DE ORÇAMENTO INDIVIDUAIS (caso use via AJAX)
 # --------------------------------------------------------
 
+def _nova_versao_orcamento(request, orcamento):
+    """
+    Itens mudam o orçamento: confere a versão e a incrementa antes de
+    qualquer gravação, no mesmo UPDATE condicional das outras edições.
+    """
+    _conferir_versao(request, orcamento)
+    orcamento.versao = Orcamento.objects.atualizar_versao(orcamento.pk, orcamento.versao)
+
+
 @login_required
 @require_POST
+@transaction.atomic
 def adicionar_item(request, orcamento_id):
-    orcamento = get_object_or_404(Orcamento, id=orcamento_id, empresa_id=request.session.get('empresa_id'))
-    form = ItemOrcamentoForm(request.POST)
+    orcamento = get_object_or_404(Orcamento.objects.da_empresa(request.empresa_id), id=orcamento_id)
+    form = ItemOrcamentoForm(request.POST, empresa_id=request.empresa_id)
     if form.is_valid():
+        try:
+            _nova_versao_orcamento(request, orcamento)
+        except ConflitoVersao:
+            return _conflito()
+        anterior = resumo.capturar(orcamento)
         item = form.save(commit=False)
         item.orcamento = orcamento
         item.save()
-        return JsonResponse({'status': 'ok', 'item_id': item.id})
+        orcamento.recalcular_totais()
+        resumo.registrar(orcamento, anterior)
+        return JsonResponse({'status': 'ok', 'item_id': item.id, 'versao': orcamento.versao})
     return JsonResponse({'status': 'erro', 'erros': form.errors})
 
 
 @login_required
 @require_POST
+@transaction.atomic
 def editar_item(request, item_id):
-    item = get_object_or_404(ItemOrcamento, id=item_id, orcamento__empresa_id=request.session.get('empresa_id'))
-    form = ItemOrcamentoForm(request.POST, instance=item)
+    item = get_object_or_404(
+        ItemOrcamento.objects.da_empresa(request.empresa_id).select_related('orcamento'), id=item_id,
+    )
+    form = ItemOrcamentoForm(request.POST, instance=item, empresa_id=request.empresa_id)
     if form.is_valid():
+        try:
+            _nova_versao_orcamento(request, item.orcamento)
+        except ConflitoVersao:
+            return _conflito()
+        anterior = resumo.capturar(item.orcamento)
         form.save()
-        return JsonResponse({'status': 'ok'})
+        item.orcamento.recalcular_totais()
+        resumo.registrar(item.orcamento, anterior)
+        return JsonResponse({'status': 'ok', 'versao': item.orcamento.versao})
     return JsonResponse({'status': 'erro', 'erros': form.errors})
 
 
 @login_required
 @require_POST
+@transaction.atomic
 def excluir_item(request, item_id):
-    item = get_object_or_404(ItemOrcamento, id=item_id, orcamento__empresa_id=request.session.get('empresa_id'))
+    item = get_object_or_404(
+        ItemOrcamento.objects.da_empresa(request.empresa_id).select_related('orcamento'), id=item_id,
+    )
+    try:
+        _nova_versao_orcamento(request, item.orcamento)
+    except ConflitoVersao:
+        return _conflito()
+    anterior = resumo.capturar(item.orcamento)
     item.delete()
-    return JsonResponse({'status': 'ok'})
+    item.orcamento.recalcular_totais()
+    resumo.registrar(item.orcamento, anterior)
+    return JsonResponse({'status': 'ok', 'versao': item.orcamento.versao})
 
 
 @login_required
 def detalhe_item(request, item_id):
-    item = get_object_or_404(ItemOrcamento, id=item_id, orcamento__empresa_id=request.session.get('empresa_id'))
+    item = get_object_or_404(ItemOrcamento.objects.da_empresa(request.empresa_id), id=item_id)
     data = {
         'id': item.id,
         'produto': {'id': item.produto.id, 'nome': item.produto.nome} if item.produto else None,
@@ -682,79 +736,91 @@ def utf8_json_response(data):
 
 @login_required
 def autocomplete_cliente(request):
-    empresa_id = request.session.get('empresa_id')
+    empresa_id = request.empresa_id
     term = request.GET.get('term', '')
     cliente_id = request.GET.get('id')
 
-    clientes = Cliente.objects.filter(empresa_id=empresa_id)
-
     if cliente_id:
-        clientes = clientes.filter(id=cliente_id)
-    elif term:
-        clientes = clientes.filter(razao_social__icontains=term)
-
-    results = [
-        {
-            "id": c.id,
-            "label": c.razao_social,
-            "nome_fantasia": c.nome_fantasia,
-            "cpf_cnpj": c.cpf_cnpj,
-            "email": c.email,
-            "telefone": c.telefone,
-            "endereco": c.endereco,
-        }
-        for c in clientes
-    ]
-    return JsonResponse(results, safe=False)
+        clientes = Cliente.objects.da_empresa(empresa_id).filter(id=cliente_id).values(*CAMPOS_CLIENTE)
+        return JsonResponse([serializar_cliente(c) for c in clientes], safe=False)
+
+    limite = limite_autocomplete(request.GET.get('limite'))
+    cursor = request.GET.get('cursor') or ''
+    (results, proximo), acertou = em_cache(
+        empresa_id, 'cliente', term, (limite, cursor),
+        lambda: buscar_clientes(empresa_id, term, limite, cursor),
+    )
+    response = JsonResponse(results, safe=False)
+    response['X-Cache'] = 'HIT' if acertou else 'MISS'
+    if proximo:
+        # A lista continua sendo o corpo (formato do jQuery UI); a próxima
+        # página é pedida repetindo a busca com ?cursor=<X-Proximo-Cursor>
+        response['X-Proximo-Cursor'] = proximo
+    return response
 
 
 @login_required
 def autocomplete_produto_servico(request):
+    empresa_id = request.empresa_id
     termo = request.GET.get('term', '')
-    produtos = Produto.objects.filter(nome__icontains=termo)
-    servicos = Servico.objects.filter(nome__icontains=termo)
-
-    resultados = []
-    for p in produtos:
-        resultados.append({
-            "id": p.id,
-            "label": p.nome,
-            "tipo": "produto",
-            "preco": float(p.preco)
-        })
-    for s in servicos:
-        resultados.append({
-            "id": s.id,
-            "label": s.nome,
-            "tipo": "servico",
-            "preco": float(s.preco)
-        })
-    return JsonResponse(resultados, safe=False)
+    limite = limite_autocomplete(request.GET.get('limite'))
+
+    resultados, acertou = em_cache(
+        empresa_id, 'produto_servico', termo, (limite,),
+        lambda: buscar_catalogo(empresa_id, termo, limite),
+    )
+    response = JsonResponse(resultados, safe=False)
+    response['X-Cache'] = 'HIT' if acertou else 'MISS'
+    return response
+
+
+@staff_member_required
+def autocomplete_cache_json(request):
+    """Acertos, faltas e ocupação do cache do autocomplete (neste processo)."""
+    return JsonResponse(cache_autocomplete.estatisticas())
 
 
 # --------------------------------------------------------
 # OUTROS
 # --------------------------------------------------------
 
+@staff_member_required
+def metricas_prometheus(request):
+    """Métricas por rota deste processo, no formato do Prometheus (ver metricas.py)."""
+    return HttpResponse(metricas.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required
-@require_POST
 def configuracoes(request):
-    empresa = get_empresa_do_usuario(request.user)
+    empresa = request.empresa
     if not empresa:
         return redirect('core:index')
 
-    context = {
-        'clientes_list': Cliente.objects.filter(empresa=empresa),
-        'produtos_list': Produto.objects.filter(empresa=empresa),
-        'servicos_list': Servico.objects.filter(empresa=empresa),
-    }
-    context['empresa'] = empresa
+    # As tabelas são carregadas por cada aba em listar_cadastros_json
+    context = {'empresa': empresa}
     return render(request, 'configuracoes.html', context, ) 
 
 
+@login_required
+def listar_cadastros_json(request, tipo):
+    empresa_id = request.empresa_id
+    if not empresa_id:
+        return JsonResponse({'status': 'erro', 'mensagem': 'Nenhuma empresa selecionada'}, status=400)
+
+    try:
+        linhas, proximo = cadastros.listar(empresa_id, tipo, request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'erro', 'mensagem': str(e)}, status=400)
+
+    return JsonResponse({
+        'resultados': [cadastros.serializar(tipo, linha) for linha in linhas],
+        'proximo': proximo,
+    })
+
+
 @login_required
 def suporte(request):
-    empresa = get_empresa_do_usuario(request.user)
+    empresa = request.empresa
     modulos = ['Financeiro', 'Dashboard', 'Orçamentos', 'Configurações', 'Relatórios', 'Outro']
     
     context = {
@@ -762,5 +828,5 @@ def suporte(request):
     'modulos': modulos,
     'empresa': empresa,
 }
-    return render(request, 'suporte.html', context)
+    return renderizar_em_cache(request, 'suporte.html', context, por_usuario=True, por_empresa=True)
 
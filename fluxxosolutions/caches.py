@@ -0,0 +1,38 @@
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Configuração do cache a partir de uma URL no formato CACHE_URL:
+#
+#   locmem://                  memória de cada processo (padrão)
+#   file:///var/tmp/fluxxo     arquivos em disco, compartilhados entre processos
+#   redis://host:6379/0        Redis ou compatível (exige o pacote redis)
+#
+# Parâmetros da query string vão para OPTIONS do Django.
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+}
+
+
+def cache_da_url(url, timeout=300, max_entradas=5000):
+    """Dicionário de CACHES['default'] para a URL."""
+    partes = urlsplit(url)
+    backend = BACKENDS.get(partes.scheme)
+    if backend is None:
+        raise ValueError(f'CACHE_URL com esquema não suportado: {partes.scheme!r}')
+
+    opcoes = {nome: int(valor) if valor.isdigit() else valor for nome, valor in parse_qsl(partes.query)}
+    if partes.scheme == 'locmem':
+        local = partes.netloc or 'fluxxo'
+    elif partes.scheme == 'file':
+        local = unquote(partes.path)
+    else:
+        # O cliente do Redis lê a própria URL (senha, banco), sem a query string
+        local = partes._replace(query='').geturl()
+    if partes.scheme in ('locmem', 'file'):
+        # Acima disso o Django descarta parte das entradas (no Redis vale a
+        # política de memória do servidor)
+        opcoes.setdefault('MAX_ENTRIES', max_entradas)
+    return {'BACKEND': backend, 'LOCATION': local, 'TIMEOUT': timeout, 'OPTIONS': opcoes}